@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Materialized country-year aggregates for iea_electricity.db.
+
+Tables, refreshed by the loaders for every country they load (in the same
+transaction as its rows):
+- country_year_totals: total generation (GWh), power-sector emissions
+  (MtCO2), total final consumption, imports, exports and net imports
+- generation_shares: each source's share (%) of a country's GWh generation
+- country_latest: latest year with generation, consumption and trade data,
+  and the generation total for that year
+- country_versions: content hash and version number of each country's
+  rows per dataset, bumped only when a load actually changes them, so the
+  exporter can rewrite just the countries that changed
+
+generation_data holds both GWh rows and MtCO2 emission rows (Coal, Natural
+gas, Oil, Other) for some countries; totals and shares only ever sum GWh
+rows, and the MtCO2 rows are summed separately into emissions_mtco2.
+
+Running this module rebuilds the aggregates for every country:
+    python data/aggregates.py [data/iea_electricity.db]
+"""
+
+import hashlib
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from db_schema import FACT_TABLES
+
+GENERATION_UNIT = 'GWh'
+EMISSIONS_UNIT = 'MtCO2'
+
+
+def create_aggregate_tables(conn):
+    """Create the aggregate tables, filling them if they are new and data already exists."""
+    exists = conn.execute("""
+        SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'country_year_totals'
+    """).fetchone()
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS country_year_totals (
+            country_id INTEGER NOT NULL REFERENCES countries(id),
+            year INTEGER NOT NULL,
+            generation_gwh REAL,
+            emissions_mtco2 REAL,
+            consumption REAL,
+            imports REAL,
+            exports REAL,
+            net_imports REAL,
+            PRIMARY KEY (country_id, year)
+        ) WITHOUT ROWID
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS generation_shares (
+            country_id INTEGER NOT NULL REFERENCES countries(id),
+            year INTEGER NOT NULL,
+            series_id INTEGER NOT NULL REFERENCES series(id),
+            share REAL,
+            PRIMARY KEY (country_id, year, series_id)
+        ) WITHOUT ROWID
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS country_latest (
+            country_id INTEGER PRIMARY KEY REFERENCES countries(id),
+            generation_year INTEGER,
+            generation_gwh REAL,
+            consumption_year INTEGER,
+            trade_year INTEGER
+        )
+    """)
+
+    versions_exist = conn.execute("""
+        SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'country_versions'
+    """).fetchone()
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS country_versions (
+            country_id INTEGER NOT NULL REFERENCES countries(id),
+            dataset TEXT NOT NULL,
+            data_hash TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (country_id, dataset)
+        ) WITHOUT ROWID
+    """)
+
+    if not exists:
+        refresh_all_aggregates(conn)
+    elif not versions_exist:
+        for (country_id,) in conn.execute("SELECT id FROM countries").fetchall():
+            update_country_versions(conn, country_id)
+
+
+def refresh_country_aggregates(conn, country_code):
+    """Recompute one country's aggregates (committed by the caller with its rows)."""
+    row = conn.execute("SELECT id FROM countries WHERE country_code = ?", (country_code,)).fetchone()
+    if row:
+        refresh_country_id(conn, row[0])
+
+
+def refresh_country_id(conn, country_id):
+    conn.execute("DELETE FROM country_year_totals WHERE country_id = ?", (country_id,))
+    conn.execute("""
+        INSERT INTO country_year_totals
+            (country_id, year, generation_gwh, emissions_mtco2, consumption, imports, exports, net_imports)
+        SELECT :country_id, year, SUM(generation), SUM(emissions), SUM(consumption),
+               SUM(imports), SUM(exports),
+               CASE WHEN SUM(trade) > 0 THEN COALESCE(SUM(imports), 0) - COALESCE(SUM(exports), 0) END
+        FROM (
+            SELECT f.year,
+                   CASE WHEN u.name = :generation_unit THEN f.value END AS generation,
+                   CASE WHEN u.name = :emissions_unit THEN f.value END AS emissions,
+                   NULL AS consumption, NULL AS imports, NULL AS exports, 0 AS trade
+            FROM generation_facts f LEFT JOIN units u ON u.id = f.unit_id
+            WHERE f.country_id = :country_id
+            UNION ALL
+            SELECT year, NULL, NULL, value, NULL, NULL, 0
+            FROM final_consumption_facts
+            WHERE country_id = :country_id
+            UNION ALL
+            SELECT f.year, NULL, NULL, NULL,
+                   CASE WHEN s.name = 'Imports' THEN f.value END,
+                   CASE WHEN s.name = 'Exports' THEN ABS(f.value) END,
+                   1
+            FROM imports_exports_facts f JOIN series s ON s.id = f.series_id
+            WHERE f.country_id = :country_id
+        )
+        GROUP BY year
+    """, {'country_id': country_id, 'generation_unit': GENERATION_UNIT, 'emissions_unit': EMISSIONS_UNIT})
+
+    conn.execute("DELETE FROM generation_shares WHERE country_id = ?", (country_id,))
+    conn.execute("""
+        INSERT INTO generation_shares (country_id, year, series_id, share)
+        SELECT f.country_id, f.year, f.series_id,
+               CASE WHEN t.generation_gwh > 0 THEN COALESCE(f.value, 0) * 100.0 / t.generation_gwh END
+        FROM generation_facts f
+        JOIN units u ON u.id = f.unit_id AND u.name = ?
+        JOIN country_year_totals t ON t.country_id = f.country_id AND t.year = f.year
+        WHERE f.country_id = ?
+    """, (GENERATION_UNIT, country_id))
+
+    conn.execute("""
+        INSERT OR REPLACE INTO country_latest
+            (country_id, generation_year, generation_gwh, consumption_year, trade_year)
+        SELECT :country_id, g.year, g.generation_gwh,
+               (SELECT MAX(year) FROM country_year_totals
+                WHERE country_id = :country_id AND consumption IS NOT NULL),
+               (SELECT MAX(year) FROM country_year_totals
+                WHERE country_id = :country_id AND net_imports IS NOT NULL)
+        FROM (SELECT NULL) LEFT JOIN (
+            SELECT year, generation_gwh FROM country_year_totals
+            WHERE country_id = :country_id AND generation_gwh IS NOT NULL
+            ORDER BY year DESC LIMIT 1
+        ) g
+    """, {'country_id': country_id})
+
+    update_country_versions(conn, country_id)
+
+
+def update_country_versions(conn, country_id):
+    """Bump the version of each of a country's datasets whose rows changed since the last load."""
+    current = dict(conn.execute("SELECT dataset, data_hash FROM country_versions WHERE country_id = ?",
+                                (country_id,)))
+
+    for dataset, (fact_table, _, _) in FACT_TABLES.items():
+        rows = conn.execute(f"""
+            SELECT year, series_id, unit_id, value FROM {fact_table}
+            WHERE country_id = ? ORDER BY year, series_id
+        """, (country_id,)).fetchall()
+
+        if not rows:
+            conn.execute("DELETE FROM country_versions WHERE country_id = ? AND dataset = ?",
+                         (country_id, dataset))
+            continue
+
+        data_hash = hashlib.sha256(repr(rows).encode('utf-8')).hexdigest()
+        if current.get(dataset) != data_hash:
+            conn.execute("""
+                INSERT INTO country_versions (country_id, dataset, data_hash, version, updated_at)
+                VALUES (?, ?, ?, 1, ?)
+                ON CONFLICT (country_id, dataset) DO UPDATE
+                SET data_hash = excluded.data_hash, version = version + 1, updated_at = excluded.updated_at
+            """, (country_id, dataset, data_hash, datetime.now()))
+
+
+def refresh_all_aggregates(conn):
+    country_ids = [row[0] for row in conn.execute("SELECT id FROM countries")]
+    for country_id in country_ids:
+        refresh_country_id(conn, country_id)
+    return len(country_ids)
+
+
+def main():
+    db_path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path('data/iea_electricity.db')
+
+    conn = sqlite3.connect(db_path)
+    create_aggregate_tables(conn)
+    count = refresh_all_aggregates(conn)
+    conn.commit()
+    conn.close()
+
+    print(f"Refreshed aggregates for {count} countries in {db_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Time-series analytics layers for the globe (analytics.cube).
+
+For every absolute heatmap layer (total generation, generation by source,
+total consumption, net imports) and every country and year:
+- yoy: change from the previous year (%)
+- cagr<N>: compound annual growth rate over the last N years (%), where
+  both ends are positive
+- rolling<N>: mean of the last N years (all N must be present)
+- rank: 1 = largest value among the countries with data that year
+- percentile: share (%) of those countries whose value is at or below
+  this country's
+
+All layers are stacked into one (layer, country, year) array and each
+metric is computed for the whole stack at once with NumPy. The result is
+written like heatmap.cube (see cube_format.py), one series per
+"indicator:source:metric", aligned to the countries.json order.
+
+    python data/analytics.py [--db data/iea_electricity.db] [--output data/analytics.cube]
+                             [--cagr-windows 5 10] [--rolling-windows 3]
+"""
+
+import argparse
+import time
+from array import array
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from cube_format import Cube, write_cube
+from data_cube import DataCube
+
+ANALYTICS_NAME = 'analytics.cube'
+CAGR_WINDOWS = (5, 10)
+ROLLING_WINDOWS = (3,)
+
+
+def base_layers(cube):
+    """(indicator:source, (countries, years) absolute values) for every absolute heatmap layer."""
+    layers = [('generation:total', cube.layer('generation'))]
+    layers += [(f"generation:{source}", cube.layer('generation', source)) for source in cube.series['generation']]
+    layers += [('consumption:total', cube.layer('consumption')), ('imports:total', cube.layer('imports'))]
+    return layers
+
+
+def year_over_year(values):
+    """Percent change from the previous year along the last axis."""
+    result = np.full(values.shape, np.nan)
+    previous, current = values[..., :-1], values[..., 1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result[..., 1:] = np.where(previous != 0, (current / previous - 1) * 100, np.nan)
+    return result
+
+
+def cagr(values, window):
+    """Compound annual growth (%) over `window` years along the last axis."""
+    result = np.full(values.shape, np.nan)
+    if values.shape[-1] <= window:
+        return result
+    start, end = values[..., :-window], values[..., window:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result[..., window:] = np.where((start > 0) & (end > 0), ((end / start) ** (1 / window) - 1) * 100, np.nan)
+    return result
+
+
+def rolling_mean(values, window):
+    """Mean of the last `window` years along the last axis; NaN unless all are present."""
+    result = np.full(values.shape, np.nan)
+    if values.shape[-1] < window:
+        return result
+    result[..., window - 1:] = sliding_window_view(values, window, axis=-1).mean(axis=-1)
+    return result
+
+
+def rank_and_percentile(values):
+    """
+    Rank countries within each layer and year.
+
+    Args:
+        values: (layers, countries, years) array, NaN where missing
+
+    Returns: (rank, percentile) arrays of the same shape, NaN where missing
+    """
+    present = ~np.isnan(values)
+    counts = present.sum(axis=1, keepdims=True)
+
+    # Sort each layer and year along the country axis (NaN sorts last)
+    order = np.argsort(values, axis=1, kind='stable')
+    ordered = np.take_along_axis(values, order, axis=1)
+
+    # Countries at or below a value = 1 + position of the last equal value in
+    # sorted order: the end of each run of ties, spread back over the run
+    positions = np.arange(values.shape[1]).reshape(1, -1, 1)
+    run_end = np.ones(values.shape, dtype=bool)
+    run_end[:, :-1] = ordered[:, :-1] != ordered[:, 1:]
+    ends = np.where(run_end, positions, values.shape[1] - 1)
+    ordered_at_or_below = np.flip(np.minimum.accumulate(np.flip(ends, axis=1), axis=1), axis=1) + 1
+
+    at_or_below = np.empty(values.shape, dtype=np.intp)
+    np.put_along_axis(at_or_below, order, ordered_at_or_below, axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Rank 1 + number of larger values, so ties share the best rank
+        rank = np.where(present, counts - at_or_below + 1, np.nan)
+        percentile = np.where(present, at_or_below / counts * 100, np.nan)
+    return rank, percentile
+
+
+def build_analytics(cube, cagr_windows=CAGR_WINDOWS, rolling_windows=ROLLING_WINDOWS):
+    """
+    Compute every analytics layer of a DataCube.
+
+    Returns: cube_format.Cube with one series per "indicator:source:metric"
+    """
+    names, layers = zip(*base_layers(cube))
+    stack = np.stack(layers)
+
+    metrics = [('yoy', year_over_year(stack))]
+    metrics += [(f"cagr{window}", cagr(stack, window)) for window in cagr_windows]
+    metrics += [(f"rolling{window}", rolling_mean(stack, window)) for window in rolling_windows]
+    rank, percentile = rank_and_percentile(stack)
+    metrics += [('rank', rank), ('percentile', percentile)]
+
+    series = [f"{name}:{metric}" for metric, _ in metrics for name in names]
+    # (series, countries, years) -> year x country x series, as the cube format stores it
+    values = np.concatenate([result for _, result in metrics]).transpose(2, 1, 0).astype('<f4')
+
+    return Cube('analytics', None, list(cube.years), list(cube.countries), series,
+                array('f', values.tobytes()))
+
+
+def export_analytics(cube, path, cagr_windows=CAGR_WINDOWS, rolling_windows=ROLLING_WINDOWS):
+    """Write analytics.cube. Returns (number of layers, bytes written)."""
+    analytics = build_analytics(cube, cagr_windows, rolling_windows)
+    return len(analytics.series), write_cube(path, analytics)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compute growth, rolling-mean and ranking layers.")
+    parser.add_argument('--db', type=Path, default=Path('data/iea_electricity.db'))
+    parser.add_argument('--output', type=Path, default=Path('data') / ANALYTICS_NAME)
+    parser.add_argument('--cagr-windows', type=int, nargs='+', default=list(CAGR_WINDOWS),
+                        help="CAGR windows in years (default: %(default)s)")
+    parser.add_argument('--rolling-windows', type=int, nargs='+', default=list(ROLLING_WINDOWS),
+                        help="rolling mean windows in years (default: %(default)s)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    cube = DataCube.load(args.db)
+
+    start = time.perf_counter()
+    analytics = build_analytics(cube, args.cagr_windows, args.rolling_windows)
+    elapsed = time.perf_counter() - start
+
+    size = write_cube(args.output, analytics)
+    print(f"✓ {len(analytics.series)} analytics layers computed in {elapsed * 1000:.1f} ms, "
+          f"{args.output} ({size / 1024:.1f} KB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Immutable, precompressed copies of the exported visualization files.
+
+For every exported artifact (JSON, cubes, shards) publish_artifacts writes:
+- <name>.<hash>.<ext>: a copy named after the first 12 hex digits of its SHA-256
+- <name>.<hash>.<ext>.gz: gzip -9 variant (reproducible, no timestamp)
+- <name>.<hash>.<ext>.br: brotli variant, if the optional brotli package is installed
+
+manifest.json maps each plain name to its hashed file, size and encodings;
+it is the only file the page must revalidate; everything it points to can
+be served with far-future cache headers (and by gzip_static/brotli_static).
+Hashed files that the manifest no longer references are removed.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+HASHED_NAME_PATTERN = re.compile(r'\.[0-9a-f]{%d}\.[^.]+(\.gz|\.br)?$' % HASH_LENGTH)
+ARTIFACT_SUFFIXES = ('.json', '.cube')
+
+
+def is_hashed_name(name):
+    return HASHED_NAME_PATTERN.search(name) is not None
+
+
+def find_artifacts(output_dir, exclude=()):
+    """Return every plain (unhashed) artifact under output_dir, relative, in sorted order."""
+    return sorted(
+        path.relative_to(output_dir) for path in output_dir.rglob('*')
+        if path.suffix in ARTIFACT_SUFFIXES and path.name != MANIFEST_NAME and path.name not in exclude
+        and not is_hashed_name(path.name)
+    )
+
+
+def write_variant(path, data, compress=None):
+    """
+    Hashed files never change, so an existing one is neither recompressed nor
+    rewritten. New ones are written to a temporary file and renamed into
+    place, so an interrupted export never leaves a truncated hashed file.
+    """
+    if not path.exists():
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_bytes(compress(data) if compress else data)
+        os.replace(tmp_path, path)
+    return path.stat().st_size
+
+
+def publish_artifact(output_dir, relative_path):
+    """Write the hashed and compressed copies of one artifact. Returns its manifest entry."""
+    data = (output_dir / relative_path).read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+
+    hashed = relative_path.with_name(f"{relative_path.stem}.{digest[:HASH_LENGTH]}{relative_path.suffix}")
+    write_variant(output_dir / hashed, data)
+
+    compressors = {'gzip': ('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))}
+    if brotli:
+        compressors['br'] = ('.br', lambda data: brotli.compress(data, quality=11))
+
+    encodings = {}
+    for encoding, (suffix, compress) in compressors.items():
+        path = hashed.with_name(hashed.name + suffix)
+        size = write_variant(output_dir / path, data, compress)
+        encodings[encoding] = {'path': path.as_posix(), 'size': size}
+
+    return {
+        'path': hashed.as_posix(),
+        'size': len(data),
+        'encodings': encodings
+    }
+
+
+def remove_unreferenced(output_dir, files):
+    """Delete hashed files left over from earlier exports."""
+    referenced = set()
+    for entry in files.values():
+        referenced.add(entry['path'])
+        referenced.update(encoding['path'] for encoding in entry['encodings'].values())
+
+    removed = 0
+    for path in output_dir.rglob('*'):
+        if path.is_file() and is_hashed_name(path.name) and path.relative_to(output_dir).as_posix() not in referenced:
+            path.unlink()
+            removed += 1
+    return removed
+
+
+def load_manifest(output_dir):
+    path = output_dir / MANIFEST_NAME
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def publish_artifacts(output_dir, rewritten=None, exclude=()):
+    """
+    Publish the artifacts in output_dir and write manifest.json.
+
+    Args:
+        output_dir: Export directory
+        rewritten: relative names of the files written by this export; the
+            manifest entries of every other file are reused without reading
+            it. None republishes everything.
+        exclude: file names that are not artifacts (e.g. exporter state)
+
+    Returns: manifest dict
+    """
+    previous = load_manifest(output_dir) if rewritten is not None else None
+    previous_files = previous['files'] if previous else {}
+
+    files = {}
+    for relative_path in find_artifacts(output_dir, exclude):
+        name = relative_path.as_posix()
+        if previous and name not in rewritten and name in previous_files:
+            files[name] = previous_files[name]
+        else:
+            files[name] = publish_artifact(output_dir, relative_path)
+    manifest = {'version': 1, 'files': files}
+
+    # Written atomically once every file it names exists; stale copies go after
+    tmp_path = output_dir / (MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, separators=(',', ':'), sort_keys=True)
+    os.replace(tmp_path, output_dir / MANIFEST_NAME)
+
+    remove_unreferenced(output_dir, files)
+
+    return manifest
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Country groups and their rollups in iea_electricity.db.
+
+The IEA pages are scraped per country (classify_file drops the regional
+files), so group figures are summed here from the member countries.
+Membership comes from country_groups.csv, one row per country: continent,
+World Bank income group (FY2025 classification) and EU/IEA/OECD membership
+(as of 2024).
+
+Tables:
+- country_groups: one row per group (group_code, group_type, name)
+- country_group_members: (group_id, country_id)
+- group_series: member sums of every series and unit per group and year,
+  with the number of members reporting a value (rows without units are
+  summed under unit_id NO_UNIT_ID, since the unit is part of the key)
+- group_year_totals: member sums of country_year_totals, with the number of
+  members reporting generation, consumption and trade
+- group_generation_shares: each source's share (%) of a group's GWh generation
+
+Trade figures (imports, exports, net_imports, and the imports/exports
+series) are gross: they are plain member sums, so electricity traded between
+two members counts as an import of one and an export of the other. Netting
+out intra-group trade would need bilateral flows, which the per-country IEA
+pages do not have.
+
+A group's sums depend on all its members, so instead of being refreshed per
+country the rollups are rebuilt with one GROUP BY pass per table, once per
+loader run (and when the membership file changes).
+
+Running this module syncs the membership and rebuilds every rollup:
+    python data/country_groups.py [data/iea_electricity.db]
+"""
+
+import csv
+import re
+import sqlite3
+import sys
+from pathlib import Path
+
+from aggregates import GENERATION_UNIT
+from db_schema import FACT_TABLES
+
+GROUPS_CSV = Path(__file__).with_name('country_groups.csv')
+
+# group_series.unit_id of sums over rows with a blank units cell (no units row has id 0)
+NO_UNIT_ID = 0
+
+ORGANIZATION_NAMES = {
+    'EU': 'European Union',
+    'IEA': 'IEA members',
+    'OECD': 'OECD members'
+}
+
+
+def group_code(name):
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+
+def read_group_members(path=GROUPS_CSV):
+    """Return {(group_code, group_type, name): [country_code, ...]} from the membership file."""
+    groups = {}
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            memberships = [('region', row['region']), ('income', row['income_group'])]
+            memberships += [('organization', ORGANIZATION_NAMES[org]) for org in row['organizations'].split()]
+            for group_type, name in memberships:
+                if name:
+                    groups.setdefault((group_code(name), group_type, name), []).append(row['country_code'])
+    return groups
+
+
+def create_group_tables(conn, path=GROUPS_CSV):
+    """Create the group tables, rebuilding the rollups if they are new or the membership changed."""
+    exists = conn.execute("""
+        SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'country_groups'
+    """).fetchone()
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS country_groups (
+            id INTEGER PRIMARY KEY,
+            group_code TEXT UNIQUE NOT NULL,
+            group_type TEXT NOT NULL,
+            name TEXT NOT NULL
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS country_group_members (
+            group_id INTEGER NOT NULL REFERENCES country_groups(id),
+            country_id INTEGER NOT NULL REFERENCES countries(id),
+            PRIMARY KEY (group_id, country_id)
+        ) WITHOUT ROWID
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS group_series (
+            group_id INTEGER NOT NULL REFERENCES country_groups(id),
+            year INTEGER NOT NULL,
+            series_id INTEGER NOT NULL REFERENCES series(id),
+            unit_id INTEGER NOT NULL REFERENCES units(id),
+            value REAL,
+            countries INTEGER NOT NULL,
+            PRIMARY KEY (group_id, year, series_id, unit_id)
+        ) WITHOUT ROWID
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS group_year_totals (
+            group_id INTEGER NOT NULL REFERENCES country_groups(id),
+            year INTEGER NOT NULL,
+            generation_gwh REAL,
+            emissions_mtco2 REAL,
+            consumption REAL,
+            imports REAL,
+            exports REAL,
+            net_imports REAL,
+            generation_countries INTEGER NOT NULL,
+            consumption_countries INTEGER NOT NULL,
+            trade_countries INTEGER NOT NULL,
+            PRIMARY KEY (group_id, year)
+        ) WITHOUT ROWID
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS group_generation_shares (
+            group_id INTEGER NOT NULL REFERENCES country_groups(id),
+            year INTEGER NOT NULL,
+            series_id INTEGER NOT NULL REFERENCES series(id),
+            share REAL,
+            PRIMARY KEY (group_id, year, series_id)
+        ) WITHOUT ROWID
+    """)
+
+    if sync_group_members(conn, path) or not exists:
+        rebuild_group_rollups(conn)
+
+
+def sync_group_members(conn, path=GROUPS_CSV):
+    """
+    Make the group tables match the membership file (for countries in the
+    database). Returns True if anything changed.
+    """
+    groups = read_group_members(path)
+    country_ids = dict(conn.execute("SELECT country_code, id FROM countries"))
+
+    current_groups = {row[1:]: row[0] for row in conn.execute(
+        "SELECT id, group_code, group_type, name FROM country_groups")}
+    changed = set(current_groups) != set(groups)
+    if changed:
+        conn.executemany("""
+            INSERT INTO country_groups (group_code, group_type, name) VALUES (?, ?, ?)
+            ON CONFLICT (group_code) DO UPDATE SET group_type = excluded.group_type, name = excluded.name
+        """, sorted(groups))
+        codes = [code for code, _, _ in groups]
+        conn.execute(f"DELETE FROM country_groups WHERE group_code NOT IN ({', '.join('?' * len(codes))})", codes)
+
+    group_ids = dict(conn.execute("SELECT group_code, id FROM country_groups"))
+    members = {(group_ids[code], country_ids[country_code])
+               for (code, _, _), country_codes in groups.items()
+               for country_code in country_codes if country_code in country_ids}
+
+    if members != set(conn.execute("SELECT group_id, country_id FROM country_group_members")):
+        conn.execute("DELETE FROM country_group_members")
+        conn.executemany("INSERT INTO country_group_members (group_id, country_id) VALUES (?, ?)", sorted(members))
+        changed = True
+    return changed
+
+
+def rebuild_group_rollups(conn):
+    """
+    Recompute every group's sums, one pass per table (committed by the caller).
+    Trade sums include trade between members (see the module docstring).
+    """
+    conn.execute("DELETE FROM group_series")
+    for fact_table, _, _ in FACT_TABLES.values():
+        conn.execute(f"""
+            INSERT INTO group_series (group_id, year, series_id, unit_id, value, countries)
+            SELECT m.group_id, f.year, f.series_id, COALESCE(f.unit_id, :no_unit), SUM(f.value), COUNT(f.value)
+            FROM {fact_table} f
+            JOIN country_group_members m ON m.country_id = f.country_id
+            GROUP BY m.group_id, f.year, f.series_id, COALESCE(f.unit_id, :no_unit)
+        """, {'no_unit': NO_UNIT_ID})
+
+    conn.execute("DELETE FROM group_year_totals")
+    conn.execute("""
+        INSERT INTO group_year_totals
+            (group_id, year, generation_gwh, emissions_mtco2, consumption, imports, exports, net_imports,
+             generation_countries, consumption_countries, trade_countries)
+        SELECT m.group_id, t.year, SUM(t.generation_gwh), SUM(t.emissions_mtco2), SUM(t.consumption),
+               SUM(t.imports), SUM(t.exports), SUM(t.net_imports),
+               COUNT(t.generation_gwh), COUNT(t.consumption), COUNT(t.net_imports)
+        FROM country_year_totals t
+        JOIN country_group_members m ON m.country_id = t.country_id
+        GROUP BY m.group_id, t.year
+    """)
+
+    conn.execute("DELETE FROM group_generation_shares")
+    conn.execute("""
+        INSERT INTO group_generation_shares (group_id, year, series_id, share)
+        SELECT g.group_id, g.year, g.series_id,
+               CASE WHEN t.generation_gwh > 0 THEN COALESCE(g.value, 0) * 100.0 / t.generation_gwh END
+        FROM group_series g
+        JOIN series s ON s.id = g.series_id AND s.dataset = 'generation'
+        JOIN units u ON u.id = g.unit_id AND u.name = ?
+        JOIN group_year_totals t ON t.group_id = g.group_id AND t.year = g.year
+    """, (GENERATION_UNIT,))
+
+
+def refresh_group_rollups(conn, path=GROUPS_CSV):
+    """Sync the membership (new countries may have been loaded) and rebuild the rollups."""
+    sync_group_members(conn, path)
+    rebuild_group_rollups(conn)
+    return conn.execute("SELECT COUNT(*) FROM country_groups").fetchone()[0]
+
+
+def main():
+    db_path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path('data/iea_electricity.db')
+
+    conn = sqlite3.connect(db_path)
+    create_group_tables(conn)
+    count = refresh_group_rollups(conn)
+    conn.commit()
+    conn.close()
+
+    print(f"Rebuilt rollups for {count} country groups in {db_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Streaming parser for the IEA chart CSVs, shared by the database loaders.
+
+After a title row, every data row is [source/sector/flow_type, value, year, units].
+Rows are yielded one at a time as compact Record tuples, so a file is never
+held in memory and records can be fed straight into executemany.
+"""
+
+import csv
+import io
+from collections import namedtuple
+
+# Field order matches the (series, year, value, units) insert columns
+Record = namedtuple('Record', ['series', 'year', 'value', 'units'])
+
+
+def iter_records(lines):
+    """
+    Yield a Record for every usable data row of CSV lines from any iterable
+    (open file, StringIO, ...). Rows without a series name or year are skipped.
+    """
+    reader = csv.reader(lines)
+
+    # First row is header
+    if next(reader, None) is None:
+        return
+
+    for row in reader:
+        if len(row) < 4:
+            continue
+
+        series = row[0].strip(' "')
+        if not series:
+            continue
+
+        try:
+            year = int(row[2]) if row[2].strip() else None
+        except ValueError:
+            year = None
+        if year is None:
+            continue
+
+        try:
+            value = float(row[1]) if row[1].strip() else None
+        except ValueError:
+            value = None
+
+        yield Record(series, year, value, row[3].strip())
+
+
+def iter_csv_file(filepath):
+    """Stream records from a CSV file on disk."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        yield from iter_records(f)
+
+
+def iter_csv_text(content):
+    """Stream records from CSV content already in memory (e.g. straight from the scraper)."""
+    return iter_records(io.StringIO(content))
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Dense binary cube format for the visualization data (.cube files).
+
+One file holds one set of layers (heatmap.cube, analytics.cube) as a
+float32 cube of year x country x series, so the browser can view it as a
+Float32Array without parsing anything (see js/cubeDecoder.js).
+
+Layout (little-endian):
+    magic        4s   b'IECB'
+    version      u16  CUBE_VERSION
+    flags        u16  FLAG_DELTA if frames are delta-encoded
+    n_years      u32
+    n_countries  u32
+    n_series     u32
+    dict_length  u32  length of the dimension dictionary
+    dictionary        UTF-8 JSON {dataset, units, years, countries, series},
+                      space-padded so the data starts on a 4-byte boundary
+    data              n_years * n_countries * n_series float32, one frame
+                      (country x series) per year
+
+Missing values are NaN. With FLAG_DELTA every frame after the first stores
+the change from the previous decoded frame (a missing previous value counts
+as 0), so a player can step through years by adding one frame. Deltas are
+taken against decoded float32 values, so rounding never accumulates.
+
+Running this module prints a cube's dimensions:
+    python data/cube_format.py data/heatmap.cube
+"""
+
+import json
+import math
+import struct
+import sys
+from array import array
+from collections import namedtuple
+from pathlib import Path
+
+CUBE_MAGIC = b'IECB'
+CUBE_VERSION = 1
+FLAG_DELTA = 1
+
+HEADER = struct.Struct('<4sHHIIII')
+
+Cube = namedtuple('Cube', ['dataset', 'units', 'years', 'countries', 'series', 'values'])
+
+
+def build_cube(rows, dataset, units, countries, years, series):
+    """
+    Fill a cube from (country_code, year, series, value) rows.
+
+    Returns: Cube whose values is a flat array('f') in year, country, series order
+    """
+    country_index = {code: i for i, code in enumerate(countries)}
+    year_index = {year: i for i, year in enumerate(years)}
+    series_index = {name: i for i, name in enumerate(series)}
+    n_countries, n_series = len(countries), len(series)
+
+    values = array('f', [math.nan]) * (len(years) * n_countries * n_series)
+    for country_code, year, name, value in rows:
+        if value is not None:
+            offset = (year_index[year] * n_countries + country_index[country_code]) * n_series
+            values[offset + series_index[name]] = value
+
+    return Cube(dataset, units, list(years), list(countries), list(series), values)
+
+
+def delta_encode(values, frame_size):
+    """Replace every frame after the first with its difference from the previous decoded frame."""
+    encoded = array('f', values)
+    decoded = array('f', values[:frame_size])
+    for start in range(frame_size, len(values), frame_size):
+        for i in range(frame_size):
+            previous = decoded[i]
+            if math.isnan(previous):
+                previous = 0.0
+            encoded[start + i] = values[start + i] - previous
+            decoded[i] = encoded[start + i] + previous
+    return encoded
+
+
+def delta_decode(values, frame_size):
+    """Inverse of delta_encode, mirroring the float32 arithmetic of the JS decoder."""
+    decoded = array('f', values)
+    for start in range(frame_size, len(values), frame_size):
+        for i in range(frame_size):
+            previous = decoded[start - frame_size + i]
+            if math.isnan(previous):
+                previous = 0.0
+            decoded[start + i] = values[start + i] + previous
+    return decoded
+
+
+def write_cube(path, cube, delta=True):
+    """Write a Cube to path. Returns the number of bytes written."""
+    dictionary = json.dumps({
+        'dataset': cube.dataset,
+        'units': cube.units,
+        'years': cube.years,
+        'countries': cube.countries,
+        'series': cube.series
+    }, separators=(',', ':')).encode('utf-8')
+    dictionary += b' ' * (-(HEADER.size + len(dictionary)) % 4)
+
+    frame_size = len(cube.countries) * len(cube.series)
+    values = delta_encode(cube.values, frame_size) if delta else array('f', cube.values)
+    if sys.byteorder != 'little':
+        values.byteswap()
+
+    header = HEADER.pack(CUBE_MAGIC, CUBE_VERSION, FLAG_DELTA if delta else 0,
+                         len(cube.years), len(cube.countries), len(cube.series), len(dictionary))
+
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(dictionary)
+        values.tofile(f)
+    return len(header) + len(dictionary) + len(values) * values.itemsize
+
+
+def patch_cube(path, rows, countries):
+    """
+    Rewrite the values of some countries in an existing cube file in place.
+
+    Args:
+        path: .cube file
+        rows: (country_code, year, series, value) rows of exactly those countries
+        countries: country codes to rewrite (countries without rows become missing)
+
+    Returns: True if patched, False if the rows need a country, year or series
+    the file has no slot for (the file is left untouched; rebuild it instead)
+    """
+    data = bytearray(Path(path).read_bytes())
+    magic, version, flags, n_years, n_countries, n_series, dict_length = HEADER.unpack_from(data)
+    if magic != CUBE_MAGIC or version != CUBE_VERSION:
+        return False
+
+    dictionary = json.loads(data[HEADER.size:HEADER.size + dict_length].decode('utf-8'))
+    country_index = {code: i for i, code in enumerate(dictionary['countries'])}
+    year_index = {year: i for i, year in enumerate(dictionary['years'])}
+    series_index = {name: i for i, name in enumerate(dictionary['series'])}
+    if any(code not in country_index for code in countries):
+        return False
+
+    # One year x series column per country; columns are independent of each other
+    columns = {code: array('f', [math.nan]) * (n_years * n_series) for code in countries}
+    for country_code, year, name, value in rows:
+        if year not in year_index or name not in series_index:
+            return False
+        if value is not None:
+            columns[country_code][year_index[year] * n_series + series_index[name]] = value
+
+    data_offset = HEADER.size + dict_length
+    for country_code, column in columns.items():
+        if flags & FLAG_DELTA:
+            column = delta_encode(column, n_series)
+        if sys.byteorder != 'little':
+            column.byteswap()
+
+        c = country_index[country_code]
+        for y in range(n_years):
+            offset = data_offset + (y * n_countries + c) * n_series * column.itemsize
+            data[offset:offset + n_series * column.itemsize] = column[y * n_series:(y + 1) * n_series].tobytes()
+
+    Path(path).write_bytes(data)
+    return True
+
+
+def read_cube(path):
+    """Read a .cube file back into a Cube with decoded (absolute) values."""
+    data = Path(path).read_bytes()
+    magic, version, flags, n_years, n_countries, n_series, dict_length = HEADER.unpack_from(data)
+    if magic != CUBE_MAGIC or version != CUBE_VERSION:
+        raise ValueError(f"{path} is not a version {CUBE_VERSION} cube file")
+
+    dictionary = json.loads(data[HEADER.size:HEADER.size + dict_length].decode('utf-8'))
+
+    values = array('f')
+    values.frombytes(data[HEADER.size + dict_length:])
+    if sys.byteorder != 'little':
+        values.byteswap()
+    if len(values) != n_years * n_countries * n_series:
+        raise ValueError(f"{path} is truncated")
+
+    if flags & FLAG_DELTA:
+        values = delta_decode(values, n_countries * n_series)
+
+    return Cube(dictionary['dataset'], dictionary['units'], dictionary['years'],
+                dictionary['countries'], dictionary['series'], values)
+
+
+def cube_value(cube, country_code, year, series):
+    """Look up one value, None if missing."""
+    n_countries, n_series = len(cube.countries), len(cube.series)
+    offset = (cube.years.index(year) * n_countries + cube.countries.index(country_code)) * n_series
+    value = cube.values[offset + cube.series.index(series)]
+    return None if math.isnan(value) else value
+
+
+def main():
+    for path in sys.argv[1:]:
+        cube = read_cube(path)
+        present = sum(1 for value in cube.values if not math.isnan(value))
+        print(f"{path}: {cube.dataset} ({cube.units}), {len(cube.years)} years x "
+              f"{len(cube.countries)} countries x {len(cube.series)} series, "
+              f"{present:,} values, {Path(path).stat().st_size / 1024:.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
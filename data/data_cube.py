@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+In-memory NumPy query library over iea_electricity.db.
+
+DataCube.load() reads the fact tables once into dense float64 cubes of
+country x year x series (NaN = missing), one per dataset:
+- generation: GWh rows of generation_facts
+- emissions: MtCO2 rows of generation_facts
+- trade: imports_exports_facts (Imports, Exports)
+- consumption: final_consumption_facts
+
+and exposes the same computations as the globe (js/dataManager.js) and the
+aggregate tables, vectorized over all countries and years at once: totals,
+shares, net imports, indexed values, heatmap layers and country time series.
+Results are kept in a bounded LRU cache and returned read-only.
+
+    from data_cube import DataCube
+    cube = DataCube.load('data/iea_electricity.db')
+    cube.heatmap('generation', 2023, source='Wind', value_type='share')
+
+The export step also writes the cubes to a snapshot file (data_cube.snapshot)
+that DataCube.open_snapshot() memory-maps instead of querying SQLite: the
+arrays are views of the mapped file, so opening takes milliseconds and every
+process that opens it shares the same pages of the OS cache.
+
+Snapshot layout (little-endian):
+    magic        4s   b'IECS'
+    version      u16  SNAPSHOT_VERSION
+    reserved     u16
+    dict_length  u32  length of the dictionary
+    dictionary        UTF-8 JSON {countries, years, datasets: {name: {series,
+                      values, present}}}, values/present being offsets from
+                      the data start
+    data              from the next SNAPSHOT_ALIGNMENT boundary: per dataset,
+                      float64 values (country x year x series, NaN = missing)
+                      and a uint8 present mask (country x year), each aligned
+
+Running this module opens a database or snapshot and times the main queries:
+    python data/data_cube.py [data/iea_electricity.db | data/data_cube.snapshot]
+"""
+
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from aggregates import EMISSIONS_UNIT, GENERATION_UNIT
+
+QUERY_CACHE_SIZE = 256
+
+SNAPSHOT_NAME = 'data_cube.snapshot'
+SNAPSHOT_MAGIC = b'IECS'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<4sHHI')
+SNAPSHOT_ALIGNMENT = 64
+
+# Dataset -> (fact table, unit filter or None)
+CUBE_DATASETS = {
+    'generation': ('generation_facts', GENERATION_UNIT),
+    'emissions': ('generation_facts', EMISSIONS_UNIT),
+    'trade': ('imports_exports_facts', None),
+    'consumption': ('final_consumption_facts', None)
+}
+
+# Heatmap indicator -> dataset
+INDICATOR_DATASETS = {
+    'generation': 'generation',
+    'consumption': 'consumption',
+    'imports': 'trade'
+}
+
+
+def read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+def aligned(offset):
+    return -(-offset // SNAPSHOT_ALIGNMENT) * SNAPSHOT_ALIGNMENT
+
+
+class DataCube:
+    """Dense per-dataset cubes with shared country and year axes and an LRU result cache."""
+
+    def __init__(self, countries, years, series, values, present, cache_size=QUERY_CACHE_SIZE):
+        """
+        Args:
+            countries: country codes (axis 0 of every cube)
+            years: sorted years (axis 1 of every cube)
+            series: dict of dataset -> series names (axis 2 of that dataset's cube)
+            values: dict of dataset -> float64 array (countries, years, series)
+            present: dict of dataset -> bool array (countries, years), True where
+                any row exists (even with a NULL value)
+        """
+        self.countries = list(countries)
+        self.years = list(years)
+        self.series = {dataset: list(names) for dataset, names in series.items()}
+        self.values = {dataset: read_only(array) for dataset, array in values.items()}
+        self.present = {dataset: read_only(array) for dataset, array in present.items()}
+
+        self.country_index = {code: i for i, code in enumerate(self.countries)}
+        self.year_index = {year: i for i, year in enumerate(self.years)}
+        self.series_index = {dataset: {name: i for i, name in enumerate(names)}
+                             for dataset, names in self.series.items()}
+
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    @classmethod
+    def load(cls, db_path=Path('data/iea_electricity.db'), cache_size=QUERY_CACHE_SIZE):
+        """Read every fact table once into cubes."""
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+        country_rows = conn.execute("SELECT id, country_code FROM countries ORDER BY country_code").fetchall()
+        countries = [code for _, code in country_rows]
+        country_lookup = np.full(max(country_id for country_id, _ in country_rows) + 1, -1, dtype=np.intp)
+        country_lookup[[country_id for country_id, _ in country_rows]] = np.arange(len(country_rows))
+
+        years = np.array([row[0] for row in conn.execute("""
+            SELECT year FROM generation_facts
+            UNION SELECT year FROM imports_exports_facts
+            UNION SELECT year FROM final_consumption_facts
+            ORDER BY year
+        """)], dtype=np.int64)
+
+        series, values, present = {}, {}, {}
+        for dataset, (fact_table, unit) in CUBE_DATASETS.items():
+            unit_filter = "JOIN units u ON u.id = f.unit_id AND u.name = ?" if unit else ""
+            params = (unit,) if unit else ()
+
+            series_rows = conn.execute(f"""
+                SELECT DISTINCT s.id, s.name FROM {fact_table} f
+                JOIN series s ON s.id = f.series_id {unit_filter}
+                ORDER BY s.name
+            """, params).fetchall()
+            series[dataset] = [name for _, name in series_rows]
+            series_lookup = np.full(max([series_id for series_id, _ in series_rows], default=0) + 1, -1,
+                                    dtype=np.intp)
+            series_lookup[[series_id for series_id, _ in series_rows]] = np.arange(len(series_rows))
+
+            rows = np.array(conn.execute(f"""
+                SELECT f.country_id, f.year, f.series_id, f.value FROM {fact_table} f {unit_filter}
+            """, params).fetchall(), dtype=np.float64).reshape(-1, 4)
+
+            c = country_lookup[rows[:, 0].astype(np.intp)]
+            y = np.searchsorted(years, rows[:, 1].astype(np.int64))
+            s = series_lookup[rows[:, 2].astype(np.intp)]
+
+            cube = np.full((len(countries), len(years), len(series_rows)), np.nan)
+            cube[c, y, s] = rows[:, 3]
+            values[dataset] = cube
+
+            mask = np.zeros((len(countries), len(years)), dtype=bool)
+            mask[c, y] = True
+            present[dataset] = mask
+
+        conn.close()
+        return cls(countries, years.tolist(), series, values, present, cache_size)
+
+    @classmethod
+    def open_snapshot(cls, path=Path('data') / SNAPSHOT_NAME, cache_size=QUERY_CACHE_SIZE):
+        """Memory-map a snapshot written by write_snapshot (no copy, no SQLite)."""
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, dict_length = SNAPSHOT_HEADER.unpack_from(mapped)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} data cube snapshot")
+
+        dictionary = json.loads(mapped[SNAPSHOT_HEADER.size:SNAPSHOT_HEADER.size + dict_length])
+        data_start = aligned(SNAPSHOT_HEADER.size + dict_length)
+        n_countries, n_years = len(dictionary['countries']), len(dictionary['years'])
+
+        # The arrays keep the mapping alive; it is unmapped when the last one goes
+        series, values, present = {}, {}, {}
+        for dataset, layout in dictionary['datasets'].items():
+            series[dataset] = layout['series']
+            shape = (n_countries, n_years, len(layout['series']))
+            values[dataset] = np.frombuffer(mapped, dtype='<f8', count=int(np.prod(shape)),
+                                            offset=data_start + layout['values']).reshape(shape)
+            present[dataset] = np.frombuffer(mapped, dtype=np.bool_, count=n_countries * n_years,
+                                             offset=data_start + layout['present']).reshape(n_countries, n_years)
+
+        return cls(dictionary['countries'], dictionary['years'], series, values, present, cache_size)
+
+    def write_snapshot(self, path):
+        """
+        Write the cubes to a snapshot file for open_snapshot. The file is
+        replaced atomically, so processes that mapped the old one keep it.
+
+        Returns: bytes written
+        """
+        arrays, datasets, offset = [], {}, 0
+        for dataset, names in self.series.items():
+            values = self.values[dataset].astype('<f8', copy=False)
+            present = self.present[dataset].astype(np.bool_, copy=False)
+            datasets[dataset] = {'series': names, 'values': offset, 'present': aligned(offset + values.nbytes)}
+            arrays += [(offset, values), (datasets[dataset]['present'], present)]
+            offset = aligned(datasets[dataset]['present'] + present.nbytes)
+
+        dictionary = json.dumps({
+            'countries': self.countries,
+            'years': self.years,
+            'datasets': datasets
+        }, separators=(',', ':')).encode('utf-8')
+        data_start = aligned(SNAPSHOT_HEADER.size + len(dictionary))
+
+        tmp_path = Path(str(path) + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, len(dictionary)))
+            f.write(dictionary)
+            for array_offset, array in arrays:
+                f.write(b'\0' * (data_start + array_offset - f.tell()))
+                f.write(np.ascontiguousarray(array).tobytes())
+            size = f.tell()
+        os.replace(tmp_path, path)
+        return size
+
+    def cached(self, key, compute):
+        """Return compute() through the bounded LRU cache."""
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        result = compute()
+        if isinstance(result, np.ndarray):
+            read_only(result)
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
+
+    def series_values(self, dataset, name):
+        """(countries, years) values of one series, NaN where missing."""
+        index = self.series_index[dataset].get(name)
+        if index is None:
+            return np.full((len(self.countries), len(self.years)), np.nan)
+        return self.values[dataset][:, :, index]
+
+    def total(self, dataset):
+        """(countries, years) sum over series; NaN where a country-year has no values."""
+        def compute():
+            cube = self.values[dataset]
+            return np.where(np.isnan(cube).all(axis=2), np.nan, np.nansum(cube, axis=2))
+        return self.cached(('total', dataset), compute)
+
+    def net_imports(self):
+        """(countries, years) imports minus |exports|, missing flows counting as 0 in trade years."""
+        def compute():
+            imports = np.nan_to_num(self.series_values('trade', 'Imports'))
+            exports = np.abs(np.nan_to_num(self.series_values('trade', 'Exports')))
+            return np.where(self.present['trade'], imports - exports, np.nan)
+        return self.cached(('net_imports',), compute)
+
+    def share(self, source):
+        """(countries, years) share (%) of one source in GWh generation."""
+        def compute():
+            total = self.total('generation')
+            value = self.series_values('generation', source)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.where(~np.isnan(value) & (total > 0), value / total * 100, np.nan)
+        return self.cached(('share', source), compute)
+
+    def indexed(self, layer, base_year):
+        """Divide every year by base_year (x100) where the base value is present and non-zero."""
+        base_index = self.year_index.get(base_year)
+        if base_index is None:
+            return layer
+        base = layer[:, base_index:base_index + 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(~np.isnan(base) & (base != 0), layer / base * 100, layer)
+
+    def layer(self, indicator, source='total', value_type='absolute', base_year=None):
+        """
+        Whole heatmap indicator as a (countries, years) array, with the same
+        semantics as DataManager.getHeatmapData.
+        """
+        def compute():
+            layer_source = source if indicator == 'generation' else 'total'
+            if indicator == 'imports':
+                values = self.net_imports()
+            elif layer_source == 'total':
+                values = self.total(INDICATOR_DATASETS[indicator])
+            elif value_type == 'share':
+                values = self.share(layer_source)
+            else:
+                values = self.series_values('generation', layer_source)
+
+            if value_type == 'indexed' and base_year:
+                return self.indexed(values, base_year)
+            return values.copy()
+        return self.cached(('layer', indicator, source, value_type, base_year), compute)
+
+    def heatmap(self, indicator, year, source='total', value_type='absolute', base_year=None):
+        """{country_code: value} for one year, skipping missing and zero values like the globe."""
+        year_index = self.year_index.get(year)
+        if year_index is None:
+            return {}
+        column = self.layer(indicator, source, value_type, base_year)[:, year_index]
+        keep = ~np.isnan(column) & (column != 0)
+        return {self.countries[i]: float(column[i]) for i in np.flatnonzero(keep)}
+
+    def country_series(self, dataset, country_code):
+        """
+        A country's time series for one dataset.
+
+        Returns: {'years': [...], 'series': {name: [value or None, ...]}} over the
+        years with data, or None if the country has no data in the dataset
+        """
+        country = self.country_index.get(country_code)
+        if country is None:
+            return None
+
+        years = np.flatnonzero(self.present[dataset][country])
+        if not len(years):
+            return None
+
+        block = self.values[dataset][country, years]
+        return {
+            'years': [self.years[i] for i in years],
+            'series': {
+                name: [None if np.isnan(value) else float(value) for value in block[:, i]]
+                for i, name in enumerate(self.series[dataset])
+                if not np.isnan(block[:, i]).all()
+            }
+        }
+
+
+def time_call(function, repeat=1000):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path('data/iea_electricity.db')
+
+    start = time.perf_counter()
+    cube = DataCube.open_snapshot(path) if path.suffix == Path(SNAPSHOT_NAME).suffix else DataCube.load(path)
+    print(f"Loaded {path} in {(time.perf_counter() - start) * 1000:.1f} ms: "
+          f"{len(cube.countries)} countries x {len(cube.years)} years")
+    for dataset, names in cube.series.items():
+        print(f"  {dataset:12s} {len(names):3d} series, {np.count_nonzero(~np.isnan(cube.values[dataset])):,} values")
+
+    queries = [
+        ('total generation, all countries/years', lambda: cube.layer('generation')),
+        ('Wind share, all countries/years', lambda: cube.layer('generation', 'Wind', 'share')),
+        ('net imports indexed to 2010', lambda: cube.layer('imports', value_type='indexed', base_year=2010)),
+        ('consumption heatmap 2023', lambda: cube.heatmap('consumption', 2023))
+    ]
+
+    print("\nQuery timings (cold / cached):")
+    for label, query in queries:
+        cube.cache.clear()
+        cold = time_call(query, repeat=1)
+        cached = time_call(query)
+        print(f"  {label:40s} {cold:9.1f} µs / {cached:6.2f} µs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Compact fact-table schema for iea_electricity.db.
+
+Dimension tables:
+- countries: country metadata (integer id, as before)
+- series: one row per (dataset, source/sector/flow name)
+- units: one row per unit string
+
+Fact tables, WITHOUT ROWID and clustered on (country_id, year, series_id) so
+per-country scans read a contiguous range of the primary key, with a covering
+(year, ...) index for per-year scans:
+- generation_facts, imports_exports_facts, final_consumption_facts
+
+The original generation_data, imports_exports_data and final_consumption_data
+tables are replaced by views with the same names and columns, so readers
+(the JSON exporter, ad-hoc SQL) keep working unchanged.
+
+Running this module migrates an existing database file in place:
+    python data/db_schema.py [data/iea_electricity.db]
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+# Dataset type -> (fact table, legacy table/view name, legacy series column)
+FACT_TABLES = {
+    'generation': ('generation_facts', 'generation_data', 'source'),
+    'imports_exports': ('imports_exports_facts', 'imports_exports_data', 'flow_type'),
+    'final_consumption': ('final_consumption_facts', 'final_consumption_data', 'sector')
+}
+
+# Covering per-year indexes, dropped during bulk loads and rebuilt afterwards
+YEAR_INDEXES = {
+    f"idx_{fact_table}_year": f"{fact_table}(year, unit_id, value)"
+    for fact_table, _, _ in FACT_TABLES.values()
+}
+
+
+def default_country_name(country_code):
+    """Display name stored for a country slug, e.g. 'united-states' -> 'United States'."""
+    return country_code.replace('-', ' ').title()
+
+
+def create_schema(conn):
+    """Create dimension and fact tables and the legacy views, migrating old tables first."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS series (
+            id INTEGER PRIMARY KEY,
+            dataset TEXT NOT NULL,
+            name TEXT NOT NULL,
+            UNIQUE(dataset, name)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS units (
+            id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL
+        )
+    """)
+
+    for fact_table, _, _ in FACT_TABLES.values():
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {fact_table} (
+                country_id INTEGER NOT NULL REFERENCES countries(id),
+                year INTEGER NOT NULL,
+                series_id INTEGER NOT NULL REFERENCES series(id),
+                unit_id INTEGER REFERENCES units(id),
+                value REAL,
+                PRIMARY KEY (country_id, year, series_id)
+            ) WITHOUT ROWID
+        """)
+
+    create_year_indexes(conn)
+
+    if has_legacy_tables(conn):
+        migrate_legacy_tables(conn)
+
+    for dataset, (fact_table, legacy_name, column) in FACT_TABLES.items():
+        conn.execute(f"""
+            CREATE VIEW IF NOT EXISTS {legacy_name} AS
+            SELECT c.country_code, s.name AS {column}, f.year, f.value, u.name AS units
+            FROM {fact_table} f
+            JOIN countries c ON c.id = f.country_id
+            JOIN series s ON s.id = f.series_id
+            LEFT JOIN units u ON u.id = f.unit_id
+        """)
+
+
+def create_year_indexes(conn):
+    for name, target in YEAR_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+
+def has_legacy_tables(conn):
+    legacy_names = [legacy_name for _, legacy_name, _ in FACT_TABLES.values()]
+    placeholders = ', '.join('?' * len(legacy_names))
+    row = conn.execute(f"""
+        SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})
+    """, legacy_names).fetchone()
+    return row[0] > 0
+
+
+def migrate_legacy_tables(conn):
+    """
+    Copy rows from the original per-row TEXT tables into the fact tables and
+    drop them, normalising names and units as Dimensions does for new loads.
+    """
+    for dataset, (fact_table, legacy_name, column) in FACT_TABLES.items():
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                              (legacy_name,)).fetchone()
+        if not exists:
+            continue
+
+        country_codes = [code for code, in conn.execute(f"SELECT DISTINCT country_code FROM {legacy_name}")]
+        conn.executemany("""
+            INSERT OR IGNORE INTO countries (country_code, country_name) VALUES (?, ?)
+        """, [(code, default_country_name(code)) for code in country_codes])
+        conn.execute(f"""
+            INSERT OR IGNORE INTO series (dataset, name)
+            SELECT DISTINCT ?, {column} FROM {legacy_name}
+        """, (dataset,))
+        conn.execute(f"""
+            INSERT OR IGNORE INTO units (name)
+            SELECT DISTINCT units FROM {legacy_name} WHERE units IS NOT NULL AND units != ''
+        """)
+        conn.execute(f"""
+            INSERT OR REPLACE INTO {fact_table} (country_id, year, series_id, unit_id, value)
+            SELECT c.id, l.year, s.id, u.id, l.value
+            FROM {legacy_name} l
+            JOIN countries c ON c.country_code = l.country_code
+            JOIN series s ON s.dataset = ? AND s.name = l.{column}
+            LEFT JOIN units u ON u.name = l.units
+        """, (dataset,))
+        conn.execute(f"DROP TABLE {legacy_name}")
+
+
+class Dimensions:
+    """Resolves country codes, series names and units to integer ids, creating them as needed."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.countries = dict(conn.execute("SELECT country_code, id FROM countries"))
+        self.series = {(dataset, name): series_id
+                       for series_id, dataset, name in conn.execute("SELECT id, dataset, name FROM series")}
+        self.units = dict(conn.execute("SELECT name, id FROM units"))
+
+    def country_id(self, country_code):
+        if country_code not in self.countries:
+            self.conn.execute("""
+                INSERT OR IGNORE INTO countries (country_code, country_name) VALUES (?, ?)
+            """, (country_code, default_country_name(country_code)))
+            self.countries[country_code] = self.conn.execute(
+                "SELECT id FROM countries WHERE country_code = ?", (country_code,)).fetchone()[0]
+        return self.countries[country_code]
+
+    def series_id(self, dataset, name):
+        key = (dataset, name)
+        if key not in self.series:
+            self.series[key] = self.conn.execute(
+                "INSERT INTO series (dataset, name) VALUES (?, ?)", key).lastrowid
+        return self.series[key]
+
+    def unit_id(self, name):
+        if not name:
+            return None
+        if name not in self.units:
+            self.units[name] = self.conn.execute(
+                "INSERT INTO units (name) VALUES (?)", (name,)).lastrowid
+        return self.units[name]
+
+
+def main():
+    db_path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path('data/iea_electricity.db')
+    size_before = db_path.stat().st_size
+
+    conn = sqlite3.connect(db_path)
+    if not has_legacy_tables(conn):
+        print(f"{db_path} already uses the compact schema")
+        conn.close()
+        return
+
+    print(f"Migrating {db_path}...")
+    create_schema(conn)
+    conn.commit()
+    conn.execute("VACUUM")
+
+    for dataset, (fact_table, _, _) in FACT_TABLES.items():
+        count = conn.execute(f"SELECT COUNT(*) FROM {fact_table}").fetchone()[0]
+        print(f"  {fact_table:25s} {count:8,d} rows")
+    conn.close()
+
+    size_after = db_path.stat().st_size
+    print(f"Database size: {size_before / 1024 / 1024:.2f} MB -> {size_after / 1024 / 1024:.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,127 +1,540 @@
 #!/usr/bin/env python3
 """
 Export SQLite data to JSON for the web visualization.
-"""
 
-import sqlite3
-import json
-from pathlib import Path
+Totals, shares and latest years come precomputed from the aggregate tables
+(see aggregates.py); nothing is re-summed here or in the browser.
 
+Rows are streamed from cursors ordered by country_code and written one
+country at a time, so memory use does not grow with the dataset.
 
-def export_to_json():
-    """Export database to JSON files."""
-    db_path = Path('data/iea_electricity.db')
-    output_dir = Path('visualization/data')
-    output_dir.mkdir(parents=True, exist_ok=True)
+The page's initial load is countries.json, summary.json, index.json (series
+names and year ranges per country) and heatmap.cube. A country's detail
+series are in shards/<country_code>.json, fetched when it is clicked.
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+Country groups (continents, income groups, EU/IEA/OECD, see
+country_groups.py) are exported the same way from their rollup tables:
+groups.json holds every group's members, totals and shares, and
+shards/groups/<group_code>.json its summed series in the country shard format.
 
-    print("Exporting data to JSON...")
-    print("="*70)
+heatmap.cube holds every globe layer precomputed as a dense float32 cube
+(see cube_format.py) that the page reads straight into typed arrays: one
+series per "indicator:source:mode" (absolute values, and shares for each
+generation source) per year, aligned to the countries.json order. Indexed
+mode divides two years of an absolute layer, so no base-year totals are
+recomputed.
 
-    # Export countries
-    print("\n1. Exporting countries...")
-    cursor.execute("SELECT country_code, country_name FROM countries ORDER BY country_code")
-    countries = {row[0]: row[1] for row in cursor.fetchall()}
+If numpy is installed, the same data is also written to a memory-mappable
+snapshot for Python query processes (data_cube.snapshot, see data_cube.py;
+not one of the page's files), and analytics.cube adds year-over-year, CAGR,
+rolling-mean, rank and percentile layers to the heatmap (see analytics.py).
 
-    with open(output_dir / 'countries.json', 'w') as f:
-        json.dump(countries, f)
-    print(f"   ✓ {len(countries)} countries")
+Finally every file gets a content-hashed, precompressed copy listed in
+manifest.json (see artifacts.py), which is what the page actually fetches.
 
-    # Export generation data by country and year
-    print("\n2. Exporting generation data...")
-    cursor.execute("""
-        SELECT country_code, source, year, value
+Exports are incremental: the loaders keep a content hash per country and
+dataset (country_versions), export_state.json records the hashes of the
+last export, and only what depends on changed countries is rewritten.
+Group files are rewritten by every export that runs, and a change to the
+group membership alone also triggers one. Use --full to rewrite everything;
+a full export also removes files that exports no longer produce.
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import json
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+
+from aggregates import GENERATION_UNIT, create_aggregate_tables
+from artifacts import find_artifacts, publish_artifacts
+from country_groups import create_group_tables
+from cube_format import build_cube, patch_cube, write_cube
+
+try:
+    import analytics
+    import data_cube
+except ImportError:
+    analytics = data_cube = None
+
+# Long-format queries over every country, each ordered by country_code, year
+SERIES_QUERIES = [
+    ('generation', """
+        SELECT country_code, year, source, value
         FROM generation_data
+        WHERE units = ?
         ORDER BY country_code, year, source
-    """)
-
-    generation_data = {}
-    for country_code, source, year, value in cursor.fetchall():
-        if country_code not in generation_data:
-            generation_data[country_code] = {}
-        if year not in generation_data[country_code]:
-            generation_data[country_code][year] = {}
-        generation_data[country_code][year][source] = value
-
-    with open(output_dir / 'generation.json', 'w') as f:
-        json.dump(generation_data, f)
-    print(f"   ✓ {len(generation_data)} countries with generation data")
-
-    # Export imports/exports
-    print("\n3. Exporting imports/exports...")
-    cursor.execute("""
-        SELECT country_code, flow_type, year, value
+    """, (GENERATION_UNIT,)),
+    ('trade', """
+        SELECT country_code, year, flow_type, value
         FROM imports_exports_data
         ORDER BY country_code, year, flow_type
-    """)
-
-    trade_data = {}
-    for country_code, flow_type, year, value in cursor.fetchall():
-        if country_code not in trade_data:
-            trade_data[country_code] = {}
-        if year not in trade_data[country_code]:
-            trade_data[country_code][year] = {}
-        trade_data[country_code][year][flow_type] = value
-
-    with open(output_dir / 'trade.json', 'w') as f:
-        json.dump(trade_data, f)
-    print(f"   ✓ {len(trade_data)} countries with trade data")
-
-    # Export final consumption
-    print("\n4. Exporting final consumption...")
-    cursor.execute("""
-        SELECT country_code, sector, year, value
+    """, ()),
+    ('consumption', """
+        SELECT country_code, year, sector, value
         FROM final_consumption_data
         ORDER BY country_code, year, sector
-    """)
-
-    consumption_data = {}
-    for country_code, sector, year, value in cursor.fetchall():
-        if country_code not in consumption_data:
-            consumption_data[country_code] = {}
-        if year not in consumption_data[country_code]:
-            consumption_data[country_code][year] = {}
-        consumption_data[country_code][year][sector] = value
-
-    with open(output_dir / 'consumption.json', 'w') as f:
-        json.dump(consumption_data, f)
-    print(f"   ✓ {len(consumption_data)} countries with consumption data")
-
-    # Create aggregated data for the globe heatmap
-    print("\n5. Creating aggregated data for visualization...")
-
-    # Get latest year's total generation by country
-    cursor.execute("""
-        SELECT country_code, year, SUM(value) as total
+    """, ())
+]
+
+EXPORT_STATE_NAME = 'export_state.json'
+
+# Bumped whenever the set of exported files changes, so the next export is a
+# full one (and removes the files that are no longer produced)
+EXPORT_FORMAT = 3
+
+# country_versions dataset -> export label
+DATASET_LABELS = {
+    'generation': 'generation',
+    'imports_exports': 'trade',
+    'final_consumption': 'consumption'
+}
+
+# Shard key -> query for one country's rows of that dataset
+SHARD_QUERIES = {
+    'generation': ("""
+        SELECT country_code, year, source, value
         FROM generation_data
-        WHERE value IS NOT NULL
-        GROUP BY country_code, year
-    """)
+        WHERE country_code = ? AND units = ?
+        ORDER BY year, source
+    """, (GENERATION_UNIT,)),
+    'trade': ("""
+        SELECT country_code, year, flow_type, value
+        FROM imports_exports_data
+        WHERE country_code = ?
+        ORDER BY year, flow_type
+    """, ()),
+    'consumption': ("""
+        SELECT country_code, year, sector, value
+        FROM final_consumption_data
+        WHERE country_code = ?
+        ORDER BY year, sector
+    """, ())
+}
 
-    latest_generation = {}
-    for country_code, year, total in cursor.fetchall():
-        if country_code not in latest_generation or year > latest_generation[country_code]['year']:
-            latest_generation[country_code] = {'year': year, 'total': total}
+# Rows of (country_code, year, layer, value) for every heatmap layer
+HEATMAP_LAYERS_QUERY = """
+    SELECT c.country_code, t.year, 'generation:total:absolute' AS layer, t.generation_gwh AS value
+    FROM country_year_totals t JOIN countries c ON c.id = t.country_id
+    UNION ALL
+    SELECT c.country_code, t.year, 'consumption:total:absolute', t.consumption
+    FROM country_year_totals t JOIN countries c ON c.id = t.country_id
+    UNION ALL
+    SELECT c.country_code, t.year, 'imports:total:absolute', t.net_imports
+    FROM country_year_totals t JOIN countries c ON c.id = t.country_id
+    UNION ALL
+    SELECT c.country_code, f.year, 'generation:' || s.name || ':absolute', f.value
+    FROM generation_facts f
+    JOIN countries c ON c.id = f.country_id
+    JOIN series s ON s.id = f.series_id
+    JOIN units u ON u.id = f.unit_id AND u.name = :generation_unit
+    UNION ALL
+    SELECT c.country_code, g.year, 'generation:' || s.name || ':share', g.share
+    FROM generation_shares g
+    JOIN countries c ON c.id = g.country_id
+    JOIN series s ON s.id = g.series_id
+"""
+
+TOTAL_KEYS = ['generation', 'emissions', 'consumption', 'net_imports']
+
+# One group's summed rows of one series dataset (unit filter optional)
+GROUP_SHARD_QUERY = """
+    SELECT g.group_code, f.year, s.name, f.value
+    FROM group_series f
+    JOIN country_groups g ON g.id = f.group_id
+    JOIN series s ON s.id = f.series_id AND s.dataset = :dataset
+    LEFT JOIN units u ON u.id = f.unit_id
+    WHERE g.group_code = :group_code AND (:unit IS NULL OR u.name = :unit)
+    ORDER BY f.year, s.name
+"""
+
+GROUP_TOTALS_QUERY = """
+    SELECT g.group_code, t.year, ROUND(t.generation_gwh, 6), ROUND(t.emissions_mtco2, 6),
+           ROUND(t.consumption, 6), ROUND(t.net_imports, 6),
+           t.generation_countries, t.consumption_countries, t.trade_countries
+    FROM group_year_totals t
+    JOIN country_groups g ON g.id = t.group_id
+    ORDER BY g.group_code, t.year
+"""
+
+GROUP_SHARES_QUERY = """
+    SELECT g.group_code, t.year, s.name, ROUND(t.share, 4)
+    FROM group_generation_shares t
+    JOIN country_groups g ON g.id = t.group_id
+    JOIN series s ON s.id = t.series_id
+    WHERE t.share IS NOT NULL
+    ORDER BY g.group_code, t.year, s.name
+"""
+
+
+def write_json_object(f, items):
+    """
+    Write (key, value) pairs as one JSON object, serializing one value at a
+    time. Output is identical to json.dump of the equivalent dict.
+
+    Returns: number of keys written
+    """
+    count = 0
+    f.write('{')
+    for key, value in items:
+        if count:
+            f.write(', ')
+        f.write(json.dumps(str(key)))
+        f.write(': ')
+        f.write(json.dumps(value))
+        count += 1
+    f.write('}')
+    return count
+
+
+def iter_country_series(rows):
+    """Group (country_code, year, series, value) rows into (country_code, {year: {series: value}})."""
+    for country_code, country_rows in groupby(rows, key=itemgetter(0)):
+        years = {}
+        for _, year, series, value in country_rows:
+            years.setdefault(year, {})[series] = value
+        yield country_code, years
+
+
+def country_shard(conn, country_code):
+    """Return {dataset: {year: {series: value}}} for one country (empty if it has no data)."""
+    shard = {}
+    for key, (query, params) in SHARD_QUERIES.items():
+        for _, years in iter_country_series(conn.execute(query, (country_code, *params))):
+            shard[key] = years
+    return shard
+
+
+def shard_index_entry(shard):
+    """Series names and [first, last] year for each dataset of a shard."""
+    return {
+        key: {
+            'series': sorted({series for values in years.values() for series in values}),
+            'years': [min(years), max(years)]
+        }
+        for key, years in shard.items()
+    }
+
+
+def build_summary(conn):
+    """Available years and each country's latest total generation (summary.json)."""
+    # Latest year's total generation by country
+    latest_generation = {
+        country_code: {'year': year, 'total': total}
+        for country_code, year, total in conn.execute("""
+            SELECT c.country_code, l.generation_year, l.generation_gwh
+            FROM country_latest l
+            JOIN countries c ON c.id = l.country_id
+            WHERE l.generation_year IS NOT NULL
+        """)
+    }
 
     # Get all available years
-    cursor.execute("SELECT DISTINCT year FROM generation_data ORDER BY year")
-    years = [row[0] for row in cursor.fetchall()]
+    years = [row[0] for row in conn.execute("SELECT DISTINCT year FROM generation_facts ORDER BY year")]
 
-    summary = {
+    return {
         'years': years,
         'latest_generation': latest_generation
     }
 
+
+def group_shard(conn, group_code):
+    """Return {dataset: {year: {series: value}}} summed over a group's members, like country_shard."""
+    shard = {}
+    for dataset, key in DATASET_LABELS.items():
+        params = {'dataset': dataset, 'group_code': group_code,
+                  'unit': GENERATION_UNIT if dataset == 'generation' else None}
+        for _, years in iter_country_series(conn.execute(GROUP_SHARD_QUERY, params)):
+            shard[key] = years
+    return shard
+
+
+def build_groups(conn):
+    """groups.json: each group's name, type, members, yearly totals (with reporting countries) and shares."""
+    groups = {}
+    for code, group_type, name in conn.execute(
+            "SELECT group_code, group_type, name FROM country_groups ORDER BY group_code"):
+        groups[code] = {'name': name, 'type': group_type, 'members': [], 'totals': {}, 'shares': {}}
+
+    for code, country_code in conn.execute("""
+        SELECT g.group_code, c.country_code
+        FROM country_group_members m
+        JOIN country_groups g ON g.id = m.group_id
+        JOIN countries c ON c.id = m.country_id
+        ORDER BY g.group_code, c.country_code
+    """):
+        groups[code]['members'].append(country_code)
+
+    for code, year, *values in conn.execute(GROUP_TOTALS_QUERY):
+        totals = {key: value for key, value in zip(TOTAL_KEYS, values[:4]) if value is not None}
+        totals['countries'] = dict(zip(['generation', 'consumption', 'trade'], values[4:]))
+        groups[code]['totals'][year] = totals
+
+    for code, years in iter_country_series(conn.execute(GROUP_SHARES_QUERY)):
+        groups[code]['shares'] = years
+
+    return groups
+
+
+def load_groups_version(conn):
+    """Hash of the group membership, so a membership change alone triggers an export."""
+    rows = conn.execute("""
+        SELECT g.group_code, g.group_type, g.name, c.country_code
+        FROM country_group_members m
+        JOIN country_groups g ON g.id = m.group_id
+        JOIN countries c ON c.id = m.country_id
+        ORDER BY g.group_code, c.country_code
+    """).fetchall()
+    return hashlib.sha256(repr(rows).encode('utf-8')).hexdigest()
+
+
+def load_country_versions(conn):
+    """Return {country_code: {dataset label: data hash}} as recorded by the loaders."""
+    versions = {}
+    for country_code, dataset, data_hash in conn.execute("""
+        SELECT c.country_code, v.dataset, v.data_hash
+        FROM country_versions v
+        JOIN countries c ON c.id = v.country_id
+    """):
+        versions.setdefault(country_code, {})[DATASET_LABELS[dataset]] = data_hash
+    return versions
+
+
+def load_export_state(output_dir):
+    path = output_dir / EXPORT_STATE_NAME
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_export_state(output_dir, state):
+    tmp_path = output_dir / (EXPORT_STATE_NAME + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, separators=(',', ':'))
+    os.replace(tmp_path, output_dir / EXPORT_STATE_NAME)
+
+
+def export_shards(conn, output_dir, country_codes, index):
+    """
+    Write shards/<country_code>.json for the given countries, one country in
+    memory at a time, updating their index entries, then write index.json.
+    Countries without any data lose their shard and index entry.
+
+    Returns: relative names of the shards written
+    """
+    shards_dir = output_dir / 'shards'
+    shards_dir.mkdir(exist_ok=True)
+
+    written = []
+    for country_code in country_codes:
+        path = shards_dir / f"{country_code}.json"
+        shard = country_shard(conn, country_code)
+        if not shard:
+            index.pop(country_code, None)
+            if path.exists():
+                path.unlink()
+            continue
+
+        with open(path, 'w') as f:
+            json.dump(shard, f)
+        index[country_code] = shard_index_entry(shard)
+        written.append(f"shards/{country_code}.json")
+
+    with open(output_dir / 'index.json', 'w') as f:
+        write_json_object(f, sorted(index.items()))
+
+    return written
+
+
+def export_groups(conn, output_dir):
+    """
+    Write groups.json and shards/groups/<group_code>.json for every group,
+    removing the shards of groups that no longer exist.
+
+    Returns: relative names of the files written
+    """
+    groups = build_groups(conn)
+    with open(output_dir / 'groups.json', 'w') as f:
+        json.dump(groups, f)
+
+    shards_dir = output_dir / 'shards' / 'groups'
+    shards_dir.mkdir(parents=True, exist_ok=True)
+
+    written = ['groups.json']
+    for code in groups:
+        with open(shards_dir / f"{code}.json", 'w') as f:
+            json.dump(group_shard(conn, code), f)
+        written.append(f"shards/groups/{code}.json")
+
+    for path in shards_dir.glob('*.json'):
+        if path.stem not in groups:
+            path.unlink()
+
+    return written
+
+
+def export_heatmap_layers(conn, output_dir, countries=None):
+    """
+    Write heatmap.cube: every heatmap layer for every year, aligned to
+    countries.json. With countries, only their columns are patched in the
+    existing file, unless it lacks a slot for the new data, in which case it
+    is rebuilt.
+
+    Returns: 'patched' or bytes written
+    """
+    path = output_dir / 'heatmap.cube'
+    params = {'generation_unit': GENERATION_UNIT}
+
+    if countries and path.exists():
+        placeholders = ', '.join(f":country_{i}" for i in range(len(countries)))
+        rows = conn.execute(
+            f"SELECT * FROM ({HEATMAP_LAYERS_QUERY}) WHERE country_code IN ({placeholders})",
+            {**params, **{f"country_{i}": code for i, code in enumerate(countries)}})
+        if patch_cube(path, rows, countries):
+            return 'patched'
+
+    def distinct(column):
+        return [row[0] for row in conn.execute(
+            f"SELECT DISTINCT {column} FROM ({HEATMAP_LAYERS_QUERY}) ORDER BY {column}", params)]
+
+    all_countries = [row[0] for row in conn.execute("SELECT country_code FROM countries ORDER BY country_code")]
+    cube = build_cube(conn.execute(HEATMAP_LAYERS_QUERY, params), 'heatmap', None,
+                      all_countries, distinct('year'), distinct('layer'))
+    return write_cube(path, cube)
+
+
+def describe(result):
+    return result if result == 'patched' else f"{result / 1024:.1f} KB"
+
+
+def export_to_json(full=False):
+    """
+    Export database to JSON files.
+
+    Unless full is set, only countries whose data version changed since the
+    last export (export_state.json) are rewritten: their shards and
+    heatmap.cube columns.
+    """
+    db_path = Path('data/iea_electricity.db')
+    output_dir = Path('visualization/data')
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    conn = sqlite3.connect(db_path)
+
+    # Builds the aggregates (and data versions) if the database predates them
+    create_aggregate_tables(conn)
+    # Syncs the group membership file, rebuilding the rollups if it changed
+    create_group_tables(conn)
+    conn.commit()
+
+    versions = load_country_versions(conn)
+    groups_version = load_groups_version(conn)
+    state = None if full else load_export_state(output_dir)
+    if state is not None and state.get('format') != EXPORT_FORMAT:
+        state = None
+
+    if state is None:
+        changed = sorted(versions)
+        index = {}
+    else:
+        previous = state['versions']
+        changed = sorted(code for code in versions.keys() | previous.keys()
+                         if versions.get(code) != previous.get(code))
+        index = state['index']
+
+    if state is not None and not changed and state.get('groups') == groups_version:
+        conn.close()
+        print("Export is up to date (no country data changed since the last export)")
+        return
+
+    if state is None:
+        print("Exporting data to JSON (full)...")
+    elif not changed:
+        print("Exporting data to JSON (country group membership changed)...")
+    else:
+        print(f"Exporting data to JSON ({len(changed)} changed countries: {', '.join(changed[:10])}"
+              f"{'...' if len(changed) > 10 else ''})...")
+    print("="*70)
+
+    rewritten = {'countries.json', 'summary.json', 'index.json'}
+
+    # Export countries
+    print("\n1. Exporting countries...")
+    with open(output_dir / 'countries.json', 'w') as f:
+        count = write_json_object(f, conn.execute(
+            "SELECT country_code, country_name FROM countries ORDER BY country_code"))
+    print(f"   ✓ {count} countries")
+
+    # Years and latest generation per country; totals and shares reach the page in heatmap.cube
+    print("\n2. Exporting summary...")
+    summary = build_summary(conn)
     with open(output_dir / 'summary.json', 'w') as f:
         json.dump(summary, f)
+    years = summary['years']
     print(f"   ✓ Years: {min(years)} - {max(years)}")
 
+    # Per-country detail shards, loaded by the page on click
+    print("\n3. Exporting per-country shards...")
+    shards = export_shards(conn, output_dir, changed, index)
+    rewritten.update(shards)
+    print(f"   ✓ {len(shards)} country shards and index.json")
+
+    # Group rollups: summary file and one shard per group
+    print("\n4. Exporting country groups...")
+    group_files = export_groups(conn, output_dir)
+    rewritten.update(group_files)
+    print(f"   ✓ groups.json and {len(group_files) - 1} group shards")
+
+    # Precomputed globe layers
+    print("\n5. Exporting heatmap layers...")
+    result = export_heatmap_layers(conn, output_dir, changed if state is not None else None)
+    rewritten.add('heatmap.cube')
+    print(f"   ✓ heatmap.cube ({describe(result)})")
+
     conn.close()
 
+    # Memory-mappable cubes for query processes, and analytics layers computed from them.
+    # Ranks and percentiles depend on every country, so both are rebuilt whole,
+    # but only when country data changed (neither depends on the groups)
+    print("\n6. Writing query snapshot and analytics layers...")
+    if not data_cube:
+        print("   = Skipped (numpy is not installed)")
+    elif (state is not None and not changed and (output_dir / data_cube.SNAPSHOT_NAME).exists()
+          and (output_dir / analytics.ANALYTICS_NAME).exists()):
+        print("   = Unchanged")
+    else:
+        cube = data_cube.DataCube.load(db_path)
+        size = cube.write_snapshot(output_dir / data_cube.SNAPSHOT_NAME)
+        print(f"   ✓ {data_cube.SNAPSHOT_NAME} ({size / 1024:.1f} KB)")
+
+        layers, size = analytics.export_analytics(cube, output_dir / analytics.ANALYTICS_NAME)
+        rewritten.add(analytics.ANALYTICS_NAME)
+        print(f"   ✓ {analytics.ANALYTICS_NAME} ({layers} layers, {size / 1024:.1f} KB)")
+
+    if state is None:
+        # A full export also drops files it no longer produces (shards of
+        # countries that no longer exist, outputs of older export formats)
+        for path in find_artifacts(output_dir, exclude={EXPORT_STATE_NAME}):
+            if path.as_posix() not in rewritten:
+                (output_dir / path).unlink()
+
+    # Content-hashed, precompressed copies for far-future caching
+    print("\n7. Publishing hashed artifacts...")
+    manifest = publish_artifacts(output_dir, None if state is None else rewritten, exclude={EXPORT_STATE_NAME})
+    files = manifest['files']
+    gzip_size = sum(entry['encodings']['gzip']['size'] for entry in files.values())
+    print(f"   ✓ {len(files)} artifacts in manifest.json ({gzip_size / 1024 / 1024:.2f} MB gzipped)")
+
+    # Recorded last, so an interrupted export is redone next time
+    save_export_state(output_dir, {'format': EXPORT_FORMAT, 'versions': versions, 'groups': groups_version,
+                                   'index': index})
+
     # Calculate sizes
-    total_size = sum(f.stat().st_size for f in output_dir.glob('*.json'))
+    total_size = sum(entry['size'] for entry in files.values())
 
     print(f"\n{'='*70}")
     print("Export completed!")
@@ -131,5 +544,13 @@ def export_to_json():
     print(f"{'='*70}")
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export iea_electricity.db for the web visualization.")
+    parser.add_argument('--full', action='store_true',
+                        help="rewrite every file, even if no country changed since the last export")
+    return parser.parse_args()
+
+
 if __name__ == '__main__':
-    export_to_json()
+    args = parse_args()
+    export_to_json(full=args.full)
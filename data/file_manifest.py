@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Manifest of ingested CSV files, stored in iea_electricity.db.
+
+The ingested_files table records the path, size, mtime and content hash of
+every CSV a loader has ingested. A file whose size and mtime are unchanged
+is skipped without being read; otherwise its hash decides whether it really
+changed, so touching or re-downloading identical files costs one read.
+
+The ingested_keys table remembers which (series, year) rows each file
+produced, so a new version of a file only removes rows that its own previous
+version had; files of other sources writing the same fact table (e.g. both
+consumption loaders) are left alone.
+"""
+
+import hashlib
+import json
+from datetime import datetime
+
+
+def ensure_manifest_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingested_files (
+            path TEXT PRIMARY KEY,
+            country_code TEXT NOT NULL,
+            dataset TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            sha256 TEXT NOT NULL,
+            ingested_at TIMESTAMP
+        )
+    """)
+
+    # keys: JSON {series_id: [year, ...]} of the rows the file's last load produced
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingested_keys (
+            path TEXT PRIMARY KEY,
+            country_id INTEGER NOT NULL,
+            keys TEXT NOT NULL
+        )
+    """)
+
+
+def file_sha256(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def check_file(conn, filepath, force=False):
+    """
+    Compare a CSV file against the manifest.
+
+    Returns: fingerprint dict (path, size, mtime, sha256) when the file is new
+    or changed (or force is set), None when it is unchanged
+    """
+    path = filepath.as_posix()
+    stat = filepath.stat()
+
+    row = conn.execute("SELECT size, mtime, sha256 FROM ingested_files WHERE path = ?", (path,)).fetchone()
+    if row and not force and row[0] == stat.st_size and row[1] == stat.st_mtime:
+        return None
+
+    sha256 = file_sha256(filepath)
+    if row and not force and row[2] == sha256:
+        # Same content with a new mtime: remember it so the next run skips the read
+        conn.execute("UPDATE ingested_files SET size = ?, mtime = ? WHERE path = ?",
+                     (stat.st_size, stat.st_mtime, path))
+        return None
+
+    return {'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': sha256}
+
+
+def record_file(conn, fingerprint, country_code, dataset):
+    """Mark a file as ingested (committed together with its rows by the caller)."""
+    conn.execute("""
+        INSERT OR REPLACE INTO ingested_files (path, country_code, dataset, size, mtime, sha256, ingested_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (fingerprint['path'], country_code, dataset, fingerprint['size'], fingerprint['mtime'],
+          fingerprint['sha256'], datetime.now()))
+
+
+def decode_keys(keys):
+    return {(int(series_id), year) for series_id, years in json.loads(keys).items() for year in years}
+
+
+def file_keys(conn, path):
+    """Return the (series_id, year) keys the last load of a file produced (empty if unknown)."""
+    row = conn.execute("SELECT keys FROM ingested_keys WHERE path = ?", (path,)).fetchone()
+    return decode_keys(row[0]) if row else set()
+
+
+def other_files_keys(conn, path, country_id):
+    """Return the keys every other file of a country still provides."""
+    keys = set()
+    for other, in conn.execute("SELECT keys FROM ingested_keys WHERE country_id = ? AND path != ?",
+                               (country_id, path)):
+        keys |= decode_keys(other)
+    return keys
+
+
+def record_file_keys(conn, path, country_id, keys):
+    """Remember the (series_id, year) keys a file produced (committed with its rows by the caller)."""
+    years = {}
+    for series_id, year in sorted(keys):
+        years.setdefault(series_id, []).append(year)
+    conn.execute("INSERT OR REPLACE INTO ingested_keys (path, country_id, keys) VALUES (?, ?, ?)",
+                 (path, country_id, json.dumps(years, separators=(',', ':'))))
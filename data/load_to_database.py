@@ -2,18 +2,39 @@
 """
 Load IEA scraped data into a SQLite database.
 
-Database schema:
+Database schema (see db_schema.py):
 - countries: country metadata
-- generation_data: electricity generation by source over time
-- imports_exports_data: electricity imports/exports over time
-- final_consumption_data: electricity consumption by sector over time
+- series, units: dimension tables for source/sector/flow names and units
+- generation_facts: electricity generation by source over time
+- imports_exports_facts: electricity imports/exports over time
+- final_consumption_facts: electricity consumption by sector over time
+- generation_data, imports_exports_data, final_consumption_data: views
+  exposing the facts with their original TEXT columns
+- country_year_totals, generation_shares, country_latest: aggregates
+  refreshed for each loaded country (see aggregates.py)
+- country_groups and their rollups (group_series, group_year_totals,
+  group_generation_shares), rebuilt once per run (see country_groups.py)
 """
 
+import argparse
 import sqlite3
-import csv
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from datetime import datetime
 
+from aggregates import create_aggregate_tables, refresh_country_aggregates
+from country_groups import create_group_tables, refresh_group_rollups
+from csv_records import iter_csv_file, iter_csv_text
+from db_schema import (FACT_TABLES, YEAR_INDEXES, Dimensions, create_schema, create_year_indexes,
+                       default_country_name)
+from file_manifest import (check_file, ensure_manifest_table, file_keys, other_files_keys, record_file,
+                           record_file_keys)
+
+# Scraper output, one directory per country (see DATASET_FILES)
+SCRAPED_DIR = Path('data/iea_scraped')
+
 
 def create_database(db_path):
     """Create database and tables."""
@@ -33,120 +54,64 @@ def create_database(db_path):
         )
     """)
 
-    # Generation data table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS generation_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            country_code TEXT NOT NULL,
-            source TEXT NOT NULL,
-            year INTEGER NOT NULL,
-            value REAL,
-            units TEXT,
-            FOREIGN KEY (country_code) REFERENCES countries(country_code),
-            UNIQUE(country_code, source, year)
-        )
-    """)
+    # Dimension and fact tables (migrates databases using the original tables)
+    create_schema(conn)
 
-    # Imports/Exports data table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS imports_exports_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            country_code TEXT NOT NULL,
-            flow_type TEXT NOT NULL,
-            year INTEGER NOT NULL,
-            value REAL,
-            units TEXT,
-            FOREIGN KEY (country_code) REFERENCES countries(country_code),
-            UNIQUE(country_code, flow_type, year)
-        )
-    """)
+    # Precomputed country-year totals, shares and latest years
+    create_aggregate_tables(conn)
 
-    # Final consumption data table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS final_consumption_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            country_code TEXT NOT NULL,
-            sector TEXT NOT NULL,
-            year INTEGER NOT NULL,
-            value REAL,
-            units TEXT,
-            FOREIGN KEY (country_code) REFERENCES countries(country_code),
-            UNIQUE(country_code, sector, year)
-        )
-    """)
+    # Regional, income and membership groups with their rollups
+    create_group_tables(conn)
 
-    # Create indexes for faster queries
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_gen_country_year ON generation_data(country_code, year)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ie_country_year ON imports_exports_data(country_code, year)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_fc_country_year ON final_consumption_data(country_code, year)")
+    # Files already ingested, for incremental loads
+    ensure_manifest_table(conn)
 
     conn.commit()
     return conn
 
 
-def parse_csv_file(filepath):
-    """
-    Parse a CSV file and extract data.
-    Returns: list of dicts with keys: source/sector/flow_type, year, value, units
-    """
-    data = []
+# Load-time settings: the database can always be rebuilt from the CSVs, so
+# durability is traded for speed until the load has committed
+BULK_LOAD_PRAGMAS = [
+    "PRAGMA journal_mode = MEMORY",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY"
+]
 
-    with open(filepath, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        rows = list(reader)
 
-        if len(rows) < 2:
-            return data  # Empty or header-only file
+def begin_bulk_load(conn):
+    """Apply load-time PRAGMAs and drop secondary indexes until finish_bulk_load."""
+    for pragma in BULK_LOAD_PRAGMAS:
+        conn.execute(pragma)
+    for name in YEAR_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
 
-        # First row is header
-        header = rows[0]
-
-        # Data starts from row 2
-        for row in rows[1:]:
-            if len(row) < 4:
-                continue
 
-            # Parse row: [source/sector/flow_type, value, year, units]
-            source_sector = row[0].strip(' "')
-            try:
-                value = float(row[1]) if row[1].strip() else None
-            except (ValueError, IndexError):
-                value = None
-
-            try:
-                year = int(row[2]) if row[2].strip() else None
-            except (ValueError, IndexError):
-                year = None
-
-            units = row[3].strip() if len(row) > 3 else ''
-
-            # Skip rows with missing critical data
-            if not source_sector or year is None:
-                continue
-
-            data.append({
-                'source': source_sector,
-                'year': year,
-                'value': value,
-                'units': units
-            })
-
-    return data
+def finish_bulk_load(conn):
+    """Commit the load, rebuild secondary indexes and restore safe settings."""
+    conn.commit()
+    create_year_indexes(conn)
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.execute("PRAGMA synchronous = FULL")
+    conn.execute("PRAGMA journal_mode = DELETE")
 
 
-def insert_country(conn, country_code, country_name=None):
+def insert_country(conn, country_code, country_name=None, commit=True):
     """Insert or update country record."""
     cursor = conn.cursor()
 
     cursor.execute("""
         INSERT OR IGNORE INTO countries (country_code, country_name, last_updated)
         VALUES (?, ?, ?)
-    """, (country_code, country_name or country_code.replace('-', ' ').title(), datetime.now()))
+    """, (country_code, country_name or default_country_name(country_code), datetime.now()))
 
-    conn.commit()
+    if commit:
+        conn.commit()
 
 
-def update_country_flags(conn, country_code, has_gen=False, has_ie=False, has_fc=False):
+def update_country_flags(conn, country_code, has_gen=False, has_ie=False, has_fc=False, commit=True):
     """Update country data availability flags."""
     cursor = conn.cursor()
 
@@ -157,94 +122,343 @@ def update_country_flags(conn, country_code, has_gen=False, has_ie=False, has_fc
     if has_fc:
         cursor.execute("UPDATE countries SET has_final_consumption_data = 1 WHERE country_code = ?", (country_code,))
 
-    conn.commit()
+    if commit:
+        conn.commit()
 
 
-def load_generation_data(conn, country_code, filepath):
-    """Load generation data from CSV."""
-    data = parse_csv_file(filepath)
+def insert_dataset_records(conn, file_type, country_code, records, commit=True):
+    """
+    Insert a dataset's records into its fact table in one executemany batch,
+    resolving country, series and unit names to dimension ids.
 
-    if not data:
-        return 0
+    A failing batch may be partly applied, so errors propagate to the caller,
+    which rolls back (see load_country).
 
-    cursor = conn.cursor()
-    count = 0
-
-    for row in data:
-        try:
-            cursor.execute("""
-                INSERT OR REPLACE INTO generation_data (country_code, source, year, value, units)
-                VALUES (?, ?, ?, ?, ?)
-            """, (country_code, row['source'], row['year'], row['value'], row['units']))
-            count += 1
-        except sqlite3.Error as e:
-            print(f"    Error inserting generation data: {e}")
+    Returns: number of rows inserted or replaced
+    """
+    fact_table = FACT_TABLES[file_type][0]
+    dims = Dimensions(conn)
+    country_id = dims.country_id(country_code)
+
+    cursor = conn.executemany(f"""
+        INSERT OR REPLACE INTO {fact_table} (country_id, year, series_id, unit_id, value)
+        VALUES (?, ?, ?, ?, ?)
+    """, ((country_id, record.year, dims.series_id(file_type, record.series),
+           dims.unit_id(record.units), record.value) for record in records))
+
+    if commit:
+        conn.commit()
+    return cursor.rowcount
+
+
+def load_generation_data(conn, country_code, filepath, commit=True):
+    """Load generation data from CSV."""
+    return insert_generation_data(conn, country_code, iter_csv_file(filepath), commit)
 
-    conn.commit()
-    return count
 
+def insert_generation_data(conn, country_code, records, commit=True):
+    """Insert generation records (any iterable of Record) in one executemany batch."""
+    return insert_dataset_records(conn, 'generation', country_code, records, commit)
 
-def load_imports_exports_data(conn, country_code, filepath):
+
+def load_imports_exports_data(conn, country_code, filepath, commit=True):
     """Load imports/exports data from CSV."""
-    data = parse_csv_file(filepath)
+    return insert_imports_exports_data(conn, country_code, iter_csv_file(filepath), commit)
 
-    if not data:
-        return 0
 
-    cursor = conn.cursor()
-    count = 0
-
-    for row in data:
-        try:
-            cursor.execute("""
-                INSERT OR REPLACE INTO imports_exports_data (country_code, flow_type, year, value, units)
-                VALUES (?, ?, ?, ?, ?)
-            """, (country_code, row['source'], row['year'], row['value'], row['units']))
-            count += 1
-        except sqlite3.Error as e:
-            print(f"    Error inserting imports/exports data: {e}")
+def insert_imports_exports_data(conn, country_code, records, commit=True):
+    """Insert imports/exports records (any iterable of Record) in one executemany batch."""
+    return insert_dataset_records(conn, 'imports_exports', country_code, records, commit)
 
-    conn.commit()
+
+def load_final_consumption_data(conn, country_code, filepath, commit=True):
+    """Load final consumption data from CSV."""
+    return insert_final_consumption_data(conn, country_code, iter_csv_file(filepath), commit)
+
+
+def insert_final_consumption_data(conn, country_code, records, commit=True):
+    """Insert final consumption records (any iterable of Record) in one executemany batch."""
+    return insert_dataset_records(conn, 'final_consumption', country_code, records, commit)
+
+
+# Scraper dataset type -> function inserting its parsed rows
+DATASET_INSERTERS = {
+    'generation': insert_generation_data,
+    'imports_exports': insert_imports_exports_data,
+    'final_consumption': insert_final_consumption_data
+}
+
+
+def replace_dataset(conn, file_type, country_code, records, source, commit=True):
+    """
+    Load a new version of one of a country's datasets.
+
+    Records are upserted, then the rows that the previous version of the same
+    source produced and the new one no longer contains are deleted; rows from
+    other sources are kept. Nothing is deleted if no records were loaded, so
+    an empty or failed file never wipes a country.
+
+    Args:
+        source: manifest path of the file the records come from (see dataset_path)
+
+    Returns: number of rows loaded
+    """
+    keys = set()
+
+    def tracked_records():
+        for record in records:
+            keys.add((record.series, record.year))
+            yield record
+
+    count = DATASET_INSERTERS[file_type](conn, country_code, tracked_records(), commit=False)
+    if count:
+        dims = Dimensions(conn)
+        country_id = dims.country_id(country_code)
+        keys = {(dims.series_id(file_type, series), year) for series, year in keys}
+        prune_missing_rows(conn, file_type, country_id, source, keys)
+        record_file_keys(conn, source, country_id, keys)
+
+    if commit:
+        conn.commit()
     return count
 
 
-def load_final_consumption_data(conn, country_code, filepath):
-    """Load final consumption data from CSV."""
-    data = parse_csv_file(filepath)
+def prune_missing_rows(conn, file_type, country_id, source, keys):
+    """
+    Delete the rows the previous version of source produced whose
+    (series_id, year) is not in keys, unless another file of the country
+    still provides them. Returns rows deleted.
+    """
+    fact_table = FACT_TABLES[file_type][0]
+    stale = file_keys(conn, source) - keys
+    if stale:
+        stale -= other_files_keys(conn, source, country_id)
+    conn.executemany(f"DELETE FROM {fact_table} WHERE country_id = ? AND series_id = ? AND year = ?",
+                     [(country_id, series_id, year) for series_id, year in sorted(stale)])
+    return len(stale)
 
-    if not data:
-        return 0
 
-    cursor = conn.cursor()
-    count = 0
-
-    for row in data:
-        try:
-            cursor.execute("""
-                INSERT OR REPLACE INTO final_consumption_data (country_code, sector, year, value, units)
-                VALUES (?, ?, ?, ?, ?)
-            """, (country_code, row['source'], row['year'], row['value'], row['units']))
-            count += 1
-        except sqlite3.Error as e:
-            print(f"    Error inserting final consumption data: {e}")
+def load_country(conn, country_code, parsed, fingerprints):
+    """
+    Load a country's parsed datasets, aggregates, flags and manifest entries
+    inside a savepoint: if anything fails, all of the country's changes are
+    rolled back (leaving earlier countries of a bulk transaction alone) and
+    the error is raised. Nothing is committed here.
+
+    Returns: dict of dataset type -> number of rows loaded
+    """
+    conn.execute("SAVEPOINT load_country")
+    try:
+        insert_country(conn, country_code, commit=False)
+
+        counts = {}
+        for file_type, records in parsed.items():
+            count = replace_dataset(conn, file_type, country_code, records, fingerprints[file_type]['path'],
+                                    commit=False)
+            if count > 0:
+                record_file(conn, fingerprints[file_type], country_code, file_type)
+                counts[file_type] = count
+
+        refresh_country_aggregates(conn, country_code)
+        update_country_flags(conn, country_code,
+                             has_gen='generation' in counts,
+                             has_ie='imports_exports' in counts,
+                             has_fc='final_consumption' in counts,
+                             commit=False)
+    except Exception:
+        conn.execute("ROLLBACK TO load_country")
+        conn.execute("RELEASE load_country")
+        raise
+    conn.execute("RELEASE load_country")
+    return counts
+
+
+def load_country_payloads(conn, country_code, files, commit=True):
+    """
+    Load a country's CSV payloads straight from memory, without CSV files on disk.
+
+    Args:
+        conn: Database connection
+        country_code: Country name (URL slug format)
+        files: dict of dataset type -> CSV content, as classified by the scraper
+        commit: Commit once the country is loaded (False inside a bulk load)
+
+    Errors propagate with the country's changes uncommitted; the caller
+    rolls them back (see scrape_pipeline.run_loader).
+
+    Returns: dict of dataset type -> number of rows loaded
+    """
+    insert_country(conn, country_code, commit=False)
+
+    counts = {}
+    for file_type, content in files.items():
+        if file_type in DATASET_INSERTERS:
+            counts[file_type] = replace_dataset(conn, file_type, country_code, iter_csv_text(content),
+                                                dataset_path(country_code, file_type), commit=False)
+
+    refresh_country_aggregates(conn, country_code)
+    update_country_flags(conn, country_code,
+                         has_gen=counts.get('generation', 0) > 0,
+                         has_ie=counts.get('imports_exports', 0) > 0,
+                         has_fc=counts.get('final_consumption', 0) > 0,
+                         commit=commit)
+    return counts
+
+
+# Dataset type -> CSV filename inside each country directory
+DATASET_FILES = {
+    'generation': 'generation.csv',
+    'imports_exports': 'imports_exports.csv',
+    'final_consumption': 'final_consumption.csv'
+}
+
+# Dataset type -> (label, rows stats key, countries stats key)
+DATASET_STATS = {
+    'generation': ('generation', 'total_generation_rows', 'countries_with_generation'),
+    'imports_exports': ('imports/exports', 'total_ie_rows', 'countries_with_imports_exports'),
+    'final_consumption': ('final consumption', 'total_fc_rows', 'countries_with_final_consumption')
+}
+
+
+def dataset_path(country_code, file_type):
+    """
+    Manifest path of a country's scraped CSV; payloads loaded straight from
+    the scraper use it too, so they replace the same rows the file would.
+    """
+    return (SCRAPED_DIR / country_code / DATASET_FILES[file_type]).as_posix()
+
+
+def stream_country_dir(country_dir, file_types=DATASET_FILES):
+    """
+    Open a country directory's dataset CSVs as lazy record streams.
+
+    Returns: (country_code, dict of dataset type -> Record iterator)
+    """
+    streams = {}
+    for file_type in file_types:
+        filepath = country_dir / DATASET_FILES[file_type]
+        if filepath.exists():
+            streams[file_type] = iter_csv_file(filepath)
+    return country_dir.name, streams
+
+
+def parse_country_dir(country_dir, file_types=DATASET_FILES):
+    """
+    Parse a country directory's dataset CSVs into lists of records.
+
+    Runs in worker processes with --workers, so it only reads files and never
+    touches the database.
 
+    Returns: (country_code, dict of dataset type -> list of Record)
+    """
+    country_code, streams = stream_country_dir(country_dir, file_types)
+    return country_code, {file_type: list(records) for file_type, records in streams.items()}
+
+
+def iter_parse_jobs(pending, executor=None):
+    """
+    Yield (country_code, fingerprints, parse) for every pending country, in
+    order. parse() returns (country_code, dict of dataset type -> records) or
+    raises the error parsing that country hit, so a bad country directory
+    fails on its own. With an executor, every directory is submitted up front
+    and parsed in worker processes.
+    """
+    if executor:
+        futures = deque(executor.submit(parse_country_dir, country_dir, list(fingerprints))
+                        for country_dir, fingerprints in pending)
+        for country_dir, fingerprints in pending:
+            yield country_dir.name, fingerprints, futures.popleft().result
+    else:
+        for country_dir, fingerprints in pending:
+            yield country_dir.name, fingerprints, partial(stream_country_dir, country_dir, list(fingerprints))
+
+
+def find_changed_files(conn, country_dirs, force=False):
+    """
+    Check every dataset CSV against the ingested_files manifest.
+
+    Returns: (list of (country_dir, dict of dataset type -> fingerprint) for
+    countries with new or changed files, number of unchanged files)
+    """
+    pending = []
+    unchanged = 0
+
+    for country_dir in country_dirs:
+        fingerprints = {}
+        for file_type, filename in DATASET_FILES.items():
+            filepath = country_dir / filename
+            if not filepath.exists():
+                continue
+            fingerprint = check_file(conn, filepath, force)
+            if fingerprint:
+                fingerprints[file_type] = fingerprint
+            else:
+                unchanged += 1
+        if fingerprints:
+            pending.append((country_dir, fingerprints))
+
+    # Keep mtime refreshes for files whose content turned out identical
     conn.commit()
-    return count
+    return pending, unchanged
+
+
+def remove_loaded_countries(countries_file, loaded):
+    """Rewrite a --countries-file without the loaded countries."""
+    with open(countries_file, 'r') as f:
+        remaining = sorted({line.strip() for line in f if line.strip()} - loaded)
+    with open(countries_file, 'w') as f:
+        f.writelines(f"{country}\n" for country in remaining)
+    return remaining
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load scraped IEA data into SQLite.")
+    parser.add_argument('--countries-file', type=Path,
+                        help="only load the countries listed in this file, one per line "
+                             "(e.g. data/iea_scraped/changed_countries.txt from a refresh scrape); "
+                             "countries loaded successfully are removed from it")
+    parser.add_argument('--full', action='store_true',
+                        help="reload every file, even those unchanged since the last load")
+    parser.add_argument('--bulk', action='store_true',
+                        help="load inside one transaction with load-time PRAGMAs, "
+                             "rebuilding indexes at the end")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="processes parsing CSVs in parallel; rows are still written "
+                             "by a single connection (default: 1)")
+    parser.add_argument('--commit-every', type=int, default=0, metavar='N',
+                        help="with --bulk, commit every N countries instead of once per run")
+    return parser.parse_args()
 
 
 def main():
     """Main function to load all data into database."""
+    args = parse_args()
+
     # Paths
-    data_dir = Path('data/iea_scraped')
+    data_dir = SCRAPED_DIR
     db_path = Path('data/iea_electricity.db')
 
     print("Creating database...")
     conn = create_database(db_path)
 
+    # Per-statement commits are skipped in bulk mode
+    commit = not args.bulk
+    if args.bulk:
+        begin_bulk_load(conn)
+
     # Get all country directories
     country_dirs = sorted([d for d in data_dir.iterdir() if d.is_dir()])
 
-    print(f"Found {len(country_dirs)} countries to process\n")
+    if args.countries_file:
+        with open(args.countries_file, 'r') as f:
+            selected = {line.strip() for line in f if line.strip()}
+        country_dirs = [d for d in country_dirs if d.name in selected]
+
+    # Only files that are new or changed since the last load are ingested
+    pending, unchanged = find_changed_files(conn, country_dirs, force=args.full)
+
+    print(f"Found {len(pending)} countries with new or changed files "
+          f"({unchanged} unchanged files skipped)\n")
 
     stats = {
         'total_countries': 0,
@@ -253,57 +467,66 @@ def main():
         'countries_with_final_consumption': 0,
         'total_generation_rows': 0,
         'total_ie_rows': 0,
-        'total_fc_rows': 0
+        'total_fc_rows': 0,
+        'failed_countries': []
     }
 
-    for country_dir in country_dirs:
-        country_code = country_dir.name
-        stats['total_countries'] += 1
+    # Worker processes parse country directories; this process is the only writer
+    executor = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
 
-        print(f"[{stats['total_countries']}/{len(country_dirs)}] Processing {country_code}...")
+    try:
+        for country_code, fingerprints, parse in iter_parse_jobs(pending, executor):
+            stats['total_countries'] += 1
 
-        # Insert country
-        insert_country(conn, country_code)
+            print(f"[{stats['total_countries']}/{len(pending)}] Processing {country_code}...")
 
-        has_gen = False
-        has_ie = False
-        has_fc = False
+            # Keep the bulk load's transaction open around each country's savepoint
+            if args.bulk and not conn.in_transaction:
+                conn.execute("BEGIN")
 
-        # Load generation data
-        gen_file = country_dir / 'generation.csv'
-        if gen_file.exists():
-            count = load_generation_data(conn, country_code, gen_file)
-            if count > 0:
-                print(f"    ✓ Loaded {count} generation records")
-                stats['total_generation_rows'] += count
-                stats['countries_with_generation'] += 1
-                has_gen = True
-
-        # Load imports/exports data
-        ie_file = country_dir / 'imports_exports.csv'
-        if ie_file.exists():
-            count = load_imports_exports_data(conn, country_code, ie_file)
-            if count > 0:
-                print(f"    ✓ Loaded {count} imports/exports records")
-                stats['total_ie_rows'] += count
-                stats['countries_with_imports_exports'] += 1
-                has_ie = True
-
-        # Load final consumption data
-        fc_file = country_dir / 'final_consumption.csv'
-        if fc_file.exists():
-            count = load_final_consumption_data(conn, country_code, fc_file)
-            if count > 0:
-                print(f"    ✓ Loaded {count} final consumption records")
-                stats['total_fc_rows'] += count
-                stats['countries_with_final_consumption'] += 1
-                has_fc = True
-
-        # Update country flags
-        update_country_flags(conn, country_code, has_gen, has_ie, has_fc)
+            # The country's rows, aggregates and manifest entries load (or roll back) together;
+            # records are parsed lazily (or in a worker), so unreadable CSVs also fail in here
+            try:
+                country_code, parsed = parse()
+                counts = load_country(conn, country_code, parsed, fingerprints)
+            except Exception as e:
+                print(f"    ✗ Error loading {country_code}: {e}")
+                stats['failed_countries'].append(country_code)
+                continue
+            if commit:
+                conn.commit()
+
+            for file_type, count in counts.items():
+                label, rows_key, countries_key = DATASET_STATS[file_type]
+                print(f"    ✓ Loaded {count} {label} records")
+                stats[rows_key] += count
+                stats[countries_key] += 1
+
+            if args.bulk and args.commit_every and stats['total_countries'] % args.commit_every == 0:
+                conn.commit()
+    finally:
+        if executor:
+            executor.shutdown()
+
+    # Group sums depend on every member, so they are rebuilt once all countries are in
+    if stats['total_countries']:
+        print("\nRebuilding country group rollups...")
+        refresh_group_rollups(conn)
+        if not args.bulk:
+            conn.commit()
+
+    if args.bulk:
+        print("\nCommitting and rebuilding indexes...")
+        finish_bulk_load(conn)
 
     conn.close()
 
+    # Once committed, loaded countries leave the list so it only holds what is
+    # still pending; failed countries (and ones without a directory) stay
+    if args.countries_file:
+        loaded = {country_dir.name for country_dir in country_dirs} - set(stats['failed_countries'])
+        remove_loaded_countries(args.countries_file, loaded)
+
     # Print summary
     print(f"\n{'='*70}")
     print("Database loading completed!")
@@ -318,6 +541,8 @@ def main():
     print(f"  Total imports/exports records: {stats['total_ie_rows']:,}")
     print(f"  Total final consumption records: {stats['total_fc_rows']:,}")
     print(f"  Grand total records: {stats['total_generation_rows'] + stats['total_ie_rows'] + stats['total_fc_rows']:,}")
+    if stats['failed_countries']:
+        print(f"\n  Failed (rolled back): {', '.join(stats['failed_countries'])}")
     print(f"{'='*70}")
 
     # Show database size
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Recorded country pages for offline replay.
+
+A fixture is the list of (download attribute, data URL) pairs found on one
+country's electricity page, stored as data/fixtures/iea_pages/<country>.json.gz.
+Next to each fixture the recorder writes <country>.html, a stand-in page
+containing the same download anchors, so the scraper itself can be pointed
+at the corpus with --url-template (file:// or a local HTTP server).
+"""
+
+import gzip
+import html
+import json
+from datetime import datetime
+from pathlib import Path
+
+FIXTURES_DIR = Path('data/fixtures/iea_pages')
+
+
+class FixtureRecorder:
+    """Writes one fixture and stand-in page per scraped country."""
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR):
+        self.fixtures_dir = Path(fixtures_dir)
+        self.fixtures_dir.mkdir(parents=True, exist_ok=True)
+
+    def record(self, country, url, links):
+        """
+        Save a country's raw links.
+
+        Args:
+            country: Country name (URL slug format)
+            url: Page the links were collected from
+            links: list of (download attribute, data URL) pairs
+        """
+        fixture = {
+            'country': country,
+            'url': url,
+            'recorded': datetime.now().isoformat(timespec='seconds'),
+            'links': [[download_attr, data_url] for download_attr, data_url in links]
+        }
+
+        with gzip.open(self.fixtures_dir / f"{country}.json.gz", 'wt', encoding='utf-8') as f:
+            json.dump(fixture, f)
+
+        with open(self.fixtures_dir / f"{country}.html", 'w', encoding='utf-8') as f:
+            f.write(render_stand_in_page(country, links))
+
+
+def render_stand_in_page(country, links):
+    """Return an HTML page exposing the recorded links the way iea.org does."""
+    anchors = '\n'.join(
+        f'<a download="{html.escape(download_attr)}" href="{html.escape(data_url)}">Download CSV</a>'
+        for download_attr, data_url in links
+    )
+    return (
+        '<!DOCTYPE html>\n'
+        f'<html><head><meta charset="utf-8"><title>{html.escape(country)} electricity (replay)</title></head>\n'
+        f'<body>\n{anchors}\n</body></html>\n'
+    )
+
+
+def load_fixture(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_corpus(fixtures_dir=FIXTURES_DIR):
+    """Return every recorded fixture, sorted by country."""
+    return [load_fixture(path) for path in sorted(Path(fixtures_dir).glob('*.json.gz'))]
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Decoding and classification of the CSV payloads found on IEA country pages.
+
+Shared by the scraper (scrape_iea_final.py) and the offline replay benchmark
+(replay_benchmark.py); nothing here needs a browser, so the benchmark and the
+tests run without selenium installed.
+"""
+
+import re
+import urllib.parse
+
+
+def extract_csv_from_data_url(data_url):
+    """Extract CSV content from a data URL."""
+    if not data_url or not data_url.startswith('data:text/csv'):
+        return None
+
+    # Extract the URL-encoded content
+    content = data_url.split(',', 1)[1]
+    # URL decode
+    decoded = urllib.parse.unquote(content)
+    return decoded
+
+
+def _is_imports_exports_table(filename_lower, content_head):
+    """Imports/exports tables only identify themselves in their header rows."""
+    return (('electricity,' in content_head or filename_lower.rstrip().endswith('.csv')) and
+            ('import' in content_head or 'export' in content_head))
+
+
+# Regional comparison (North America, etc.) and per capita files are skipped
+SKIP_FILENAME_PHRASES = ('north america', 'regional', 'per capita')
+
+# Files with specific years in the title are snapshots, not time series,
+# unless they are large enough to be the full series
+SNAPSHOT_YEAR_PATTERN = re.compile(r"2000|202[0-4]")
+SNAPSHOT_MIN_SIZE = 1000
+
+# Only the start of a payload (header and first rows) is ever inspected
+CLASSIFIER_CONTENT_HEAD = 2048
+
+# Checked in order: (file_type, standardized name, phrases the lowercased
+# filename must all contain, minimum content size, content check or None)
+CLASSIFIER_RULES = [
+    ('generation', 'generation.csv', ('generation', 'source'), 0, None),
+    ('emissions', 'emissions.csv', ('emission', 'power generation'), 0, None),
+    ('final_consumption', 'final_consumption.csv', ('final consumption', 'sector'), 0, None),
+    ('imports_exports', 'imports_exports.csv', (), 0, _is_imports_exports_table),
+    # This might be useful too
+    ('total_production', 'total_production.csv', ('total', 'production'), 501, None)
+]
+
+
+def classify_file(filename, content):
+    """
+    Classify file type and return standardized name.
+
+    Rules are decided on the filename first; the content is only consulted
+    for its size and, when a rule needs it, the first CLASSIFIER_CONTENT_HEAD
+    characters, so the cost does not grow with the payload.
+
+    Returns: (file_type, standardized_name) or (None, None) if should skip
+    """
+    filename_lower = filename.lower()
+
+    for phrase in SKIP_FILENAME_PHRASES:
+        if phrase in filename_lower:
+            return None, None
+
+    size = len(content) if content else 0
+    if size < SNAPSHOT_MIN_SIZE and SNAPSHOT_YEAR_PATTERN.search(filename):
+        return None, None
+
+    content_head = None
+    for file_type, standard_name, phrases, min_size, content_check in CLASSIFIER_RULES:
+        if size < min_size:
+            continue
+        for phrase in phrases:
+            if phrase not in filename_lower:
+                break
+        else:
+            if content_check:
+                if content_head is None:
+                    content_head = content[:CLASSIFIER_CONTENT_HEAD].lower() if content else ''
+                if not content_check(filename_lower, content_head):
+                    continue
+            return file_type, standard_name
+
+    return None, None
+
+
+def select_country_files(links):
+    """
+    Classify a page's CSV links, keeping the largest version of each dataset type.
+
+    Args:
+        links: (download filename, csv_content) pairs from collect_csv_links
+
+    Returns: dict of file_type -> {'name', 'content', 'original_name'}
+    """
+    files_to_save = {}
+
+    for download_attr, csv_content in links:
+        if not download_attr or not csv_content:
+            continue
+
+        # Classify the file
+        file_type, standard_name = classify_file(download_attr, csv_content)
+
+        if not file_type:
+            continue  # Skip this file
+
+        # Keep the largest version of each file type
+        if file_type not in files_to_save or len(csv_content) > len(files_to_save[file_type]['content']):
+            files_to_save[file_type] = {
+                'name': standard_name,
+                'content': csv_content,
+                'original_name': download_attr
+            }
+
+    return files_to_save
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store of raw chart payloads scraped from iea.org.
+
+Layout (default root data/iea_raw):
+- <country>/<file_type>-<sha256>.csv: one file per distinct payload, never rewritten
+- manifest.json: country -> file_type -> hash and metadata of the current payload
+
+The scraper records every country it downloads here, so a refresh run can tell
+which countries actually changed and skip disk writes and database reloads
+for the rest.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+
+def content_hash(content):
+    """Return the SHA-256 hex digest of a CSV payload."""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class PayloadStore:
+    """Thread-safe content-addressed payload store with a JSON manifest."""
+
+    def __init__(self, root=Path('data/iea_raw')):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.root / 'manifest.json'
+        self.lock = threading.Lock()
+        self.changed_countries = set()
+
+        if self.manifest_path.exists():
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {}
+
+    def payload_path(self, country, file_type, digest):
+        return self.root / country / f"{file_type}-{digest}.csv"
+
+    def current_hash(self, country, file_type):
+        """Return the hash of the last stored payload, or None."""
+        entry = self.manifest.get(country, {}).get(file_type)
+        return entry['sha256'] if entry else None
+
+    def changed_file_types(self, country, files):
+        """Return the file types whose content differs from the last stored payload, storing nothing."""
+        return [file_type for file_type, file_info in files.items()
+                if content_hash(file_info['content']) != self.current_hash(country, file_type)]
+
+    def record_country(self, country, files):
+        """
+        Store a country's classified files and update the manifest.
+
+        Args:
+            country: Country name (URL slug format)
+            files: dict of file_type -> {'name', 'content', 'original_name'}
+
+        Returns: list of file types whose content differs from the last run
+        """
+        changed = []
+
+        for file_type, file_info in files.items():
+            digest = content_hash(file_info['content'])
+            if digest == self.current_hash(country, file_type):
+                continue
+
+            path = self.payload_path(country, file_type, digest)
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(file_info['content'].encode('utf-8'))
+
+            with self.lock:
+                self.manifest.setdefault(country, {})[file_type] = {
+                    'sha256': digest,
+                    'name': file_info['name'],
+                    'original_name': file_info['original_name'],
+                    'bytes': len(file_info['content']),
+                    'updated': datetime.now().isoformat(timespec='seconds')
+                }
+            changed.append(file_type)
+
+        if changed:
+            with self.lock:
+                self.changed_countries.add(country)
+            self.save()
+
+        return changed
+
+    def save(self):
+        """Atomically write the manifest to disk."""
+        with self.lock:
+            tmp_path = self.manifest_path.with_suffix('.json.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.manifest, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
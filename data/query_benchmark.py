@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Load test for query_service.py.
+
+Opens --concurrency keep-alive connections to a running service and sends
+a fixed, seeded mix of heatmap and country-detail requests (every
+indicator, year and value type the page can ask for), then reports
+requests per second, latency percentiles and response statuses.
+
+Start the service, then:
+    python data/query_service.py &
+    python data/query_benchmark.py [--url http://127.0.0.1:8765] [--requests 5000]
+                                   [--concurrency 32] [--conditional] [--no-gzip]
+
+--conditional replays the ETag of every response seen before as
+If-None-Match, as a browser revalidating its cache would.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from urllib.parse import urlencode, urlsplit
+
+from query_service import DEFAULT_PORT
+
+HEATMAP_SHARE = 0.8
+
+
+async def fetch(reader, writer, host, path, headers):
+    """Send one keep-alive GET. Returns (status, response headers, body)."""
+    request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n" + ''.join(
+        f"{name}: {value}\r\n" for name, value in headers.items()) + "\r\n"
+    writer.write(request.encode('latin-1'))
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    response_headers = {}
+    while True:
+        line = await reader.readline()
+        if not line.strip():
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        response_headers[name.strip().lower()] = value.strip()
+
+    body = await reader.readexactly(int(response_headers.get('content-length', 0)))
+    return status, response_headers, body
+
+
+async def get_json(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        status, _, body = await fetch(reader, writer, host, path, {})
+        if status != 200:
+            raise RuntimeError(f"{path} returned {status}")
+        return json.loads(body)
+    finally:
+        writer.close()
+
+
+def request_mix(countries, summary, count, seed=0):
+    """Seeded list of request paths, mostly heatmap queries like the page's controls make."""
+    rng = random.Random(seed)
+    years = summary['years']
+    sources = ['total', 'Coal', 'Natural gas', 'Nuclear', 'Hydropower', 'Wind', 'Solar PV']
+
+    paths = []
+    for _ in range(count):
+        if rng.random() >= HEATMAP_SHARE:
+            paths.append(f"/api/country/{rng.choice(countries)}")
+            continue
+
+        indicator = rng.choice(['generation', 'generation', 'consumption', 'imports'])
+        params = {'indicator': indicator, 'year': rng.choice(years)}
+        value_type = rng.choice(['absolute', 'share', 'indexed'])
+        if indicator == 'generation':
+            params['source'] = rng.choice(sources)
+        if value_type != 'absolute':
+            params['valueType'] = value_type
+        if value_type == 'indexed':
+            params['baseYear'] = years[0]
+        paths.append(f"/api/heatmap?{urlencode(params)}")
+    return paths
+
+
+async def worker(host, port, paths, etags, options, latencies, statuses, received):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while paths:
+            path = paths.pop()
+            headers = {} if options.no_gzip else {'Accept-Encoding': 'gzip'}
+            if options.conditional and path in etags:
+                headers['If-None-Match'] = etags[path]
+
+            start = time.perf_counter()
+            status, response_headers, body = await fetch(reader, writer, host, path, headers)
+            latencies.append(time.perf_counter() - start)
+
+            statuses[status] += 1
+            received[0] += len(body)
+            if 'etag' in response_headers:
+                etags[path] = response_headers['etag']
+    finally:
+        writer.close()
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run(options):
+    url = urlsplit(options.url)
+    host, port = url.hostname, url.port or DEFAULT_PORT
+
+    countries = list(await get_json(host, port, '/api/index'))
+    summary = await get_json(host, port, '/api/summary')
+    paths = request_mix(countries, summary, options.requests, options.seed)
+    print(f"{len(paths)} requests ({len(set(paths))} distinct) over {options.concurrency} connections "
+          f"to {options.url}")
+
+    latencies, statuses, received, etags = [], Counter(), [0], {}
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(host, port, paths, etags, options, latencies, statuses, received)
+                           for _ in range(options.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print("="*70)
+    print(f"Requests/s:  {len(latencies) / elapsed:,.0f} ({elapsed:.2f} s)")
+    print(f"Latency:     p50 {percentile(latencies, 0.5) * 1000:.2f} ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+    print(f"Statuses:    {', '.join(f'{status}: {count}' for status, count in sorted(statuses.items()))}")
+    print(f"Received:    {received[0] / 1024 / 1024:.2f} MB")
+    print("="*70)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load-test a running query_service.py.")
+    parser.add_argument('--url', default=f"http://127.0.0.1:{DEFAULT_PORT}")
+    parser.add_argument('--requests', type=int, default=5000, help="total number of requests")
+    parser.add_argument('--concurrency', type=int, default=32, help="number of keep-alive connections")
+    parser.add_argument('--conditional', action='store_true',
+                        help="revalidate with If-None-Match once an ETag has been seen")
+    parser.add_argument('--no-gzip', action='store_true', help="do not send Accept-Encoding: gzip")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the request mix")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    asyncio.run(run(parse_args()))
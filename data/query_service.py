@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Local asyncio HTTP query service over iea_electricity.db.
+
+Answers the page's queries straight from the database instead of the
+exported files (point js/dataManager.js at it with ?api=http://127.0.0.1:8765):
+    GET /api/countries                   countries.json
+    GET /api/summary                     summary.json
+    GET /api/index                       index.json
+    GET /api/country/<country_code>      shards/<country_code>.json
+    GET /api/groups                      groups.json
+    GET /api/group/<group_code>          shards/groups/<group_code>.json
+    GET /api/heatmap?indicator=generation&year=2023[&source=Wind][&valueType=share]
+                    [&baseYear=2000]     DataManager.getHeatmapData() output
+
+Queries run on a pool of read-only SQLite connections in worker threads.
+Responses are kept in an LRU cache with strong ETags (If-None-Match gets a
+304) and a gzip copy for clients that accept it; the cache is dropped when
+the database file changes. Everything listens on localhost only by default.
+
+    python data/query_service.py [--db data/iea_electricity.db] [--port 8765]
+
+Load-test it with data/query_benchmark.py.
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import sqlite3
+import traceback
+from collections import OrderedDict, namedtuple
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from aggregates import GENERATION_UNIT
+from export_data_to_json import (SERIES_QUERIES, build_groups, build_summary, country_shard, group_shard,
+                                 iter_country_series, shard_index_entry)
+
+DEFAULT_PORT = 8765
+POOL_SIZE = 4
+RESPONSE_CACHE_SIZE = 2048
+
+# Heatmap indicator -> country_year_totals column of its total layer
+INDICATOR_COLUMNS = {
+    'generation': 'generation_gwh',
+    'consumption': 'consumption',
+    'imports': 'net_imports'
+}
+VALUE_TYPES = ('absolute', 'share', 'indexed')
+
+CachedResponse = namedtuple('CachedResponse', ['etag', 'body', 'gzip_body'])
+
+
+class QueryError(Exception):
+    """A request the service cannot answer, with the HTTP status to answer it with."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ConnectionPool:
+    """Read-only SQLite connections handed out to one worker thread at a time."""
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.connections = asyncio.Queue()
+        for _ in range(size):
+            conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+            self.connections.put_nowait(conn)
+
+    async def run(self, function, *args):
+        """Run function(conn, *args) in a worker thread on a free connection."""
+        conn = await self.connections.get()
+        try:
+            return await asyncio.to_thread(function, conn, *args)
+        finally:
+            self.connections.put_nowait(conn)
+
+    def close(self):
+        while not self.connections.empty():
+            self.connections.get_nowait().close()
+
+
+def heatmap_layer(indicator, source, value_type):
+    """SQL for one year of a heatmap layer as (country_id, value) rows (year bound as :layer_year)."""
+    # Only generation has per-source layers; shares exist for single sources
+    layer_source = source if indicator == 'generation' else 'total'
+    if layer_source == 'total':
+        return f"""
+            SELECT country_id, {INDICATOR_COLUMNS[indicator]} AS value FROM country_year_totals
+            WHERE year = :layer_year
+        """, {}
+    if value_type == 'share':
+        return """
+            SELECT g.country_id, g.share AS value FROM generation_shares g
+            JOIN series s ON s.id = g.series_id AND s.name = :source
+            WHERE g.year = :layer_year
+        """, {'source': layer_source}
+    return """
+        SELECT f.country_id, f.value FROM generation_facts f
+        JOIN series s ON s.id = f.series_id AND s.name = :source
+        JOIN units u ON u.id = f.unit_id AND u.name = :generation_unit
+        WHERE f.year = :layer_year
+    """, {'source': layer_source, 'generation_unit': GENERATION_UNIT}
+
+
+def query_heatmap(conn, indicator, year, source, value_type, base_year):
+    """Same result as DataManager.getHeatmapData: [{country, value}], skipping missing and zero values."""
+    layer, params = heatmap_layer(indicator, source, value_type)
+    values = conn.execute(layer, {**params, 'layer_year': year}).fetchall()
+
+    # Indexed mode divides by the same layer's base-year value
+    base = {}
+    if value_type == 'indexed' and base_year:
+        base = dict(conn.execute(layer, {**params, 'layer_year': base_year}))
+
+    codes = dict(conn.execute("SELECT id, country_code FROM countries"))
+    data = []
+    for country_id, value in values:
+        if value is None:
+            continue
+        base_value = base.get(country_id)
+        if base_value:
+            value = value / base_value * 100
+        if value != 0:
+            data.append({'country': codes[country_id], 'value': value})
+    return sorted(data, key=lambda item: item['country'])
+
+
+def query_countries(conn):
+    return dict(conn.execute("SELECT country_code, country_name FROM countries ORDER BY country_code"))
+
+
+def query_index(conn):
+    """index.json: series names and year range per country and dataset."""
+    index = {}
+    for label, query, params in SERIES_QUERIES:
+        for country_code, years in iter_country_series(conn.execute(query, params)):
+            index.setdefault(country_code, {}).update(shard_index_entry({label: years}))
+    return dict(sorted(index.items()))
+
+
+def query_country(conn, country_code):
+    shard = country_shard(conn, country_code)
+    if not shard:
+        raise QueryError(HTTPStatus.NOT_FOUND, f"No data for country {country_code!r}")
+    return shard
+
+
+def query_group(conn, group_code):
+    shard = group_shard(conn, group_code)
+    if not shard:
+        raise QueryError(HTTPStatus.NOT_FOUND, f"No data for group {group_code!r}")
+    return shard
+
+
+def int_param(params, name, required=False):
+    value = params.get(name)
+    if value in (None, '', 'null'):
+        if required:
+            raise QueryError(HTTPStatus.BAD_REQUEST, f"Missing parameter {name!r}")
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise QueryError(HTTPStatus.BAD_REQUEST, f"Parameter {name!r} must be an integer")
+
+
+def heatmap_args(params):
+    indicator = params.get('indicator', 'generation')
+    if indicator not in INDICATOR_COLUMNS:
+        raise QueryError(HTTPStatus.BAD_REQUEST, f"Unknown indicator {indicator!r}")
+    value_type = params.get('valueType', 'absolute')
+    if value_type not in VALUE_TYPES:
+        raise QueryError(HTTPStatus.BAD_REQUEST, f"Unknown valueType {value_type!r}")
+    return (indicator, int_param(params, 'year', required=True), params.get('source', 'total'),
+            value_type, int_param(params, 'baseYear'))
+
+
+class QueryService:
+    """Routes requests to queries and caches the encoded responses."""
+
+    def __init__(self, db_path, pool_size=POOL_SIZE, cache_size=RESPONSE_CACHE_SIZE):
+        self.db_path = Path(db_path)
+        self.pool = ConnectionPool(self.db_path, pool_size)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.pending = {}
+        self.data_stamp = self.database_stamp()
+
+    def database_stamp(self):
+        """Changes whenever the database (or its WAL) is written."""
+        stamp = []
+        for path in (self.db_path, self.db_path.with_name(self.db_path.name + '-wal')):
+            if path.exists():
+                stat = path.stat()
+                stamp.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(stamp)
+
+    def route(self, path, params):
+        """Return (cache key, query function, query args) for a request path."""
+        if path == '/api/heatmap':
+            args = heatmap_args(params)
+            return ('heatmap', *args), query_heatmap, args
+        if path == '/api/countries':
+            return ('countries',), query_countries, ()
+        if path == '/api/summary':
+            return ('summary',), build_summary, ()
+        if path == '/api/index':
+            return ('index',), query_index, ()
+        if path.startswith('/api/country/'):
+            country_code = unquote(path[len('/api/country/'):])
+            return ('country', country_code), query_country, (country_code,)
+        if path == '/api/groups':
+            return ('groups',), build_groups, ()
+        if path.startswith('/api/group/'):
+            code = unquote(path[len('/api/group/'):])
+            return ('group', code), query_group, (code,)
+        raise QueryError(HTTPStatus.NOT_FOUND, f"Unknown path {path!r}")
+
+    async def response(self, key, function, args):
+        """Cached response for key, running the query once even for concurrent misses."""
+        stamp = self.database_stamp()
+        if stamp != self.data_stamp:
+            self.cache.clear()
+            self.data_stamp = stamp
+
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        if key not in self.pending:
+            self.pending[key] = asyncio.ensure_future(self.build_response(key, function, args))
+        try:
+            return await asyncio.shield(self.pending[key])
+        finally:
+            self.pending.pop(key, None)
+
+    async def build_response(self, key, function, args):
+        payload = await self.pool.run(function, *args)
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        entry = CachedResponse(f'"{hashlib.sha256(body).hexdigest()[:16]}"', body,
+                               gzip.compress(body, compresslevel=6, mtime=0))
+
+        self.cache[key] = entry
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return entry
+
+    async def handle(self, method, target, headers):
+        """Return (status, headers, body) for one request."""
+        response_headers = {'Access-Control-Allow-Origin': '*'}
+        if method == 'OPTIONS':
+            response_headers['Access-Control-Allow-Methods'] = 'GET, HEAD, OPTIONS'
+            return HTTPStatus.NO_CONTENT, response_headers, b''
+        if method not in ('GET', 'HEAD'):
+            return error_response(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} is not supported", response_headers)
+
+        url = urlsplit(target)
+        try:
+            key, function, args = self.route(url.path, dict(parse_qsl(url.query)))
+            entry = await self.response(key, function, args)
+        except QueryError as e:
+            return error_response(e.status, str(e), response_headers)
+        except Exception as e:
+            # A database error or a bug in a query: log it and still answer
+            print(f"✗ {method} {target} failed: {e!r}")
+            traceback.print_exc()
+            return error_response(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal server error", response_headers)
+
+        response_headers.update({
+            'Content-Type': 'application/json; charset=utf-8',
+            'Cache-Control': 'no-cache',
+            'ETag': entry.etag,
+            'Vary': 'Accept-Encoding'
+        })
+
+        if entry.etag in (tag.strip() for tag in headers.get('if-none-match', '').split(',')):
+            return HTTPStatus.NOT_MODIFIED, response_headers, b''
+
+        body = entry.body
+        if 'gzip' in headers.get('accept-encoding', ''):
+            body = entry.gzip_body
+            response_headers['Content-Encoding'] = 'gzip'
+        return HTTPStatus.OK, response_headers, body
+
+    async def serve_client(self, reader, writer):
+        """HTTP/1.1 with keep-alive: one request at a time per connection."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    status, response_headers, body = error_response(HTTPStatus.BAD_REQUEST, "Malformed request")
+                    method, version = 'GET', 'HTTP/1.0'
+                else:
+                    method, target, version = parts
+                    status, response_headers, body = await self.handle(method, target, headers)
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                response_headers['Content-Length'] = str(len(body))
+                response_headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+
+                head = f"HTTP/1.1 {status.value} {status.phrase}\r\n" + ''.join(
+                    f"{name}: {value}\r\n" for name, value in response_headers.items()) + "\r\n"
+                writer.write(head.encode('latin-1'))
+                if method != 'HEAD':
+                    writer.write(body)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        except Exception as e:
+            print(f"✗ Connection dropped: {e!r}")
+            traceback.print_exc()
+        finally:
+            writer.close()
+
+    def close(self):
+        self.pool.close()
+
+
+def error_response(status, message, headers=None):
+    headers = dict(headers or {})
+    headers['Content-Type'] = 'application/json; charset=utf-8'
+    return status, headers, json.dumps({'error': message}).encode('utf-8')
+
+
+async def serve(db_path, host, port, pool_size, cache_size):
+    service = QueryService(db_path, pool_size, cache_size)
+    server = await asyncio.start_server(service.serve_client, host, port)
+
+    print("="*70)
+    print(f"Query service for {db_path}")
+    print(f"Listening on http://{host}:{port}/api/ ({pool_size} read-only connections, "
+          f"{cache_size} cached responses)")
+    print(f"Open the page with ?api=http://{host}:{port} to use it")
+    print("="*70)
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve heatmap and country queries from iea_electricity.db.")
+    parser.add_argument('--db', type=Path, default=Path('data/iea_electricity.db'),
+                        help="database to serve (opened read-only)")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on (default: localhost only)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--pool-size', type=int, default=POOL_SIZE,
+                        help="number of read-only database connections")
+    parser.add_argument('--cache-size', type=int, default=RESPONSE_CACHE_SIZE,
+                        help="number of responses kept in the LRU cache")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not args.db.exists():
+        print(f"✗ Database not found: {args.db}")
+        return
+    try:
+        asyncio.run(serve(args.db, args.host, args.port, args.pool_size, args.cache_size))
+    except KeyboardInterrupt:
+        print("\nStopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Offline throughput benchmark for the extraction/classification path.
+
+Replays the recorded fixture corpus (see page_fixtures.py) through
+extract_csv_from_data_url and select_country_files/classify_file, exactly
+as download_country_data does after collecting a page's links, and reports
+countries per second and MB per second. No browser or network is needed.
+
+Record a corpus first:
+    python data/scrape_iea_final.py --record-fixtures data/fixtures/iea_pages
+
+Then:
+    python data/replay_benchmark.py [--fixtures DIR] [--repeat N] [--compare-classifier]
+
+--compare-classifier also times classify_file against the original
+lowercase-and-scan implementation on every decoded payload in the corpus
+and checks that both agree.
+"""
+
+import argparse
+import time
+from collections import Counter
+from pathlib import Path
+
+from page_fixtures import FIXTURES_DIR, load_corpus
+from page_payloads import classify_file, extract_csv_from_data_url, select_country_files
+
+
+def legacy_classify_file(filename, content):
+    """The original classify_file, kept as the reference for --compare-classifier."""
+    filename_lower = filename.lower()
+    content_lower = content.lower() if content else ''
+
+    if 'north america' in filename_lower or 'regional' in filename_lower:
+        return None, None
+
+    if 'per capita' in filename_lower:
+        return None, None
+
+    if any(year in filename for year in ['2000', '2020', '2021', '2022', '2023', '2024']):
+        if len(content) < 1000:
+            return None, None
+
+    if 'generation' in filename_lower and 'source' in filename_lower:
+        return 'generation', 'generation.csv'
+    elif 'emission' in filename_lower and 'power generation' in filename_lower:
+        return 'emissions', 'emissions.csv'
+    elif 'final consumption' in filename_lower and 'sector' in filename_lower:
+        return 'final_consumption', 'final_consumption.csv'
+    elif ('electricity,' in content_lower or filename_lower.strip().endswith('.csv')) and \
+         ('import' in content_lower or 'export' in content_lower):
+        return 'imports_exports', 'imports_exports.csv'
+    elif 'total' in filename_lower and 'production' in filename_lower and len(content) > 500:
+        return 'total_production', 'total_production.csv'
+
+    return None, None
+
+
+def replay_country(links):
+    """Decode and classify one country's recorded links."""
+    decoded = [(download_attr, extract_csv_from_data_url(data_url)) for download_attr, data_url in links]
+    return select_country_files(decoded)
+
+
+def run_benchmark(corpus, repeat):
+    """
+    Replay the whole corpus `repeat` times.
+
+    Returns: (seconds, bytes processed, Counter of dataset types found per pass)
+    """
+    payload_bytes = sum(len(data_url) for fixture in corpus for _, data_url in fixture['links'])
+    found = Counter()
+
+    start = time.perf_counter()
+    for i in range(repeat):
+        for fixture in corpus:
+            files = replay_country(fixture['links'])
+            if i == 0:
+                found.update(files.keys())
+    seconds = time.perf_counter() - start
+
+    return seconds, payload_bytes * repeat, found
+
+
+def time_classifier(classifier, payloads, repeat):
+    """Return seconds spent classifying every payload `repeat` times."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for download_attr, content in payloads:
+            classifier(download_attr, content)
+    return time.perf_counter() - start
+
+
+def compare_classifiers(corpus, repeat):
+    """Time classify_file against legacy_classify_file on pre-decoded payloads."""
+    payloads = []
+    for fixture in corpus:
+        for download_attr, data_url in fixture['links']:
+            content = extract_csv_from_data_url(data_url)
+            if download_attr and content:
+                payloads.append((download_attr, content))
+
+    mismatches = [(download_attr, legacy_classify_file(download_attr, content)[0],
+                   classify_file(download_attr, content)[0])
+                  for download_attr, content in payloads
+                  if legacy_classify_file(download_attr, content) != classify_file(download_attr, content)]
+
+    legacy_seconds = time_classifier(legacy_classify_file, payloads, repeat)
+    current_seconds = time_classifier(classify_file, payloads, repeat)
+    calls = len(payloads) * repeat
+
+    print(f"\nClassifier comparison ({len(payloads):,} payloads x {repeat}):")
+    print(f"  legacy classify_file  {legacy_seconds / calls * 1e6:9.2f} µs/payload")
+    print(f"  classify_file         {current_seconds / calls * 1e6:9.2f} µs/payload "
+          f"({legacy_seconds / current_seconds:.1f}x)")
+    print(f"  Disagreements: {len(mismatches)}")
+    for download_attr, legacy_type, current_type in mismatches[:10]:
+        print(f"    {download_attr[:50]:50s} legacy={legacy_type} current={current_type}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark CSV extraction/classification on recorded pages.")
+    parser.add_argument('--fixtures', type=Path, default=FIXTURES_DIR,
+                        help=f"fixture corpus directory (default: {FIXTURES_DIR})")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="passes over the corpus (default: 5)")
+    parser.add_argument('--compare-classifier', action='store_true',
+                        help="benchmark classify_file against the original implementation")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    corpus = load_corpus(args.fixtures)
+    if not corpus:
+        print(f"No fixtures found in {args.fixtures}")
+        return
+
+    links = sum(len(fixture['links']) for fixture in corpus)
+    print(f"Replaying {len(corpus)} countries ({links:,} links) x {args.repeat}")
+
+    seconds, payload_bytes, found = run_benchmark(corpus, args.repeat)
+    countries = len(corpus) * args.repeat
+
+    print(f"\n{'='*70}")
+    print(f"Time: {seconds:.3f}s")
+    print(f"Throughput: {countries / seconds:,.1f} countries/s, "
+          f"{payload_bytes / seconds / 1024 / 1024:,.1f} MB/s")
+    print("\nDatasets found per pass:")
+    for file_type, count in sorted(found.items()):
+        print(f"  {file_type:20s} {count:4d}/{len(corpus)}")
+
+    if args.compare_classifier:
+        compare_classifiers(corpus, args.repeat)
+    print(f"{'='*70}")
+
+
+if __name__ == '__main__':
+    main()
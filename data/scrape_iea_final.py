@@ -4,16 +4,21 @@ Final production IEA scraper for all countries.
 Downloads electricity data: generation, emissions, imports/exports, and final consumption.
 """
 
+import argparse
+import queue
+import threading
 import time
 import os
 from pathlib import Path
 from selenium import webdriver
-from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.common.exceptions import InvalidSessionIdException, TimeoutException
-import urllib.parse
 import csv
 from datetime import datetime
+from page_fixtures import FixtureRecorder
+from page_payloads import classify_file, extract_csv_from_data_url, select_country_files
+from payload_store import PayloadStore
+from scrape_metrics import CountryMetrics, MetricsLog
 
 # List of IEA countries
 IEA_COUNTRIES = [
@@ -45,9 +50,69 @@ IEA_COUNTRIES = [
     "uruguay","uzbekistan","venezuela","vietnam","yemen","zambia","zimbabwe"
 ]
 
+# Country page to scrape; point at a replay corpus with --url-template
+COUNTRY_URL_TEMPLATE = "https://www.iea.org/countries/{country}/electricity"
+
+# Each worker restarts its browser after this many countries
+DRIVER_REFRESH_INTERVAL = 5
+
+# Browser start attempts before a worker gives up on its current country
+DRIVER_START_ATTEMPTS = 2
+
+# Anchors the IEA charts render for their "Download CSV" buttons
+CSV_LINK_SELECTOR = 'a[download][href^="data:text/csv"]'
+
+# Dataset types a complete country page provides
+EXPECTED_FILE_TYPES = {'generation', 'emissions', 'imports_exports', 'final_consumption'}
+
+# Page readiness: scroll step (px), poll interval (s), polls without new links
+# before the page counts as settled, and the ceiling per page (s)
+READY_SCROLL_STEP = 800
+READY_POLL_INTERVAL = 0.4
+READY_STABLE_POLLS = 3
+READY_TIMEOUT = 20
+
+# Scrolls one step, then reports every CSV anchor's filename and the start of
+# its payload (enough for classify_file to recognise imports/exports tables)
+READINESS_PROBE_SCRIPT = """
+const [selector, position, prefixLength] = arguments;
+window.scrollTo(0, position);
+const links = Array.from(document.querySelectorAll(selector));
+return {
+    height: document.body.scrollHeight,
+    links: links.map(a => [a.getAttribute('download') || '', a.getAttribute('href').slice(0, prefixLength)])
+};
+"""
+READINESS_PREFIX_LENGTH = 4096
+
+# Returns [filename, payload, decoded] for every CSV anchor in one call. With
+# decoding requested, payloads are URL-decoded in the browser; anchors that
+# fail to decode come back as raw data URLs for extract_csv_from_data_url
+BULK_EXTRACT_SCRIPT = """
+const [selector, decode] = arguments;
+return Array.from(document.querySelectorAll(selector), a => {
+    const name = a.getAttribute('download') || '';
+    const href = a.getAttribute('href') || '';
+    if (decode) {
+        try {
+            return [name, decodeURIComponent(href.slice(href.indexOf(',') + 1)), true];
+        } catch (e) {
+            // Malformed escape sequence: let Python decode it leniently
+        }
+    }
+    return [name, href, false];
+});
+"""
+
+
+def init_driver(metrics_log=None, worker=None, reason='scheduled'):
+    """
+    Initialize Selenium webdriver with appropriate options.
 
-def init_driver():
-    """Initialize Selenium webdriver with appropriate options."""
+    When a MetricsLog is given, the start-up time is recorded as a
+    'driver_init' event.
+    """
+    start = time.perf_counter()
     options = webdriver.ChromeOptions()
     options.add_argument('--headless')
     options.add_argument('--no-sandbox')
@@ -55,19 +120,36 @@ def init_driver():
     options.add_argument('--disable-gpu')
     options.add_argument('--window-size=1920,1080')
     driver = webdriver.Chrome(options=options)
+    if metrics_log:
+        metrics_log.write({
+            'event': 'driver_init',
+            'worker': worker,
+            'reason': reason,
+            'seconds': round(time.perf_counter() - start, 4)
+        })
     return driver
 
 
-def extract_csv_from_data_url(data_url):
-    """Extract CSV content from a data URL."""
-    if not data_url or not data_url.startswith('data:text/csv'):
-        return None
+def collect_csv_links(driver, decode_in_browser=True, metrics=None):
+    """
+    Collect every CSV download link on the page with a single script call.
+
+    Returns: list of (download filename, csv_content) pairs; csv_content is
+    None when the payload could not be extracted
+    """
+    metrics = metrics or CountryMetrics(None)
+
+    with metrics.phase('collect'):
+        raw_links = driver.execute_script(BULK_EXTRACT_SCRIPT, CSV_LINK_SELECTOR, decode_in_browser)
 
-    # Extract the URL-encoded content
-    content = data_url.split(',', 1)[1]
-    # URL decode
-    decoded = urllib.parse.unquote(content)
-    return decoded
+    links = []
+    with metrics.phase('decode'):
+        for download_attr, payload, decoded in raw_links:
+            csv_content = payload if decoded else extract_csv_from_data_url(payload)
+            links.append((download_attr, csv_content))
+            metrics.count('payload_bytes', len(csv_content or ''))
+    metrics.count('links', len(links))
+    return links
 
 
 def wait_for_page_idle(driver, timeout=10):
@@ -84,81 +166,100 @@ def wait_for_page_idle(driver, timeout=10):
         pass  # Continue anyway
 
 
-def classify_file(filename, content):
+def wait_for_charts_ready(driver, timeout=READY_TIMEOUT):
     """
-    Classify file type and return standardized name.
+    Scroll through the page until its chart download links have rendered.
 
-    Returns: (file_type, standardized_name) or (None, None) if should skip
+    The page counts as ready once every expected dataset type is present, or
+    once the bottom has been reached and the number of CSV anchors has stopped
+    growing for READY_STABLE_POLLS polls. Gives up after `timeout` seconds.
+
+    Returns: dict with seconds taken, links found, types found and the reason
+    the wait ended ('complete', 'stable' or 'timeout')
     """
-    filename_lower = filename.lower()
-    content_lower = content.lower() if content else ''
-
-    # Skip regional comparison files (North America, etc.)
-    if 'north america' in filename_lower or 'regional' in filename_lower:
-        return None, None
-
-    # Skip per capita or single-year snapshot files
-    if 'per capita' in filename_lower:
-        return None, None
-
-    # Skip files with specific years in the title (these are snapshots, not time series)
-    if any(year in filename for year in ['2000', '2020', '2021', '2022', '2023', '2024']):
-        # Unless it's the full time series (which would be large)
-        if len(content) < 1000:
-            return None, None
-
-    # Classify by content/filename
-    if 'generation' in filename_lower and 'source' in filename_lower:
-        return 'generation', 'generation.csv'
-    elif 'emission' in filename_lower and 'power generation' in filename_lower:
-        return 'emissions', 'emissions.csv'
-    elif 'final consumption' in filename_lower and 'sector' in filename_lower:
-        return 'final_consumption', 'final_consumption.csv'
-    elif ('electricity,' in content_lower or filename_lower.strip().endswith('.csv')) and \
-         ('import' in content_lower or 'export' in content_lower):
-        return 'imports_exports', 'imports_exports.csv'
-    elif 'total' in filename_lower and 'production' in filename_lower and len(content) > 500:
-        # This might be useful too
-        return 'total_production', 'total_production.csv'
-
-    return None, None
-
-
-def download_country_data(driver, country, output_dir):
+    start = time.monotonic()
+    position = 0
+    last_count = -1
+    stable_polls = 0
+
+    while True:
+        probe = driver.execute_script(READINESS_PROBE_SCRIPT, CSV_LINK_SELECTOR, position,
+                                      READINESS_PREFIX_LENGTH)
+        at_bottom = position >= probe['height']
+        position = min(position + READY_SCROLL_STEP, probe['height'])
+
+        found_types = set()
+        for download_attr, data_url_prefix in probe['links']:
+            content_prefix = extract_csv_from_data_url(data_url_prefix)
+            if download_attr and content_prefix:
+                file_type, _ = classify_file(download_attr, content_prefix)
+                if file_type:
+                    found_types.add(file_type)
+
+        count = len(probe['links'])
+        if at_bottom and count == last_count:
+            stable_polls += 1
+        else:
+            stable_polls = 0
+        last_count = count
+
+        if EXPECTED_FILE_TYPES <= found_types:
+            reason = 'complete'
+        elif stable_polls >= READY_STABLE_POLLS:
+            reason = 'stable'
+        elif time.monotonic() - start >= timeout:
+            reason = 'timeout'
+        else:
+            time.sleep(READY_POLL_INTERVAL)
+            continue
+
+        return {
+            'seconds': time.monotonic() - start,
+            'links': count,
+            'types': sorted(found_types),
+            'reason': reason
+        }
+
+
+def download_country_data(driver, country, output_dir, store=None, sink=None, metrics=None,
+                          recorder=None, url_template=COUNTRY_URL_TEMPLATE):
     """
     Download all available datasets for a given country.
 
     Args:
         driver: Selenium webdriver instance
         country: Country name (URL slug format)
-        output_dir: Directory to save downloaded files
+        output_dir: Directory to save downloaded files, or None to skip writing CSVs
+        store: Optional PayloadStore; files whose content is unchanged since
+            the last run are not rewritten
+        sink: Optional callable(country, files) receiving the changed files
+            (dict of file_type -> file info) as soon as they are extracted.
+            With a sink, the payloads are not recorded in the store here: the
+            sink's consumer records them once they are loaded
+        metrics: Optional CountryMetrics collecting per-phase timings and counters
+        recorder: Optional FixtureRecorder saving the page's raw links for replay
+        url_template: Page URL with a {country} placeholder
     """
-    url = f"https://www.iea.org/countries/{country}/electricity"
+    url = url_template.format(country=country)
+    metrics = metrics or CountryMetrics(country)
 
     try:
         print(f"  Navigating to {url}")
-        driver.get(url)
-
-        # Wait for page to be ready
-        wait_for_page_idle(driver)
-        time.sleep(3)  # Initial load
-
-        # Scroll slowly to trigger all chart renders
-        scroll_positions = [0, 500, 1000, 1500, 2000, 2500, 3000, 4000, 5000]
-        for pos in scroll_positions:
-            driver.execute_script(f"window.scrollTo(0, {pos});")
-            time.sleep(1.3)  # 1.3 seconds as specified
-
-        # Scroll to bottom
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(3)  # 3 seconds between pages as specified
-
-        # Scroll back up
-        driver.execute_script("window.scrollTo(0, 0);")
-        time.sleep(2)
-
-        # Find all CSV download links
-        links = driver.find_elements(By.CSS_SELECTOR, 'a[download][href^="data:text/csv"]')
+        with metrics.phase('navigate'):
+            driver.get(url)
+
+        # Wait for page to be ready, then scroll until the charts have rendered
+        with metrics.phase('page_idle'):
+            wait_for_page_idle(driver)
+        with metrics.phase('readiness'):
+            readiness = wait_for_charts_ready(driver)
+        if readiness['reason'] == 'timeout':
+            metrics.count('ready_timeouts')
+        print(f"  Page ready in {readiness['seconds']:.1f}s "
+              f"({readiness['links']} CSV links, {readiness['reason']})")
+
+        # Fetch all CSV download links in one round trip
+        links = collect_csv_links(driver, metrics=metrics)
 
         if not links:
             print(f"  Warning: No CSV download links found for {country}")
@@ -166,48 +267,51 @@ def download_country_data(driver, country, output_dir):
 
         print(f"  Found {len(links)} CSV links, processing...")
 
-        # Collect all files
-        files_to_save = {}
-
-        for link in links:
-            download_attr = link.get_attribute('download')
-            data_url = link.get_attribute('href')
-
-            if not download_attr or not data_url:
-                continue
-
-            # Extract CSV content
-            csv_content = extract_csv_from_data_url(data_url)
-            if not csv_content:
-                continue
-
-            # Classify the file
-            file_type, standard_name = classify_file(download_attr, csv_content)
-
-            if not file_type:
-                continue  # Skip this file
+        if recorder:
+            # Raw data URLs, undecoded, exactly as the page serves them
+            raw_links = driver.execute_script(BULK_EXTRACT_SCRIPT, CSV_LINK_SELECTOR, False)
+            recorder.record(country, url, [(download_attr, href) for download_attr, href, _ in raw_links])
 
-            # Keep the largest version of each file type
-            if file_type not in files_to_save or len(csv_content) > len(files_to_save[file_type]['content']):
-                files_to_save[file_type] = {
-                    'name': standard_name,
-                    'content': csv_content,
-                    'original_name': download_attr
-                }
+        with metrics.phase('classify'):
+            files_to_save = select_country_files(links)
+        metrics.count('datasets', len(files_to_save))
 
         # Save files
         if not files_to_save:
             print(f"  Warning: No valid data files found for {country}")
             return False
 
+        with metrics.phase('store'):
+            if not store:
+                changed = list(files_to_save)
+            elif sink:
+                changed = store.changed_file_types(country, files_to_save)
+            else:
+                changed = store.record_country(country, files_to_save)
+        metrics.count('datasets_changed', len(changed))
+
+        if sink and changed:
+            with metrics.phase('sink'):
+                sink(country, {file_type: files_to_save[file_type] for file_type in changed})
+
+        if output_dir is None:
+            print(f"    ✓ {len(files_to_save)} datasets extracted ({len(changed)} changed)")
+            return True
+
         country_dir = output_dir / country
         country_dir.mkdir(parents=True, exist_ok=True)
 
         for file_type, file_info in files_to_save.items():
             filepath = country_dir / file_info['name']
 
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(file_info['content'])
+            if file_type not in changed and filepath.exists():
+                print(f"    = {file_info['name']} unchanged")
+                continue
+
+            with metrics.phase('write'):
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    f.write(file_info['content'])
+            metrics.count('bytes_written', len(file_info['content']))
 
             lines = file_info['content'].count('\n')
             print(f"    ✓ {file_info['name']} ({len(file_info['content']):,} bytes, {lines} lines)")
@@ -222,8 +326,175 @@ def download_country_data(driver, country, output_dir):
         return False
 
 
+class ProgressTracker:
+    """
+    Thread-safe record of scraped countries, shared by all scraping workers.
+
+    Completed countries are appended to progress.txt as they finish so an
+    interrupted run can resume where it left off. With progress_file=None
+    progress is only kept in memory.
+    """
+
+    def __init__(self, progress_file):
+        self.progress_file = progress_file
+        self.lock = threading.Lock()
+        self.successful = []
+        self.failed = []
+
+        if progress_file and progress_file.exists():
+            with open(progress_file, 'r') as f:
+                self.successful = [line.strip() for line in f if line.strip()]
+
+        self.completed = set(self.successful)
+
+    def mark_success(self, country):
+        with self.lock:
+            self.successful.append(country)
+            self.completed.add(country)
+            if self.progress_file:
+                with open(self.progress_file, 'a') as f:
+                    f.write(f"{country}\n")
+
+    def mark_failed(self, country):
+        with self.lock:
+            self.failed.append(country)
+
+
+def scrape_worker(worker_id, country_queue, tracker, download_options, metrics_log=None):
+    """
+    Scrape countries from a shared queue until it is empty.
+
+    Each worker owns its own headless driver, refreshing it every
+    DRIVER_REFRESH_INTERVAL countries and after session errors.
+    download_options are passed through to download_country_data; with a
+    MetricsLog, one event is written per country and per driver start.
+    """
+    driver = None
+    processed = 0
+
+    try:
+        while True:
+            try:
+                index, country = country_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            # Refresh driver every few countries to avoid session errors
+            # (and start one again if the last start failed)
+            if driver is None or processed % DRIVER_REFRESH_INTERVAL == 0:
+                driver = restart_driver(driver, worker_id, metrics_log, 'refresh' if driver else 'start')
+            processed += 1
+
+            print(f"\n[{index}/{len(IEA_COUNTRIES)}] [worker {worker_id}] Processing {country}...")
+
+            metrics = CountryMetrics(country, worker_id)
+            if driver is None:
+                print(f"  No browser available for {country}")
+                success = False
+            else:
+                try:
+                    success = download_country_data(driver, country, metrics=metrics, **download_options)
+                except InvalidSessionIdException:
+                    # Refresh driver and retry
+                    print(f"  Refreshing driver and retrying {country}...")
+                    driver = restart_driver(driver, worker_id, metrics_log, 'session_error')
+                    metrics.count('retries')
+                    try:
+                        success = driver is not None and download_country_data(
+                            driver, country, metrics=metrics, **download_options)
+                    except Exception as e:
+                        print(f"  Retry failed for {country}: {str(e)}")
+                        success = False
+                except Exception as e:
+                    print(f"  Unexpected error for {country}: {str(e)}")
+                    success = False
+
+            if metrics_log:
+                metrics_log.write(metrics.to_event(success))
+
+            if success:
+                tracker.mark_success(country)
+            else:
+                tracker.mark_failed(country)
+
+    finally:
+        if driver:
+            driver.quit()
+
+
+def restart_driver(driver, worker_id, metrics_log, reason):
+    """
+    Quit driver (if any) and start a new one, trying DRIVER_START_ATTEMPTS
+    times. Returns None if the browser will not start, so the worker can
+    mark its country failed and try again with the next one.
+    """
+    if driver:
+        try:
+            driver.quit()
+        except Exception:
+            pass  # Already gone with its session
+
+    for attempt in range(1, DRIVER_START_ATTEMPTS + 1):
+        print(f"[worker {worker_id}] Initializing new driver")
+        try:
+            return init_driver(metrics_log, worker_id, reason)
+        except Exception as e:
+            print(f"[worker {worker_id}] Driver failed to start "
+                  f"(attempt {attempt}/{DRIVER_START_ATTEMPTS}): {str(e)}")
+    return None
+
+
+def scrape_countries(countries, tracker, workers=1, metrics_log=None, **download_options):
+    """
+    Scrape countries with a pool of workers, each driving its own browser.
+
+    Keyword arguments (output_dir, store, sink, recorder, url_template) are
+    passed through to download_country_data.
+    """
+    country_queue = queue.Queue()
+    for index, country in enumerate(IEA_COUNTRIES, 1):
+        if country in countries:
+            country_queue.put((index, country))
+
+    workers = max(1, min(workers, country_queue.qsize()))
+    threads = [
+        threading.Thread(
+            target=scrape_worker,
+            args=(worker_id, country_queue, tracker, download_options, metrics_log),
+            name=f"scrape-worker-{worker_id}",
+        )
+        for worker_id in range(1, workers + 1)
+    ]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape IEA electricity data for all countries.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of concurrent headless browsers (default: 1)")
+    parser.add_argument('--refresh', action='store_true',
+                        help="re-scrape every country, ignoring progress.txt; only "
+                             "countries whose payloads changed are rewritten")
+    parser.add_argument('--metrics', type=Path, default=Path('data/iea_scraped/scrape_metrics.jsonl'),
+                        help="JSONL file receiving per-country phase timings "
+                             "(summarize with scrape_metrics.py)")
+    parser.add_argument('--record-fixtures', type=Path, metavar='DIR',
+                        help="save each country's raw (download, data URL) pairs and a stand-in "
+                             "page to DIR for offline replay (see replay_benchmark.py)")
+    parser.add_argument('--url-template', default=COUNTRY_URL_TEMPLATE,
+                        help="country page URL with a {country} placeholder, e.g. "
+                             "file:///path/to/data/fixtures/iea_pages/{country}.html")
+    return parser.parse_args()
+
+
 def main():
     """Main function to scrape all countries."""
+    args = parse_args()
+
     # Create output directory
     output_dir = Path('data/iea_scraped')
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -232,69 +503,38 @@ def main():
     log_file = output_dir / 'scraping_log.txt'
     progress_file = output_dir / 'progress.txt'
 
-    driver = None
-    successful = []
-    failed = []
     start_time = datetime.now()
 
-    # Check for existing progress
-    start_idx = 0
-    if progress_file.exists():
-        with open(progress_file, 'r') as f:
-            completed = [line.strip() for line in f.readlines()]
-            start_idx = len(completed)
-            successful = completed
-            print(f"Resuming from country {start_idx + 1}/{len(IEA_COUNTRIES)}")
+    changed_file = output_dir / 'changed_countries.txt'
+    store = PayloadStore()
 
-    try:
-        for i in range(start_idx, len(IEA_COUNTRIES)):
-            country = IEA_COUNTRIES[i]
-
-            # Refresh driver every 5 countries to avoid session errors
-            if i % 5 == 0:
-                if driver:
-                    driver.quit()
-                print(f"\n{'='*70}")
-                print(f"Initializing new driver (country {i+1}/{len(IEA_COUNTRIES)})")
-                elapsed = (datetime.now() - start_time).total_seconds() / 60
-                print(f"Elapsed time: {elapsed:.1f} minutes")
-                print(f"{'='*70}")
-                driver = init_driver()
-
-            print(f"\n[{i+1}/{len(IEA_COUNTRIES)}] Processing {country}...")
-
-            try:
-                success = download_country_data(driver, country, output_dir)
-                if success:
-                    successful.append(country)
-                    # Save progress
-                    with open(progress_file, 'a') as f:
-                        f.write(f"{country}\n")
-                else:
-                    failed.append(country)
-            except InvalidSessionIdException:
-                # Refresh driver and retry
-                print(f"  Refreshing driver and retrying {country}...")
-                driver.quit()
-                driver = init_driver()
-                try:
-                    success = download_country_data(driver, country, output_dir)
-                    if success:
-                        successful.append(country)
-                        with open(progress_file, 'a') as f:
-                            f.write(f"{country}\n")
-                    else:
-                        failed.append(country)
-                except Exception as e:
-                    print(f"  Retry failed for {country}: {str(e)}")
-                    failed.append(country)
-            except Exception as e:
-                print(f"  Unexpected error for {country}: {str(e)}")
-                failed.append(country)
-
-    finally:
-        if driver:
-            driver.quit()
+    # Check for existing progress
+    if args.refresh and progress_file.exists():
+        progress_file.unlink()
+    tracker = ProgressTracker(progress_file)
+    remaining = [country for country in IEA_COUNTRIES if country not in tracker.completed]
+    if tracker.completed:
+        print(f"Resuming with {len(remaining)}/{len(IEA_COUNTRIES)} countries left")
+
+    print(f"Scraping {len(remaining)} countries with {args.workers} worker(s)")
+    scrape_countries(set(remaining), tracker, workers=args.workers,
+                     metrics_log=MetricsLog(args.metrics), output_dir=output_dir, store=store,
+                     recorder=FixtureRecorder(args.record_fixtures) if args.record_fixtures else None,
+                     url_template=args.url_template)
+
+    # Countries the loaders need to pick up (see load_to_database.py --countries-file).
+    # Earlier runs' countries are kept until the loader has loaded them and
+    # removed them from the file
+    changed_countries = sorted(store.changed_countries)
+    pending_countries = set(changed_countries)
+    if changed_file.exists():
+        with open(changed_file, 'r') as f:
+            pending_countries.update(line.strip() for line in f if line.strip())
+    with open(changed_file, 'w') as f:
+        f.writelines(f"{country}\n" for country in sorted(pending_countries))
+
+    successful = tracker.successful
+    failed = tracker.failed
 
     # Write final log
     end_time = datetime.now()
@@ -302,9 +542,11 @@ def main():
 
     with open(log_file, 'w') as f:
         f.write(f"Scraping completed at {end_time}\n")
-        f.write(f"Duration: {duration:.1f} minutes\n\n")
+        f.write(f"Duration: {duration:.1f} minutes\n")
+        f.write(f"Workers: {args.workers}\n\n")
         f.write(f"Successful: {len(successful)}/{len(IEA_COUNTRIES)}\n")
-        f.write(f"Failed: {len(failed)}/{len(IEA_COUNTRIES)}\n\n")
+        f.write(f"Failed: {len(failed)}/{len(IEA_COUNTRIES)}\n")
+        f.write(f"Changed: {len(changed_countries)}/{len(IEA_COUNTRIES)}\n\n")
 
         f.write(f"Successful countries:\n")
         for country in successful:
@@ -323,7 +565,9 @@ def main():
     print(f"Duration: {duration:.1f} minutes")
     print(f"Successful: {len(successful)}/{len(IEA_COUNTRIES)}")
     print(f"Failed: {len(failed)}/{len(IEA_COUNTRIES)}")
+    print(f"Changed: {len(changed_countries)} ({len(pending_countries)} to load, listed in {changed_file})")
     print(f"Log saved to: {log_file}")
+    print(f"Metrics saved to: {args.metrics} (summarize with data/scrape_metrics.py)")
     print(f"{'='*70}")
 
 
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Per-phase scrape instrumentation.
+
+The scraper writes one JSON object per line to scrape_metrics.jsonl:
+- {"event": "country", "country", "worker", "success", "total", "phases": {...}, "counters": {...}}
+- {"event": "driver_init", "worker", "reason", "seconds"}
+
+Running this module prints a summary of a metrics file: per-phase
+percentiles, driver start-up cost and the slowest countries.
+
+Usage: python data/scrape_metrics.py [data/iea_scraped/scrape_metrics.jsonl]
+"""
+
+import json
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+
+class MetricsLog:
+    """Thread-safe JSONL writer shared by all scraping workers."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+
+    def write(self, event):
+        event = {'time': datetime.now().isoformat(timespec='seconds'), **event}
+        line = json.dumps(event) + '\n'
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+class CountryMetrics:
+    """Phase timings (seconds) and byte/item counters for one country."""
+
+    def __init__(self, country, worker=None):
+        self.country = country
+        self.worker = worker
+        self.start = time.perf_counter()
+        self.phases = defaultdict(float)
+        self.counters = defaultdict(int)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += time.perf_counter() - start
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def to_event(self, success):
+        return {
+            'event': 'country',
+            'country': self.country,
+            'worker': self.worker,
+            'success': success,
+            'total': round(time.perf_counter() - self.start, 4),
+            'phases': {name: round(seconds, 4) for name, seconds in self.phases.items()},
+            'counters': dict(self.counters)
+        }
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def load_events(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(events, slowest=10):
+    """Print phase percentiles, driver start-up cost and the slowest countries."""
+    countries = [e for e in events if e['event'] == 'country']
+    drivers = [e for e in events if e['event'] == 'driver_init']
+
+    phase_values = defaultdict(list)
+    counter_totals = defaultdict(int)
+    for event in countries:
+        phase_values['total'].append(event['total'])
+        for name, seconds in event['phases'].items():
+            phase_values[name].append(seconds)
+        for name, amount in event['counters'].items():
+            counter_totals[name] += amount
+
+    print(f"{'='*70}")
+    print("SCRAPE METRICS")
+    print(f"{'='*70}")
+    succeeded = sum(1 for e in countries if e['success'])
+    print(f"Countries: {len(countries)} ({succeeded} succeeded)")
+
+    print(f"\n{'phase':20s} {'count':>6s} {'p50':>8s} {'p90':>8s} {'p99':>8s} {'max':>8s} {'sum':>9s}")
+    for name, values in sorted(phase_values.items(), key=lambda item: -sum(item[1])):
+        values.sort()
+        print(f"{name:20s} {len(values):6d} "
+              f"{percentile(values, 50):8.2f} {percentile(values, 90):8.2f} "
+              f"{percentile(values, 99):8.2f} {values[-1]:8.2f} {sum(values):9.1f}")
+
+    if drivers:
+        init_times = sorted(e['seconds'] for e in drivers)
+        reasons = defaultdict(int)
+        for event in drivers:
+            reasons[event['reason']] += 1
+        print(f"\nDriver starts: {len(drivers)} "
+              f"({', '.join(f'{n} {reason}' for reason, n in sorted(reasons.items()))}), "
+              f"p50 {percentile(init_times, 50):.2f}s, total {sum(init_times):.1f}s")
+
+    if counter_totals:
+        print("\nCounters:")
+        for name, amount in sorted(counter_totals.items()):
+            print(f"  {name:25s} {amount:15,d}")
+
+    print(f"\nSlowest {slowest} countries:")
+    for event in sorted(countries, key=lambda e: -e['total'])[:slowest]:
+        top_phase = max(event['phases'].items(), key=lambda item: item[1], default=('-', 0))
+        status = '✓' if event['success'] else '✗'
+        print(f"  {status} {event['country']:30s} {event['total']:7.2f}s "
+              f"(longest: {top_phase[0]} {top_phase[1]:.2f}s)")
+    print(f"{'='*70}")
+
+
+def main():
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path('data/iea_scraped/scrape_metrics.jsonl')
+    summarize(load_events(path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Streaming scrape -> parse -> load pipeline.
+
+Browser workers push each country's extracted payloads onto a bounded queue
+and move straight on to the next country, while a single loader thread parses
+the payloads in memory and inserts them into SQLite. The CSV files under
+data/iea_scraped are only written with --archive.
+
+Combined with the payload store, countries whose data did not change since
+the last run never reach the loader. Payload hashes are only recorded once
+the loader has committed the country, so a failed or interrupted load is
+retried by the next run; --full sends every country to the loader.
+"""
+
+import argparse
+import queue
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from country_groups import refresh_group_rollups
+from load_to_database import create_database, load_country_payloads
+from payload_store import PayloadStore
+from scrape_iea_final import IEA_COUNTRIES, ProgressTracker, scrape_countries
+from scrape_metrics import MetricsLog
+
+
+def run_loader(payload_queue, db_path, stats, store):
+    """
+    Load (country, files) batches from the queue into SQLite until a None
+    sentinel arrives, recording each loaded country's payloads in the store.
+
+    A country that fails to load is rolled back and counted as failed. The
+    queue keeps being drained until the sentinel whatever happens (even if
+    the database cannot be opened), so the browser workers never block on it.
+    """
+    try:
+        conn = create_database(db_path)
+    except Exception as e:
+        print(f"  [loader] ✗ Cannot open {db_path}: {e}; scraped countries will not be loaded")
+        conn = None
+
+    try:
+        while True:
+            item = payload_queue.get()
+            if item is None:
+                break
+
+            country, files = item
+            if conn is None:
+                stats['failed'].append(country)
+                continue
+
+            try:
+                contents = {file_type: info['content'] for file_type, info in files.items()}
+                counts = load_country_payloads(conn, country, contents)
+            except Exception as e:
+                conn.rollback()
+                print(f"  [loader] ✗ Error loading {country}: {e}")
+                stats['failed'].append(country)
+                continue
+
+            loaded = sum(counts.values())
+            stats['countries'] += 1
+            stats['rows'] += loaded
+            print(f"  [loader] ✓ {country}: {loaded} rows ({', '.join(sorted(counts))})")
+
+            # Only once it is committed does the country count as unchanged; if the hashes
+            # cannot be recorded, the committed load stands and the next run reloads it
+            try:
+                store.record_country(country, files)
+            except Exception as e:
+                print(f"  [loader] ✗ {country} loaded, but its payload hashes were not recorded: {e}")
+
+        if stats['countries']:
+            refresh_group_rollups(conn)
+            conn.commit()
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape IEA data and load it into SQLite in one pass.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of concurrent headless browsers (default: 1)")
+    parser.add_argument('--queue-size', type=int, default=8,
+                        help="countries allowed to wait for the loader before browsers block (default: 8)")
+    parser.add_argument('--full', action='store_true',
+                        help="load every scraped country, even those whose payloads are unchanged")
+    parser.add_argument('--archive', action='store_true',
+                        help="also write CSVs to data/iea_scraped/<country>/")
+    parser.add_argument('--db', type=Path, default=Path('data/iea_electricity.db'),
+                        help="database to load into (default: data/iea_electricity.db)")
+    parser.add_argument('--metrics', type=Path, default=Path('data/iea_scraped/scrape_metrics.jsonl'),
+                        help="JSONL file receiving per-country phase timings")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    output_dir = Path('data/iea_scraped')
+    if args.archive:
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    start_time = datetime.now()
+    store = PayloadStore()
+    tracker = ProgressTracker(None)
+    stats = {'countries': 0, 'rows': 0, 'failed': []}
+
+    # Bounded so browsers cannot run arbitrarily far ahead of the loader
+    payload_queue = queue.Queue(maxsize=args.queue_size)
+    loader = threading.Thread(target=run_loader, args=(payload_queue, args.db, stats, store),
+                              name="pipeline-loader")
+    loader.start()
+
+    try:
+        # Without a store to compare against, every country reaches the loader
+        scrape_countries(set(IEA_COUNTRIES), tracker, workers=args.workers,
+                         metrics_log=MetricsLog(args.metrics),
+                         output_dir=output_dir if args.archive else None, store=None if args.full else store,
+                         sink=lambda country, files: payload_queue.put((country, files)))
+    finally:
+        payload_queue.put(None)
+        loader.join()
+
+    duration = (datetime.now() - start_time).total_seconds() / 60
+
+    print(f"\n{'='*70}")
+    print("Pipeline completed!")
+    print(f"{'='*70}")
+    print(f"Duration: {duration:.1f} minutes")
+    print(f"Scraped: {len(tracker.successful)}/{len(IEA_COUNTRIES)} "
+          f"(failed: {len(tracker.failed)})")
+    print(f"Loaded: {stats['countries']} changed countries, {stats['rows']:,} rows")
+    if stats['failed']:
+        print(f"Load errors: {', '.join(stats['failed'])}")
+    print(f"Database: {args.db}")
+    print(f"{'='*70}")
+
+
+if __name__ == '__main__':
+    main()
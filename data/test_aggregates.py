@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for aggregates.py: country-year totals, generation shares, latest
+years and the country_versions hashes the incremental export relies on.
+
+Run with pytest, or directly:
+    python data/test_aggregates.py
+"""
+
+import sys
+
+from load_to_database import create_database, load_country_payloads
+
+GENERATION = """"Electricity generation by source"
+Coal,60,2020,GWh
+Wind,40,2020,GWh
+Coal,50,2021,GWh
+Wind,50,2021,GWh
+Natural gas,30,2021,MtCO2
+"""
+
+TRADE = """"Imports and exports"
+Imports,25,2020,GWh
+Exports,-10,2020,GWh
+"""
+
+CONSUMPTION = """"Final consumption by sector"
+Industry,70,2020,GWh
+Residential,20,2020,GWh
+"""
+
+
+def load(conn, country_code='albania', **files):
+    return load_country_payloads(conn, country_code, files)
+
+
+def versions(conn, country_code='albania'):
+    return dict(conn.execute("""
+        SELECT v.dataset, v.version FROM country_versions v
+        JOIN countries c ON c.id = v.country_id WHERE c.country_code = ?
+    """, (country_code,)))
+
+
+def test_totals_shares_and_latest():
+    conn = create_database(':memory:')
+    load(conn, generation=GENERATION, imports_exports=TRADE, final_consumption=CONSUMPTION)
+
+    totals = {row[0]: row[1:] for row in conn.execute("""
+        SELECT year, generation_gwh, emissions_mtco2, consumption, imports, exports, net_imports
+        FROM country_year_totals ORDER BY year
+    """)}
+    # MtCO2 rows are emissions, never part of the GWh total; exports count as positive
+    assert totals[2020] == (100.0, None, 90.0, 25.0, 10.0, 15.0)
+    assert totals[2021] == (100.0, 30.0, None, None, None, None)
+
+    shares = dict(conn.execute("""
+        SELECT s.name, g.share FROM generation_shares g JOIN series s ON s.id = g.series_id
+        WHERE g.year = 2020
+    """))
+    assert shares == {'Coal': 60.0, 'Wind': 40.0}
+
+    latest = conn.execute("""
+        SELECT generation_year, generation_gwh, consumption_year, trade_year FROM country_latest
+    """).fetchone()
+    assert latest == (2021, 100.0, 2020, 2020)
+
+
+def test_versions_only_change_with_the_data():
+    conn = create_database(':memory:')
+    load(conn, generation=GENERATION, imports_exports=TRADE)
+    assert versions(conn) == {'generation': 1, 'imports_exports': 1}
+
+    # Reloading identical rows keeps the versions, so the export skips the country
+    load(conn, generation=GENERATION, imports_exports=TRADE)
+    assert versions(conn) == {'generation': 1, 'imports_exports': 1}
+
+    load(conn, generation=GENERATION.replace('Wind,50,2021', 'Wind,55,2021'))
+    assert versions(conn) == {'generation': 2, 'imports_exports': 1}
+
+    # Other countries are unaffected
+    load(conn, 'brazil', generation=GENERATION)
+    assert versions(conn, 'brazil') == {'generation': 1}
+    assert versions(conn) == {'generation': 2, 'imports_exports': 1}
+
+
+if __name__ == '__main__':
+    tests = [test_totals_shares_and_latest, test_versions_only_change_with_the_data]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    sys.exit(0)
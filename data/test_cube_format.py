@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for the .cube format (cube_format.py): delta encoding,
+write/read, NaN handling and in-place patching of country columns.
+
+Run with pytest, or directly:
+    python data/test_cube_format.py
+"""
+
+import math
+import sys
+import tempfile
+from array import array
+from pathlib import Path
+
+from cube_format import build_cube, delta_decode, delta_encode, patch_cube, read_cube, write_cube
+
+# A delta is rounded to float32 once, so a decoded value is off by at most
+# about one float32 step of the larger of itself and the previous year's value
+FLOAT32_EPSILON = 2 ** -23
+
+COUNTRIES = ['albania', 'brazil', 'chile']
+YEARS = [2000, 2001, 2002, 2003]
+SERIES = ['Coal', 'Solar PV', 'Wind']
+
+
+def sample_rows(brazil_wind=5.5):
+    """Rows with gaps: missing years, a NULL value and a series appearing late."""
+    rows = []
+    for c, country_code in enumerate(COUNTRIES):
+        for y, year in enumerate(YEARS):
+            rows.append((country_code, year, 'Coal', 100.0 * (c + 1) - y * 3.25))
+            if year >= 2002:
+                rows.append((country_code, year, 'Solar PV', 0.1 * (c + y)))
+    rows.append(('brazil', 2001, 'Wind', brazil_wind))
+    rows.append(('brazil', 2002, 'Wind', None))
+    rows.append(('chile', 2003, 'Wind', 1e-7))
+    return rows
+
+
+def same_values(decoded, values, frame_size):
+    """True if NaNs match exactly and every value is within one delta rounding of the original."""
+    if len(decoded) != len(values):
+        return False
+    for i, (x, y) in enumerate(zip(decoded, values)):
+        if math.isnan(x) or math.isnan(y):
+            if not (math.isnan(x) and math.isnan(y)):
+                return False
+            continue
+        previous = values[i - frame_size] if i >= frame_size and not math.isnan(values[i - frame_size]) else 0.0
+        if abs(x - y) > 2 * FLOAT32_EPSILON * max(abs(y), abs(previous)):
+            return False
+    return True
+
+
+def test_delta_round_trip():
+    values = array('f', [1.5, math.nan, 3.0, math.nan, 2.25, 7.0, -4.0, math.nan, 0.1, 1e6, math.nan, 2.0])
+    encoded = delta_encode(values, 3)
+    assert encoded[:3].tobytes() == values[:3].tobytes()
+    assert same_values(delta_decode(encoded, 3), values, 3)
+    # Missing stays missing, and a value after a gap is stored whole
+    assert math.isnan(encoded[7]) and encoded[4] == values[4]
+
+
+def test_write_read_round_trip():
+    cube = build_cube(sample_rows(), 'generation', 'GWh', COUNTRIES, YEARS, SERIES)
+    with tempfile.TemporaryDirectory() as tmp:
+        for delta in (True, False):
+            path = Path(tmp) / f"delta_{delta}.cube"
+            write_cube(path, cube, delta=delta)
+            result = read_cube(path)
+            assert (result.dataset, result.units) == ('generation', 'GWh')
+            assert (result.years, result.countries, result.series) == (YEARS, COUNTRIES, SERIES)
+            assert same_values(result.values, cube.values, len(COUNTRIES) * len(SERIES))
+
+
+def test_patched_column_matches_rebuild():
+    old_rows, new_rows = sample_rows(brazil_wind=5.5), sample_rows(brazil_wind=8.0)
+    # Brazil also loses its 2000 coal value and gains a 2000 wind value
+    new_rows = [row for row in new_rows if row[:3] != ('brazil', 2000, 'Coal')]
+    new_rows.append(('brazil', 2000, 'Wind', 2.0))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        patched, rebuilt = Path(tmp) / 'patched.cube', Path(tmp) / 'rebuilt.cube'
+        write_cube(patched, build_cube(old_rows, 'generation', 'GWh', COUNTRIES, YEARS, SERIES))
+        write_cube(rebuilt, build_cube(new_rows, 'generation', 'GWh', COUNTRIES, YEARS, SERIES))
+
+        brazil_rows = [row for row in new_rows if row[0] == 'brazil']
+        assert patch_cube(patched, brazil_rows, ['brazil'])
+        assert patched.read_bytes() == rebuilt.read_bytes()
+
+
+def test_patch_needs_existing_slots():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'cube.cube'
+        write_cube(path, build_cube(sample_rows(), 'generation', 'GWh', COUNTRIES, YEARS, SERIES))
+        before = path.read_bytes()
+
+        assert not patch_cube(path, [('brazil', 2004, 'Coal', 1.0)], ['brazil'])
+        assert not patch_cube(path, [('brazil', 2001, 'Nuclear', 1.0)], ['brazil'])
+        assert not patch_cube(path, [], ['denmark'])
+        assert path.read_bytes() == before
+
+
+if __name__ == '__main__':
+    tests = [test_delta_round_trip, test_write_read_round_trip, test_patched_column_matches_rebuild,
+             test_patch_needs_existing_slots]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    sys.exit(0)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for the incremental export in export_data_to_json.py: only changed
+countries are rewritten, patched output matches a full export, and a full
+export removes files that are no longer produced.
+
+Each test loads a small database in a temporary directory and exports it
+from there. Run with pytest, or directly:
+    python data/test_export_data_to_json.py
+"""
+
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from artifacts import MANIFEST_NAME
+from cube_format import cube_value, read_cube
+from export_data_to_json import export_to_json
+from load_to_database import create_database, load_country_payloads
+
+
+def generation_csv(coal, wind):
+    return f'"Electricity generation by source"\nCoal,{coal},2020,GWh\nWind,{wind},2020,GWh\nCoal,{coal},2021,GWh\n'
+
+
+def load(root, country_code, csv):
+    """Load a country's generation payload into root/data/iea_electricity.db."""
+    conn = create_database(root / 'data' / 'iea_electricity.db')
+    try:
+        load_country_payloads(conn, country_code, {'generation': csv})
+    finally:
+        conn.close()
+
+
+def export(root, full=False):
+    """Run export_to_json in root; returns the output directory."""
+    cwd = os.getcwd()
+    try:
+        os.chdir(root)
+        export_to_json(full=full)
+    finally:
+        os.chdir(cwd)
+    return root / 'visualization' / 'data'
+
+
+def make_root(tmp):
+    root = Path(tmp)
+    (root / 'data').mkdir()
+    load(root, 'albania', generation_csv(60, 40))
+    load(root, 'brazil', generation_csv(500, 100))
+    return root
+
+
+def test_only_changed_countries_are_rewritten(capsys):
+    with tempfile.TemporaryDirectory() as tmp:
+        root = make_root(tmp)
+        output_dir = export(root)
+        brazil_shard = output_dir / 'shards' / 'brazil.json'
+        brazil_mtime = brazil_shard.stat().st_mtime_ns
+        capsys.readouterr()
+
+        export(root)
+        assert 'Export is up to date' in capsys.readouterr().out
+
+        load(root, 'albania', generation_csv(70, 40))
+        export(root)
+        assert '(1 changed countries: albania)' in capsys.readouterr().out
+        assert brazil_shard.stat().st_mtime_ns == brazil_mtime
+
+        shard = json.loads((output_dir / 'shards' / 'albania.json').read_text())
+        assert shard['generation']['2020'] == {'Coal': 70.0, 'Wind': 40.0}
+        cube = read_cube(output_dir / 'heatmap.cube')
+        assert cube_value(cube, 'albania', 2020, 'generation:total:absolute') == 110.0
+
+        # The patched heatmap and the incremental manifest match a full export
+        patched = (output_dir / 'heatmap.cube').read_bytes()
+        manifest = json.loads((output_dir / MANIFEST_NAME).read_text())
+        export(root, full=True)
+        assert (output_dir / 'heatmap.cube').read_bytes() == patched
+        assert json.loads((output_dir / MANIFEST_NAME).read_text()) == manifest
+        for entry in manifest['files'].values():
+            assert (output_dir / entry['path']).exists()
+
+
+def test_full_export_removes_files_no_longer_produced():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = make_root(tmp)
+        output_dir = export(root)
+        stale = [output_dir / 'generation.json', output_dir / 'shards' / 'atlantis.json']
+        for path in stale:
+            path.write_text('{}')
+
+        # An incremental export only touches what it rewrites
+        load(root, 'albania', generation_csv(70, 40))
+        export(root)
+        assert all(path.exists() for path in stale)
+
+        export(root, full=True)
+        assert not any(path.exists() for path in stale)
+        files = json.loads((output_dir / MANIFEST_NAME).read_text())['files']
+        assert 'generation.json' not in files and 'shards/atlantis.json' not in files
+
+
+if __name__ == '__main__':
+    import pytest
+    sys.exit(pytest.main([__file__, '-q']))
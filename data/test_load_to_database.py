@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Tests for load_to_database.py and update_database_with_consumption.py:
+per-country rollback, incremental loads and group rollups.
+
+Each test builds a data/iea_scraped tree in a temporary directory and runs
+the loaders' main() from there. Run with pytest, or directly:
+    python data/test_load_to_database.py
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+import export_data_to_json
+import load_to_database
+import update_database_with_consumption
+
+GENERATION = [('Coal', 2020, 100.0), ('Coal', 2021, 90.0), ('Wind', 2021, 12.5)]
+
+
+def write_csv(root, country_code, file_type, rows, encoding='utf-8', path=None, units='GWh'):
+    """Write a scraped CSV (title row, then series, value, year, units rows)."""
+    path = root / (path or load_to_database.dataset_path(country_code, file_type))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = ['"Title"'] + [f'"{series}",{value},{year},{units}' for series, year, value in rows]
+    path.write_bytes(('\n'.join(lines) + '\n').encode(encoding))
+    # A new mtime, so rewrites within the same clock tick are not mistaken for unchanged files
+    mtime = path.stat().st_mtime + write_csv.writes
+    write_csv.writes += 1
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+write_csv.writes = 0
+
+
+def run_loader(root, *args, module=load_to_database):
+    """Run a loader's main() in root with the given command-line arguments."""
+    cwd, argv = os.getcwd(), sys.argv
+    try:
+        os.chdir(root)
+        sys.argv = [f"{module.__name__}.py", *args]
+        module.main()
+    finally:
+        os.chdir(cwd)
+        sys.argv = argv
+
+
+def loaded_rows(root, table='generation_data', column='source'):
+    conn = sqlite3.connect(root / 'data' / 'iea_electricity.db')
+    try:
+        return {(country, series, year): value for country, series, year, value in conn.execute(
+            f"SELECT country_code, {column}, year, value FROM {table}")}
+    finally:
+        conn.close()
+
+
+def test_unreadable_country_is_rolled_back(capsys):
+    # Serial (parsed while inserting), bulk, and parsed in worker processes
+    for args in ([], ['--bulk'], ['--workers', '2']):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            write_csv(root, 'albania', 'generation', GENERATION)
+            # Not UTF-8: fails while the records are streamed into the insert
+            write_csv(root, 'france', 'generation', [('Nucléaire', 2021, 360000.0)] * 1000, encoding='latin-1')
+            write_csv(root, 'germany', 'generation', GENERATION)
+
+            run_loader(root, *args)
+
+            rows = loaded_rows(root)
+            assert not any(country == 'france' for country, _, _ in rows)
+            assert rows[('germany', 'Wind', 2021)] == 12.5
+            assert rows[('albania', 'Coal', 2020)] == 100.0
+            assert 'Failed (rolled back): france' in capsys.readouterr().out
+
+
+def test_countries_file_keeps_only_pending_countries():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        write_csv(root, 'albania', 'generation', GENERATION)
+        write_csv(root, 'france', 'generation', [('Nucléaire', 2021, 360000.0)], encoding='latin-1')
+        write_csv(root, 'germany', 'generation', GENERATION)
+        countries_file = root / 'changed_countries.txt'
+        countries_file.write_text('albania\natlantis\nfrance\n')
+
+        run_loader(root, '--countries-file', str(countries_file))
+
+        # Loaded countries leave the list; failed and unknown ones wait for the next load
+        assert set(country for country, _, _ in loaded_rows(root)) == {'albania'}
+        assert countries_file.read_text() == 'atlantis\nfrance\n'
+
+
+def test_changed_file_prunes_rows_it_no_longer_has(capsys):
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        write_csv(root, 'albania', 'generation', GENERATION)
+        run_loader(root)
+        assert len(loaded_rows(root)) == 3
+
+        # Unchanged files are skipped
+        run_loader(root)
+        assert 'Found 0 countries with new or changed files (1 unchanged' in capsys.readouterr().out
+
+        write_csv(root, 'albania', 'generation', [('Coal', 2020, 101.0), ('Coal', 2021, 90.0)])
+        run_loader(root)
+        assert loaded_rows(root) == {('albania', 'Coal', 2020): 101.0, ('albania', 'Coal', 2021): 90.0}
+
+
+def test_consumption_loaders_keep_each_others_rows():
+    consumption_file = 'data/final_consumption_scraped/albania_final_consumption.csv'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        write_csv(root, 'albania', 'final_consumption', [('Industry', 2020, 10.0)])
+        write_csv(root, 'albania', 'final_consumption', [('Transport', 2020, 4.0)], path=consumption_file)
+        run_loader(root)
+        run_loader(root, module=update_database_with_consumption)
+
+        def consumption():
+            return loaded_rows(root, 'final_consumption_data', 'sector')
+
+        assert set(consumption()) == {('albania', 'Industry', 2020), ('albania', 'Transport', 2020)}
+
+        # A new version of either file only drops rows its previous version had
+        write_csv(root, 'albania', 'final_consumption', [('Industry', 2021, 11.0)])
+        run_loader(root)
+        assert set(consumption()) == {('albania', 'Industry', 2021), ('albania', 'Transport', 2020)}
+
+        write_csv(root, 'albania', 'final_consumption', [('Residential', 2020, 3.0)], path=consumption_file)
+        run_loader(root, module=update_database_with_consumption)
+        assert set(consumption()) == {('albania', 'Industry', 2021), ('albania', 'Residential', 2020)}
+
+        # A row both files provide stays until neither has it
+        write_csv(root, 'albania', 'final_consumption', [('Industry', 2021, 11.0), ('Residential', 2020, 3.0)])
+        run_loader(root)
+        write_csv(root, 'albania', 'final_consumption', [('Transport', 2021, 5.0)], path=consumption_file)
+        run_loader(root, module=update_database_with_consumption)
+        assert ('albania', 'Residential', 2020) in consumption()
+
+
+def test_group_rollups_keep_rows_without_units():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        write_csv(root, 'france', 'imports_exports', [('Imports', 2021, 10.0)], units='')
+        write_csv(root, 'germany', 'imports_exports', [('Imports', 2021, 20.0)], units='')
+        run_loader(root)
+
+        conn = sqlite3.connect(root / 'data' / 'iea_electricity.db')
+        try:
+            shard = export_data_to_json.group_shard(conn, 'european-union')
+        finally:
+            conn.close()
+        assert shard['trade'] == {2021: {'Imports': 30.0}}
+
+
+if __name__ == '__main__':
+    import pytest
+    sys.exit(pytest.main([__file__, '-q']))
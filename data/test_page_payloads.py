@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for page_payloads.py: data URL decoding, the rule-table classify_file
+(checked against the original implementation kept in replay_benchmark.py)
+and select_country_files.
+
+Run with pytest, or directly:
+    python data/test_page_payloads.py
+"""
+
+import sys
+import urllib.parse
+
+from page_payloads import (CLASSIFIER_CONTENT_HEAD, classify_file, extract_csv_from_data_url,
+                           select_country_files)
+from replay_benchmark import legacy_classify_file
+
+TIME_SERIES = '"Electricity generation by source, Canada, 2000-2023"\n' + 'Coal,1000,2000,GWh\n' * 60
+TRADE_TABLE = 'Electricity, imports and exports\nImports,100,2000,GWh\nExports,-80,2000,GWh\n' + 'x' * 600
+
+# (download filename, content) pairs both classifiers must agree on
+CASES = [
+    ('Electricity generation by source in Canada.csv', TIME_SERIES),
+    ('CO2 emissions from power generation by source.csv', TIME_SERIES),
+    ('Electricity final consumption by sector in Canada.csv', TIME_SERIES),
+    ('Electricity imports and exports.csv', TRADE_TABLE),
+    ('Net imports', 'Electricity, net\nImports,1,2000,GWh\n'),
+    ('Total electricity production.csv', 'Year,Value\n' + '2000,1\n' * 100),
+    ('Total electricity production.csv', 'Year,Value\n2000,1\n'),
+    # Skipped: regional comparisons, per capita, small single-year snapshots
+    ('Electricity generation by source, North America.csv', TIME_SERIES),
+    ('Regional electricity generation by source.csv', TIME_SERIES),
+    ('Electricity consumption per capita.csv', TIME_SERIES),
+    ('Electricity generation by source, 2023.csv', 'Coal,1,2023,GWh\n'),
+    # ...unless large enough to be the full series
+    ('Electricity generation by source, 2000-2023.csv', TIME_SERIES),
+    ('Share of renewables.csv', 'Renewables,10,2000,%\n'),
+    ('Share of renewables', ''),
+]
+
+
+def test_classify_file_matches_legacy():
+    for filename, content in CASES:
+        assert classify_file(filename, content) == legacy_classify_file(filename, content), filename
+
+
+def test_classify_file_types():
+    assert classify_file(*CASES[0]) == ('generation', 'generation.csv')
+    assert classify_file(*CASES[3]) == ('imports_exports', 'imports_exports.csv')
+    assert classify_file(*CASES[7]) == (None, None)
+    assert classify_file(*CASES[10]) == (None, None)
+
+
+def test_classifier_only_reads_the_content_head():
+    # Intended divergence: an import/export mention past the head no longer counts
+    filler = 'Other,1,2000,GWh\n' * (CLASSIFIER_CONTENT_HEAD // 16)
+    late_mention = 'Electricity, net flows\n' + filler + 'Imports,1,2000,GWh\n'
+    assert 'import' not in late_mention[:CLASSIFIER_CONTENT_HEAD].lower()
+    assert legacy_classify_file('Net flows.csv', late_mention) == ('imports_exports', 'imports_exports.csv')
+    assert classify_file('Net flows.csv', late_mention) == (None, None)
+
+    # Within the head both agree
+    early_mention = 'Electricity, imports\n' + filler
+    assert classify_file('Net flows.csv', early_mention) == legacy_classify_file('Net flows.csv', early_mention)
+
+
+def test_extract_csv_from_data_url():
+    csv = 'Coal,1.5,2000,GWh\nSolar PV,"2,0",2001,GWh\n'
+    assert extract_csv_from_data_url('data:text/csv;charset=utf-8,' + urllib.parse.quote(csv)) == csv
+    assert extract_csv_from_data_url('data:text/plain,abc') is None
+    assert extract_csv_from_data_url(None) is None
+
+
+def test_select_country_files_keeps_largest_version():
+    small = TIME_SERIES[:500]
+    files = select_country_files([
+        ('Electricity generation by source.csv', small),
+        ('Electricity generation by source (full).csv', TIME_SERIES),
+        ('Electricity imports and exports.csv', TRADE_TABLE),
+        ('Regional electricity generation by source.csv', TIME_SERIES + TIME_SERIES),
+        ('Electricity final consumption by sector.csv', None),
+        ('', TIME_SERIES),
+    ])
+    assert sorted(files) == ['generation', 'imports_exports']
+    assert files['generation'] == {'name': 'generation.csv', 'content': TIME_SERIES,
+                                   'original_name': 'Electricity generation by source (full).csv'}
+
+
+if __name__ == '__main__':
+    tests = [test_classify_file_matches_legacy, test_classify_file_types,
+             test_classifier_only_reads_the_content_head, test_extract_csv_from_data_url,
+             test_select_country_files_keeps_largest_version]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    sys.exit(0)
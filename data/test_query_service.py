@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Tests for query_service.py: routing, heatmap queries, errors, ETags, gzip
+and cache invalidation, calling QueryService.handle() directly.
+
+Run with pytest, or directly:
+    python data/test_query_service.py
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+from http import HTTPStatus
+from pathlib import Path
+
+import query_service
+from load_to_database import create_database, load_country_payloads
+from query_service import QueryService
+
+
+def generation_csv(coal, wind):
+    return f'"Electricity generation by source"\nCoal,{coal},2020,GWh\nWind,{wind},2020,GWh\nCoal,{coal},2021,GWh\n'
+
+
+def load(db_path, country_code, csv):
+    conn = create_database(db_path)
+    try:
+        load_country_payloads(conn, country_code, {'generation': csv})
+    finally:
+        conn.close()
+
+
+def make_database(tmp):
+    db_path = Path(tmp) / 'iea_electricity.db'
+    load(db_path, 'albania', generation_csv(60, 40))
+    load(db_path, 'brazil', generation_csv(500, 0))
+    return db_path
+
+
+def get(service, target, **headers):
+    """Return (status, headers, body) of a GET, with the body decoded from JSON."""
+    status, response_headers, body = asyncio.run(service.handle('GET', target, headers))
+    if response_headers.get('Content-Encoding') == 'gzip':
+        body = gzip.decompress(body)
+    return status, response_headers, json.loads(body) if body else None
+
+
+def with_service(test):
+    def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = make_database(tmp)
+            service = QueryService(db_path, pool_size=1)
+            try:
+                test(service, db_path)
+            finally:
+                service.close()
+    run.__name__ = test.__name__
+    return run
+
+
+@with_service
+def test_routes(service, db_path):
+    status, _, countries = get(service, '/api/countries')
+    assert status == HTTPStatus.OK and countries == {'albania': 'Albania', 'brazil': 'Brazil'}
+
+    status, _, shard = get(service, '/api/country/albania')
+    assert shard == {'generation': {'2020': {'Coal': 60.0, 'Wind': 40.0}, '2021': {'Coal': 60.0}}}
+
+    _, _, index = get(service, '/api/index')
+    assert index['albania'] == {'generation': {'series': ['Coal', 'Wind'], 'years': [2020, 2021]}}
+
+
+@with_service
+def test_heatmap(service, db_path):
+    _, _, data = get(service, '/api/heatmap?indicator=generation&year=2020')
+    assert data == [{'country': 'albania', 'value': 100.0}, {'country': 'brazil', 'value': 500.0}]
+
+    # Zero values are left out, like DataManager.getHeatmapData
+    _, _, data = get(service, '/api/heatmap?indicator=generation&year=2020&source=Wind&valueType=share')
+    assert data == [{'country': 'albania', 'value': 40.0}]
+
+    _, _, data = get(service, '/api/heatmap?indicator=generation&year=2021&valueType=indexed&baseYear=2020')
+    assert data == [{'country': 'albania', 'value': 60.0}, {'country': 'brazil', 'value': 100.0}]
+
+
+@with_service
+def test_errors(service, db_path):
+    assert get(service, '/api/country/atlantis')[0] == HTTPStatus.NOT_FOUND
+    assert get(service, '/api/nothing')[0] == HTTPStatus.NOT_FOUND
+    assert get(service, '/api/heatmap?indicator=generation')[0] == HTTPStatus.BAD_REQUEST
+    assert get(service, '/api/heatmap?indicator=emissions&year=2020')[0] == HTTPStatus.BAD_REQUEST
+    assert get(service, '/api/heatmap?year=x')[0] == HTTPStatus.BAD_REQUEST
+    assert asyncio.run(service.handle('POST', '/api/countries', {}))[0] == HTTPStatus.METHOD_NOT_ALLOWED
+
+    # Unexpected query errors are answered, and the service keeps working
+    def broken(conn):
+        raise sqlite3.OperationalError('disk I/O error')
+
+    original = query_service.query_countries
+    query_service.query_countries = broken
+    try:
+        status, _, body = get(service, '/api/countries')
+    finally:
+        query_service.query_countries = original
+    assert status == HTTPStatus.INTERNAL_SERVER_ERROR and body == {'error': 'Internal server error'}
+    assert get(service, '/api/countries')[0] == HTTPStatus.OK
+
+
+@with_service
+def test_etag_gzip_and_invalidation(service, db_path):
+    status, headers, body = get(service, '/api/country/brazil')
+    etag = headers['ETag']
+    assert get(service, '/api/country/brazil', **{'if-none-match': etag})[0] == HTTPStatus.NOT_MODIFIED
+
+    status, headers, gzipped = get(service, '/api/country/brazil', **{'accept-encoding': 'gzip, br'})
+    assert headers['Content-Encoding'] == 'gzip' and gzipped == body
+
+    # Writing the database drops the cached responses
+    load(db_path, 'brazil', generation_csv(550, 0))
+    stat = db_path.stat()
+    os.utime(db_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    status, headers, body = get(service, '/api/country/brazil', **{'if-none-match': etag})
+    assert status == HTTPStatus.OK and headers['ETag'] != etag
+    assert body['generation']['2020']['Coal'] == 550.0
+
+
+if __name__ == '__main__':
+    tests = [test_routes, test_heatmap, test_errors, test_etag_gzip_and_invalidation]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    sys.exit(0)
@@ -3,60 +3,35 @@
 Update database with final consumption data.
 """
 
-import sqlite3
-import csv
+import argparse
 from pathlib import Path
 from datetime import datetime
 
+from aggregates import refresh_country_aggregates
+from country_groups import refresh_group_rollups
+from csv_records import iter_csv_file
+from file_manifest import check_file, record_file
+from load_to_database import create_database, replace_dataset
 
-def parse_csv_file(filepath):
-    """Parse CSV and extract data."""
-    data = []
-    with open(filepath, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        rows = list(reader)
 
-        if len(rows) < 2:
-            return data
-
-        for row in rows[1:]:
-            if len(row) < 4:
-                continue
-
-            sector = row[0].strip(' "')
-            try:
-                value = float(row[1]) if row[1].strip() else None
-            except (ValueError, IndexError):
-                value = None
-
-            try:
-                year = int(row[2]) if row[2].strip() else None
-            except (ValueError, IndexError):
-                year = None
-
-            units = row[3].strip() if len(row) > 3 else ''
-
-            if not sector or year is None:
-                continue
-
-            data.append({
-                'sector': sector,
-                'year': year,
-                'value': value,
-                'units': units
-            })
-
-    return data
+def parse_args():
+    parser = argparse.ArgumentParser(description="Update the database with final consumption CSVs.")
+    parser.add_argument('--full', action='store_true',
+                        help="reload every file, even those unchanged since the last update")
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
+
     db_path = Path('data/iea_electricity.db')
     data_dir = Path('data/final_consumption_scraped')
 
     print("Updating database with final consumption data...")
     print("="*70)
 
-    conn = sqlite3.connect(db_path)
+    # Ensures the fact-table schema and manifest (migrating an older database)
+    conn = create_database(db_path)
     cursor = conn.cursor()
 
     # Get all consumption files
@@ -66,6 +41,7 @@ def main():
     stats = {
         'total_files': 0,
         'successful': 0,
+        'unchanged': 0,
         'total_records': 0
     }
 
@@ -76,31 +52,37 @@ def main():
 
         print(f"[{i}/{len(csv_files)}] {country_code}")
 
-        # Parse CSV
-        data = parse_csv_file(filepath)
-
-        if not data:
-            print(f"    ✗ No data")
+        # Skip files ingested before with the same content
+        fingerprint = check_file(conn, filepath, force=args.full)
+        if not fingerprint:
+            print(f"    = Unchanged")
+            stats['unchanged'] += 1
             continue
 
-        # Insert data
-        count = 0
-        for row in data:
-            try:
-                cursor.execute("""
-                    INSERT OR REPLACE INTO final_consumption_data (country_code, sector, year, value, units)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (country_code, row['sector'], row['year'], row['value'], row['units']))
-                count += 1
-            except sqlite3.Error as e:
-                print(f"    Error: {e}")
-
-        # Update country flag
-        cursor.execute("""
-            UPDATE countries
-            SET has_final_consumption_data = 1, last_updated = ?
-            WHERE country_code = ?
-        """, (datetime.now(), country_code))
+        try:
+            # Stream parsed records straight into the insert, dropping rows the file no longer has
+            count = replace_dataset(conn, 'final_consumption', country_code, iter_csv_file(filepath),
+                                    fingerprint['path'], commit=False)
+
+            if not count:
+                print(f"    ✗ No data")
+                conn.rollback()
+                continue
+
+            record_file(conn, fingerprint, country_code, 'final_consumption')
+            refresh_country_aggregates(conn, country_code)
+
+            # Update country flag
+            cursor.execute("""
+                UPDATE countries
+                SET has_final_consumption_data = 1, last_updated = ?
+                WHERE country_code = ?
+            """, (datetime.now(), country_code))
+        except Exception as e:
+            # Database errors, or a file that cannot be read or decoded
+            print(f"    ✗ Error: {e}")
+            conn.rollback()
+            continue
 
         conn.commit()
 
@@ -108,6 +90,10 @@ def main():
         stats['successful'] += 1
         stats['total_records'] += count
 
+    if stats['successful']:
+        refresh_group_rollups(conn)
+        conn.commit()
+
     # Get overall statistics
     cursor.execute("SELECT COUNT(*) FROM final_consumption_data")
     total_fc = cursor.fetchone()[0]
@@ -128,6 +114,7 @@ def main():
     print(f"{'='*70}")
     print(f"Files processed: {stats['total_files']}")
     print(f"Successful: {stats['successful']}")
+    print(f"Unchanged (skipped): {stats['unchanged']}")
     print(f"Final consumption records added: {stats['total_records']:,}")
     print(f"\nDatabase totals:")
     print(f"  Generation records: {total_gen:,}")
@@ -5,7 +5,8 @@ import { ChartsManager } from './charts.js';
 
 class App {
     constructor() {
-        this.dataManager = new DataManager();
+        // ?api=<url> reads data from a running data/query_service.py
+        this.dataManager = new DataManager({ apiBase: new URLSearchParams(window.location.search).get('api') });
         this.globeViz = null;
         this.chartsManager = new ChartsManager();
 
@@ -15,6 +16,7 @@ class App {
         this.valueType = 'absolute';
         this.baseYear = 2000;
         this.selectedCountry = null;
+        this.heatmapRequest = 0;
 
         this.init();
     }
@@ -93,6 +95,11 @@ class App {
             this.updateVisualization();
         });
 
+        // Trend and ranking value types need analytics.cube
+        if (!this.dataManager.hasAnalytics()) {
+            document.getElementById('analytics-value-types').remove();
+        }
+
         // Value type change
         document.getElementById('value-type-select').addEventListener('change', (e) => {
             this.valueType = e.target.value;
@@ -145,6 +152,29 @@ class App {
             this.updateVisualization();
         });
 
+        // Group selector, shown once groups.json is loaded (older exports have none)
+        const groupSelect = document.getElementById('group-select');
+        this.dataManager.loadGroups().then(() => {
+            const groupTypes = { region: 'Regions', income: 'Income Groups', organization: 'Organizations' };
+            for (const [type, label] of Object.entries(groupTypes)) {
+                const optgroup = document.createElement('optgroup');
+                optgroup.label = label;
+                for (const [code, group] of Object.entries(this.dataManager.groups)) {
+                    if (group.type === type) optgroup.appendChild(new Option(group.name, code));
+                }
+                if (optgroup.children.length) groupSelect.appendChild(optgroup);
+            }
+            document.getElementById('group-control').style.display = 'block';
+        }).catch(error => console.warn('No country groups', error));
+
+        groupSelect.addEventListener('change', (e) => {
+            if (e.target.value) {
+                this.showCountryPanel(`group:${e.target.value}`);
+            } else {
+                this.closePanel();
+            }
+        });
+
         // Close panel
         document.getElementById('close-panel').addEventListener('click', () => {
             this.closePanel();
@@ -152,29 +182,60 @@ class App {
 
         // Globe click handler
         this.globeViz.onCountryClick((country) => {
+            groupSelect.value = '';
             this.showCountryPanel(country);
         });
     }
 
-    updateVisualization() {
-        const data = this.dataManager.getHeatmapData(
+    async updateVisualization() {
+        // Ignore answers to requests overtaken by a newer control change
+        const request = ++this.heatmapRequest;
+        const data = await this.dataManager.fetchHeatmapData(
             this.currentIndicator,
             this.currentYear,
             this.currentSource,
             this.valueType,
             this.valueType === 'indexed' ? this.baseYear : null
         );
+        if (request !== this.heatmapRequest) return;
 
         this.globeViz.updateHeatmap(data);
     }
 
-    showCountryPanel(countryCode) {
+    // countryCode may also be a group, as `group:${groupCode}`
+    async showCountryPanel(countryCode) {
         this.selectedCountry = countryCode;
-        const countryName = this.dataManager.getCountryName(countryCode);
+        const groupCode = countryCode.startsWith('group:') ? countryCode.slice('group:'.length) : null;
+        const countryName = groupCode
+            ? this.dataManager.groups[groupCode].name
+            : this.dataManager.getCountryName(countryCode);
+
+        // Detail series are fetched on the first click on a country or group
+        let loadError = null;
+        try {
+            await (groupCode ? this.dataManager.loadGroup(groupCode) : this.dataManager.loadCountry(countryCode));
+        } catch (error) {
+            loadError = error;
+        }
+        if (this.selectedCountry !== countryCode) return;
 
         // Update country name
         document.getElementById('country-name').textContent = countryName;
 
+        // A failed request is not cached, so selecting the country again retries it
+        const message = document.getElementById('panel-message');
+        const charts = document.getElementById('charts');
+        if (loadError) {
+            console.error(`Failed to load data for ${countryCode}:`, loadError);
+            message.textContent = 'The data could not be loaded. Select it again to retry.';
+            message.classList.remove('hidden');
+            charts.classList.add('hidden');
+            this.openPanel();
+            return;
+        }
+        message.classList.add('hidden');
+        charts.classList.remove('hidden');
+
         // Get data for charts
         const generationData = this.dataManager.getGenerationTimeSeries(countryCode);
         const tradeData = this.dataManager.getTradeTimeSeries(countryCode);
@@ -185,7 +246,10 @@ class App {
         this.chartsManager.updateTradeChart(tradeData);
         this.chartsManager.updateConsumptionChart(consumptionData);
 
-        // Show panel
+        this.openPanel();
+    }
+
+    openPanel() {
         document.getElementById('side-panel').classList.remove('hidden');
         document.getElementById('side-panel').classList.add('visible');
     }
@@ -193,6 +257,7 @@ class App {
     closePanel() {
         document.getElementById('side-panel').classList.remove('visible');
         document.getElementById('side-panel').classList.add('hidden');
+        document.getElementById('group-select').value = '';
         this.selectedCountry = null;
     }
 }
@@ -0,0 +1,80 @@
+// Cube Decoder - reads the binary .cube files written by data/cube_format.py
+const CUBE_MAGIC = 'IECB';
+const CUBE_VERSION = 1;
+const FLAG_DELTA = 1;
+const HEADER_SIZE = 24;
+
+export class Cube {
+    constructor(dictionary, values) {
+        this.dataset = dictionary.dataset;
+        this.units = dictionary.units;
+        this.years = dictionary.years;
+        this.countries = dictionary.countries;
+        this.series = dictionary.series;
+        this.values = values;
+
+        this.yearIndex = new Map(this.years.map((year, i) => [year, i]));
+        this.countryIndex = new Map(this.countries.map((code, i) => [code, i]));
+        this.seriesIndex = new Map(this.series.map((name, i) => [name, i]));
+    }
+
+    // Raw value (NaN if missing) by year, country and series position
+    valueAt(y, c, s) {
+        return this.values[(y * this.countries.length + c) * this.series.length + s];
+    }
+
+    // Value for one country, year and series, or null if missing
+    get(countryCode, year, series) {
+        const y = this.yearIndex.get(Number(year));
+        const c = this.countryIndex.get(countryCode);
+        const s = this.seriesIndex.get(series);
+        if (y === undefined || c === undefined || s === undefined) return null;
+
+        const value = this.valueAt(y, c, s);
+        return Number.isNaN(value) ? null : value;
+    }
+
+    // One year's country x series frame, without copying
+    frame(year) {
+        const y = this.yearIndex.get(Number(year));
+        if (y === undefined) return null;
+        const frameSize = this.countries.length * this.series.length;
+        return this.values.subarray(y * frameSize, (y + 1) * frameSize);
+    }
+}
+
+export function decodeCube(buffer) {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    const version = view.getUint16(4, true);
+    if (magic !== CUBE_MAGIC || version !== CUBE_VERSION) {
+        throw new Error(`Unsupported cube file (${magic} v${version})`);
+    }
+
+    const flags = view.getUint16(6, true);
+    const nYears = view.getUint32(8, true);
+    const nCountries = view.getUint32(12, true);
+    const nSeries = view.getUint32(16, true);
+    const dictLength = view.getUint32(20, true);
+
+    const dictionary = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, HEADER_SIZE, dictLength)));
+
+    // Data starts on a 4-byte boundary, so the file is viewed in place (little-endian hosts)
+    const values = new Float32Array(buffer, HEADER_SIZE + dictLength, nYears * nCountries * nSeries);
+
+    if (flags & FLAG_DELTA) {
+        // Each frame holds the change from the previous decoded frame; missing counts as 0
+        const frameSize = nCountries * nSeries;
+        for (let i = frameSize; i < values.length; i++) {
+            const previous = values[i - frameSize];
+            values[i] += Number.isNaN(previous) ? 0 : previous;
+        }
+    }
+
+    return new Cube(dictionary, values);
+}
+
+export async function loadCube(url) {
+    const response = await fetch(url);
+    return decodeCube(await response.arrayBuffer());
+}
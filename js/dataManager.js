@@ -1,27 +1,149 @@
 // Data Manager - handles loading and querying data
+import { loadCube } from './cubeDecoder.js';
+
+// Value types of heatmap.cube; any other value type is a layer of analytics.cube
+const HEATMAP_VALUE_TYPES = ['absolute', 'share', 'indexed'];
+
+// Fetch and parse JSON, rejecting on HTTP errors (e.g. a 404 for a missing shard)
+async function fetchJSON(url) {
+    const response = await fetch(url);
+    if (!response.ok) {
+        throw new Error(`${url}: HTTP ${response.status}`);
+    }
+    return response.json();
+}
+
 export class DataManager {
-    constructor() {
+    // options.apiBase: URL of a running data/query_service.py; queries then go to
+    // the service instead of the exported files (e.g. ?api=http://127.0.0.1:8765)
+    constructor(options = {}) {
+        this.apiBase = options.apiBase ? options.apiBase.replace(/\/$/, '') : null;
         this.countries = {};
-        this.generation = {};
-        this.trade = {};
-        this.consumption = {};
         this.summary = {};
+        this.index = {};
+        this.manifest = null;
+
+        // Precomputed heatmap layers (year x country x "indicator:source:mode")
+        this.heatmap = null;
+
+        // Growth, rolling-mean and ranking layers, loaded when first shown
+        this.analytics = null;
+        this.analyticsRequest = null;
+
+        // Loaded on demand: per-country detail shards, and group shards under "group:<code>"
+        this.shards = {};
+        this.shardRequests = {};
+        this.groups = null;
+        this.groupsRequest = null;
+    }
+
+    // manifest.json maps export names to immutable content-hashed files; it is the
+    // only request that has to be revalidated. Without it the plain names are used.
+    async loadManifest() {
+        try {
+            const response = await fetch('data/manifest.json', { cache: 'no-cache' });
+            if (response.ok) {
+                this.manifest = (await response.json()).files;
+            }
+        } catch (error) {
+            console.warn('No export manifest, using plain file names', error);
+        }
     }
 
+    url(name) {
+        const entry = this.manifest && this.manifest[name];
+        return `data/${entry ? entry.path : name}`;
+    }
+
+    // analytics.cube is only exported when numpy is installed; without a
+    // manifest there is no way to tell, so it is assumed to be there
+    hasAnalytics() {
+        return !this.manifest || 'analytics.cube' in this.manifest;
+    }
+
+    // Initial load: only what the heatmap needs, independent of series detail
     async loadAll() {
-        const [countries, generation, trade, consumption, summary] = await Promise.all([
-            fetch('data/countries.json').then(r => r.json()),
-            fetch('data/generation.json').then(r => r.json()),
-            fetch('data/trade.json').then(r => r.json()),
-            fetch('data/consumption.json').then(r => r.json()),
-            fetch('data/summary.json').then(r => r.json())
+        // Also read with the query service, which does not serve analytics.cube
+        await this.loadManifest();
+
+        if (this.apiBase) {
+            const [countries, summary, index] = await Promise.all(
+                ['countries', 'summary', 'index'].map(name => fetch(`${this.apiBase}/api/${name}`).then(r => r.json()))
+            );
+            this.countries = countries;
+            this.summary = summary;
+            this.index = index;
+            return;
+        }
+
+        const [countries, summary, index, heatmap] = await Promise.all([
+            fetch(this.url('countries.json')).then(r => r.json()),
+            fetch(this.url('summary.json')).then(r => r.json()),
+            fetch(this.url('index.json')).then(r => r.json()),
+            loadCube(this.url('heatmap.cube'))
         ]);
 
         this.countries = countries;
-        this.generation = generation;
-        this.trade = trade;
-        this.consumption = consumption;
         this.summary = summary;
+        this.index = index;
+        this.heatmap = heatmap;
+    }
+
+    // Fetch a shard once; a failed request is forgotten so the next call retries it
+    loadShard(key, url) {
+        if (!this.shardRequests[key]) {
+            this.shardRequests[key] = fetchJSON(url)
+                .then(shard => { this.shards[key] = shard; })
+                .catch(error => {
+                    delete this.shardRequests[key];
+                    throw error;
+                });
+        }
+        return this.shardRequests[key];
+    }
+
+    // Fetch a country's detail series (generation, trade, consumption) once
+    loadCountry(countryCode) {
+        if (!this.index[countryCode]) return Promise.resolve();
+        return this.loadShard(countryCode, this.apiBase
+            ? `${this.apiBase}/api/country/${encodeURIComponent(countryCode)}`
+            : this.url(`shards/${countryCode}.json`));
+    }
+
+    // Country groups (regions, income groups, EU/IEA/OECD): members, totals and shares
+    loadGroups() {
+        if (!this.groupsRequest) {
+            const url = this.apiBase ? `${this.apiBase}/api/groups` : this.url('groups.json');
+            this.groupsRequest = fetchJSON(url)
+                .then(groups => { this.groups = groups; })
+                .catch(error => {
+                    this.groupsRequest = null;
+                    throw error;
+                });
+        }
+        return this.groupsRequest;
+    }
+
+    // A group's summed series, in the country shard format, so the
+    // get*TimeSeries methods work with `group:${groupCode}` like a country code
+    loadGroup(groupCode) {
+        return this.loadShard(`group:${groupCode}`, this.apiBase
+            ? `${this.apiBase}/api/group/${encodeURIComponent(groupCode)}`
+            : this.url(`shards/groups/${groupCode}.json`));
+    }
+
+    loadAnalytics() {
+        if (!this.analyticsRequest) {
+            this.analyticsRequest = loadCube(this.url('analytics.cube'))
+                .then(cube => { this.analytics = cube; })
+                .catch(error => console.warn('No analytics layers', error));
+        }
+        return this.analyticsRequest;
+    }
+
+    getShardData(countryCode, key) {
+        const shard = this.shards[countryCode];
+        return shard ? shard[key] : undefined;
     }
 
     getYears() {
@@ -32,66 +154,52 @@ export class DataManager {
         return this.countries[countryCode] || countryCode.replace(/-/g, ' ').replace(/\b\w/g, l => l.toUpperCase());
     }
 
+    // Heatmap values from the query service, or from the precomputed layers
+    async fetchHeatmapData(indicator, year, source = 'total', valueType = 'absolute', baseYear = null) {
+        if (!HEATMAP_VALUE_TYPES.includes(valueType)) {
+            await this.loadAnalytics();
+            return this.getHeatmapData(indicator, year, source, valueType, baseYear);
+        }
+        if (!this.apiBase) {
+            return this.getHeatmapData(indicator, year, source, valueType, baseYear);
+        }
+
+        const params = new URLSearchParams({ indicator, year, source, valueType });
+        if (baseYear) params.set('baseYear', baseYear);
+        const response = await fetch(`${this.apiBase}/api/heatmap?${params}`);
+        return response.ok ? response.json() : [];
+    }
+
     getHeatmapData(indicator, year, source = 'total', valueType = 'absolute', baseYear = null) {
         const data = [];
 
-        for (const countryCode in this.countries) {
-            let value = null;
-            let baseValue = null;
-
-            if (indicator === 'generation') {
-                const countryData = this.generation[countryCode];
-                if (countryData && countryData[year]) {
-                    if (valueType === 'share' && source !== 'total') {
-                        // Calculate share: (source / total) * 100
-                        const sourceValue = countryData[year][source] || 0;
-                        const totalValue = Object.values(countryData[year]).reduce((sum, val) => sum + (val || 0), 0);
-                        value = totalValue > 0 ? (sourceValue / totalValue) * 100 : null;
-                    } else if (source === 'total') {
-                        // Sum all sources
-                        value = Object.values(countryData[year]).reduce((sum, val) => sum + (val || 0), 0);
-                        if (valueType === 'indexed' && baseYear && countryData[baseYear]) {
-                            baseValue = Object.values(countryData[baseYear]).reduce((sum, val) => sum + (val || 0), 0);
-                        }
-                    } else {
-                        // Specific source
-                        value = countryData[year][source] || null;
-                        if (valueType === 'indexed' && baseYear && countryData[baseYear]) {
-                            baseValue = countryData[baseYear][source] || null;
-                        }
-                    }
-                }
-            } else if (indicator === 'consumption') {
-                const countryData = this.consumption[countryCode];
-                if (countryData && countryData[year]) {
-                    // Sum all sectors
-                    value = Object.values(countryData[year]).reduce((sum, val) => sum + (val || 0), 0);
-                    if (valueType === 'indexed' && baseYear && countryData[baseYear]) {
-                        baseValue = Object.values(countryData[baseYear]).reduce((sum, val) => sum + (val || 0), 0);
-                    }
-                }
-            } else if (indicator === 'imports') {
-                const countryData = this.trade[countryCode];
-                if (countryData && countryData[year]) {
-                    const imports = countryData[year]['Imports'] || 0;
-                    const exports = Math.abs(countryData[year]['Exports'] || 0);
-                    value = imports - exports; // Net imports
-
-                    if (valueType === 'indexed' && baseYear && countryData[baseYear]) {
-                        const baseImports = countryData[baseYear]['Imports'] || 0;
-                        const baseExports = Math.abs(countryData[baseYear]['Exports'] || 0);
-                        baseValue = baseImports - baseExports;
-                    }
-                }
-            }
+        // Only generation has per-source layers; shares exist for single sources
+        const layerSource = indicator === 'generation' ? source : 'total';
+        const analytics = !HEATMAP_VALUE_TYPES.includes(valueType);
+        const mode = analytics ? valueType : valueType === 'share' && layerSource !== 'total' ? 'share' : 'absolute';
+
+        const cube = analytics ? this.analytics : this.heatmap;
+        if (!cube) return data;
+        const layer = cube.seriesIndex.get(`${indicator}:${layerSource}:${mode}`);
+        const y = cube.yearIndex.get(Number(year));
+        if (layer === undefined || y === undefined) return data;
+
+        // Indexed mode divides by the same layer's base-year value
+        const base = valueType === 'indexed' && baseYear ? cube.yearIndex.get(Number(baseYear)) : undefined;
 
-            // Calculate indexed value if requested
-            if (valueType === 'indexed' && baseValue !== null && baseValue !== 0) {
-                value = (value / baseValue) * 100;
+        for (let c = 0; c < cube.countries.length; c++) {
+            let value = cube.valueAt(y, c, layer);
+            if (Number.isNaN(value)) continue;
+
+            if (base !== undefined) {
+                const baseValue = cube.valueAt(base, c, layer);
+                if (!Number.isNaN(baseValue) && baseValue !== 0) {
+                    value = (value / baseValue) * 100;
+                }
             }
 
-            if (value !== null && value !== 0) {
-                data.push({ country: countryCode, value });
+            if (value !== 0) {
+                data.push({ country: cube.countries[c], value });
             }
         }
 
@@ -99,7 +207,7 @@ export class DataManager {
     }
 
     getGenerationTimeSeries(countryCode) {
-        const countryData = this.generation[countryCode];
+        const countryData = this.getShardData(countryCode, 'generation');
         if (!countryData) return null;
 
         // Get all years and sources
@@ -139,7 +247,7 @@ export class DataManager {
     }
 
     getTradeTimeSeries(countryCode) {
-        const countryData = this.trade[countryCode];
+        const countryData = this.getShardData(countryCode, 'trade');
         if (!countryData) return null;
 
         const years = Object.keys(countryData).map(Number).sort((a, b) => a - b);
@@ -167,7 +275,7 @@ export class DataManager {
     }
 
     getConsumptionTimeSeries(countryCode) {
-        const countryData = this.consumption[countryCode];
+        const countryData = this.getShardData(countryCode, 'consumption');
         if (!countryData) return null;
 
         const years = Object.keys(countryData).map(Number).sort((a, b) => a - b);